@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from datetime import date, timedelta
+
+# Compares the 'default' and 'tuned' engine profiles (DB_PROFILE) under a
+# mixed load: writer threads recording transactions (row + rollup, one
+# commit each, like repository.add_transactions) while reader threads run
+# the report query. Each profile gets a fresh scratch SQLite database, or
+# --url points both at a server database (its tables get benchmark rows).
+#
+#   python -m benchmarks.engine_profile --seconds 5 --writers 8 --readers 4
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--url', help="database URL to benchmark instead of scratch SQLite files")
+parser.add_argument('--seconds', type=float, default=5)
+parser.add_argument('--writers', type=int, default=8)
+parser.add_argument('--readers', type=int, default=4)
+parser.add_argument('--users', type=int, default=100)
+parser.add_argument('--profiles', default='default,tuned')
+args = parser.parse_args()
+
+sys.path.append(os.getcwd())
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+from src.database import create_db_engine, User, Transaction, DailyRollup
+from src.migrations import run_migrations
+from src.rollups import apply_rollup
+
+def seed_users(bind):
+    with bind.begin() as conn:
+        start = conn.execute(sa.select(sa.func.coalesce(sa.func.max(User.telegram_id), 700000000))).scalar() + 1
+        conn.execute(sa.insert(User), [
+            {'telegram_id': start + i, 'language': 'en', 'daily_limit': 0.0, 'is_active': True}
+            for i in range(args.users)
+        ])
+        return [row[0] for row in conn.execute(sa.select(User.id).where(User.telegram_id >= start))]
+
+def writer(bind, user_ids, deadline, result):
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with Session(bind) as db:
+                txn = Transaction(
+                    user_id=rng.choice(user_ids), type='expense', category=rng.choice(['food', 'transport', 'bills']),
+                    amount=10.0, description='benchmark', date=date.today()
+                )
+                db.add(txn)
+                apply_rollup(db, [txn])
+                db.commit()
+            result['writes'].append(time.perf_counter() - start)
+        except sa.exc.OperationalError:
+            result['errors'] += 1
+
+def reader(bind, user_ids, deadline, result):
+    rng = random.Random()
+    since = date.today() - timedelta(days=29)
+    query = sa.select(DailyRollup.type, DailyRollup.category, sa.func.sum(DailyRollup.total)).where(
+        DailyRollup.user_id == sa.bindparam('uid'), DailyRollup.date >= since
+    ).group_by(DailyRollup.type, DailyRollup.category)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with bind.connect() as conn:
+                conn.execute(query, {'uid': rng.choice(user_ids)}).all()
+            result['reads'].append(time.perf_counter() - start)
+        except sa.exc.OperationalError:
+            result['errors'] += 1
+
+def pct(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2) if values else None
+
+def run_profile(profile):
+    url = args.url or f"sqlite:///{tempfile.mkdtemp()}/engine_{profile}.db"
+    bind = create_db_engine(url, profile)
+    try:
+        run_migrations(bind)
+        user_ids = seed_users(bind)
+        result = {'writes': [], 'reads': [], 'errors': 0}
+        deadline = time.perf_counter() + args.seconds
+        threads = [threading.Thread(target=writer, args=(bind, user_ids, deadline, result)) for _ in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(bind, user_ids, deadline, result)) for _ in range(args.readers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return {
+            'writes_per_sec': round(len(result['writes']) / args.seconds, 1),
+            'reads_per_sec': round(len(result['reads']) / args.seconds, 1),
+            'write_p95_ms': pct(result['writes'], 0.95),
+            'read_p95_ms': pct(result['reads'], 0.95),
+            'lock_errors': result['errors'],
+        }
+    finally:
+        bind.dispose()
+
+def main():
+    results = {profile: run_profile(profile) for profile in args.profiles.split(',')}
+    if 'default' in results and 'tuned' in results and results['default']['writes_per_sec']:
+        results['write_speedup'] = round(results['tuned']['writes_per_sec'] / results['default']['writes_per_sec'], 2)
+    print(json.dumps({
+        'database': sa.engine.make_url(args.url).render_as_string(hide_password=True) if args.url else 'scratch sqlite',
+        'seconds': args.seconds,
+        'writers': args.writers,
+        'readers': args.readers,
+        **results
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
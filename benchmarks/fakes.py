@@ -0,0 +1,83 @@
+import itertools
+from types import SimpleNamespace
+
+# Minimal stand-ins for telegram.Update / CallbackContext: just the
+# attributes and coroutines the handlers touch. Replies are recorded (not
+# sent) so a benchmark can check what the bot answered.
+
+_message_ids = itertools.count(1)
+
+class FakeMessage:
+    def __init__(self, chat, text=None, replies=None):
+        self.message_id = next(_message_ids)
+        self.chat = chat
+        self.text = text
+        self.replies = replies if replies is not None else []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(('text', text))
+        return FakeMessage(self.chat, text, self.replies)
+
+    async def edit_text(self, text, **kwargs):
+        self.replies.append(('edit', text))
+        self.text = text
+        return self
+
+    async def reply_document(self, document=None, filename=None, **kwargs):
+        # Read the file like the upload would, so its cost is measured
+        size = len(document.read()) if hasattr(document, 'read') else 0
+        self.replies.append(('document', filename, size))
+        return self
+
+    async def reply_photo(self, photo=None, caption=None, **kwargs):
+        size = len(photo.read()) if hasattr(photo, 'read') else 0
+        self.replies.append(('photo', caption, size))
+        return self
+
+class FakeCallbackQuery:
+    def __init__(self, user, message, data):
+        self.from_user = user
+        self.message = message
+        self.data = data
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+class FakeUpdate:
+    def __init__(self, user, message=None, callback_query=None):
+        self.effective_user = user
+        self.effective_chat = user and SimpleNamespace(id=user.id, type='private')
+        self.message = message
+        self.callback_query = callback_query
+
+    @property
+    def replies(self):
+        source = self.message or self.callback_query.message
+        return source.replies
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+class FakeContext:
+    def __init__(self, bot, user_data=None, args=None):
+        self.bot = bot
+        self.user_data = user_data if user_data is not None else {}
+        self.args = args or []
+
+def make_user(telegram_id, language='en'):
+    return SimpleNamespace(
+        id=telegram_id, username=f"bench{telegram_id}", full_name=f"Bench {telegram_id}",
+        first_name="Bench", is_bot=False, language_code=language
+    )
+
+def text_update(user, text):
+    chat = SimpleNamespace(id=user.id, type='private')
+    return FakeUpdate(user, message=FakeMessage(chat, text))
+
+def callback_update(user, data):
+    chat = SimpleNamespace(id=user.id, type='private')
+    return FakeUpdate(user, callback_query=FakeCallbackQuery(user, FakeMessage(chat), data))
@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import contextlib
+
+# End-to-end load benchmark. Drives handle_message, the report callbacks and
+# /export with fake Telegram updates against a seeded database, with Groq
+# replaced by a local stub (configurable latency and error rate), and prints
+# throughput and p50/p95/p99 latency per handler as JSON.
+#
+#   python -m benchmarks.load --users 1000 --txns-per-user 10000 --requests 2000 --concurrency 50
+#   python -m benchmarks.load --users 100 --txns-per-user 1000 --requests 300   # quick run
+#
+# Seeded SQLite files are cached in the temp directory and reused (--reseed
+# rebuilds). --url runs against another database instead, seeding it only if
+# it has no users. Inbound rate limits are lifted so the benchmark measures
+# processing rather than the flood protection.
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--url', help="database URL to run against instead of a cached scratch SQLite file")
+parser.add_argument('--users', type=int, default=1000)
+parser.add_argument('--txns-per-user', type=int, default=10000)
+parser.add_argument('--reseed', action='store_true')
+parser.add_argument('--requests', type=int, default=2000, help="measured handler calls")
+parser.add_argument('--warmup', type=int, default=50, help="unmeasured calls first")
+parser.add_argument('--concurrency', type=int, default=50)
+parser.add_argument('--mix', default='message=80,report=15,export=5', help="relative weight per handler")
+parser.add_argument('--llm-latency-ms', type=float, default=300)
+parser.add_argument('--llm-jitter-ms', type=float, default=100)
+parser.add_argument('--llm-error-rate', type=float, default=0.0)
+parser.add_argument('--llm-only', action='store_true', help="disable the local parser and parse cache")
+parser.add_argument('--seed', type=int, default=1)
+parser.add_argument('--output', help="also write the JSON report here")
+parser.add_argument('--verbose', action='store_true', help="show the bot's output and debug logs")
+args = parser.parse_args()
+
+if args.url:
+    db_url = args.url
+else:
+    db_path = os.path.join(tempfile.gettempdir(), f"smart_mezan_bench_{args.users}x{args.txns_per_user}.db")
+    db_url = f"sqlite:///{db_path}"
+os.environ['DATABASE_URL'] = db_url
+# Offline tool: the bot credentials are never used
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'unused')
+os.environ.setdefault('GROQ_API_KEY', 'unused')
+os.environ.setdefault('USER_RATE_BURST', '1000000')
+os.environ.setdefault('USER_RATE_PER_MINUTE', '1000000')
+os.environ.setdefault('ADMISSION_MAX_DEPTH', '1000000')
+os.environ.setdefault('GROQ_BACKOFF_BASE', '0.05')
+if args.llm_only:
+    os.environ['LOCAL_PARSER_ENABLED'] = 'false'
+    os.environ['PARSE_CACHE_ENABLED'] = 'false'
+sys.path.append(os.getcwd())
+
+from benchmarks import fakes, seed, stub_llm
+
+EN_LOCAL = ["coffee {n}", "taxi {n}", "lunch {n}", "groceries {n}", "salary {n}00"]
+AR_LOCAL = ["قهوة {n}", "تاكسي {n}", "غداء {n}", "بنزين {n}"]
+EN_LLM = [
+    "paid the plumber {n} for fixing the sink",
+    "gave my brother {n} for his birthday",
+    "coffee {n}, taxi {n} and a sandwich {n}",
+    "netflix and spotify subscriptions {n}",
+]
+AR_LLM = ["دفعت للسباك {n} لتصليح المغسلة", "اشتريت هدية لأخي ب {n}", "سددت فاتورة الكهرباء {n} والماء {n}"]
+FAILED_REPLIES = ("Error processing", "حدث خطأ", "didn't understand", "لم أفهم", "busy", "مشغول")
+
+def pct(values, p):
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2) if values else None
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {'message', 'report', 'export'}
+    if unknown:
+        parser.error(f"unknown handlers in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+def make_text(rng, language):
+    local = rng.random() < 0.6
+    pool = (AR_LOCAL if local else AR_LLM) if language == 'ar' else (EN_LOCAL if local else EN_LLM)
+    return rng.choice(pool).format(n=rng.randint(5, 400))
+
+async def run(handlers_module, main_module, main_logic, user_ids, rng, mix, count, stats):
+    bot = fakes.FakeBot()
+    contexts = {}
+    names, weights = zip(*mix.items())
+
+    def context_for(telegram_id, call_args=None):
+        ctx = fakes.FakeContext(bot, contexts.setdefault(telegram_id, {}), call_args)
+        return ctx
+
+    def plan():
+        telegram_id = rng.choice(user_ids)
+        user = fakes.make_user(telegram_id)
+        # Seeded users alternate languages (see benchmarks.seed)
+        language = 'ar' if (telegram_id - seed.BASE_TELEGRAM_ID) % 2 else 'en'
+        handler = rng.choices(names, weights)[0]
+        if handler == 'message':
+            update = fakes.text_update(user, make_text(rng, language))
+            return handler, update, handlers_module.handle_message(update, context_for(telegram_id))
+        if handler == 'report':
+            update = fakes.callback_update(user, rng.choice(['rep_today', 'rep_week', 'rep_month']))
+            return handler, update, main_module.report_callback(update, context_for(telegram_id))
+        update = fakes.text_update(user, '/export')
+        call_args = rng.choice([[], ['90'], ['csv']])
+        return handler, update, main_logic.export_excel_cmd(update, context_for(telegram_id, call_args))
+
+    queue = asyncio.Queue()
+    for _ in range(count):
+        queue.put_nowait(plan)
+
+    async def worker():
+        while True:
+            try:
+                make = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            name, update, coroutine = make()
+            entry = stats.setdefault(name, {'latencies': [], 'exceptions': 0, 'failed_replies': 0})
+            started = time.perf_counter()
+            try:
+                await coroutine
+            except Exception as e:
+                entry['exceptions'] += 1
+                logging.getLogger(__name__).error(f"{name} raised {e!r}")
+            entry['latencies'].append(time.perf_counter() - started)
+            last = update.replies[-1][1] if update.replies else ''
+            if isinstance(last, str) and any(marker in last for marker in FAILED_REPLIES):
+                entry['failed_replies'] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    return time.perf_counter() - started
+
+def summarise(stats, elapsed):
+    report = {}
+    for name, entry in sorted(stats.items()):
+        latencies = sorted(entry['latencies'])
+        report[name] = {
+            'count': len(latencies),
+            'throughput_per_sec': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'p50_ms': pct(latencies, 0.50),
+            'p95_ms': pct(latencies, 0.95),
+            'p99_ms': pct(latencies, 0.99),
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+            'exceptions': entry['exceptions'],
+            'failed_replies': entry['failed_replies'],
+        }
+    return report
+
+async def main():
+    log = (lambda msg: print(msg, file=sys.stderr))
+    mix = parse_mix(args.mix)
+
+    if args.url:
+        import sqlalchemy as sa
+        from src.database import engine, User
+        from src.migrations import run_migrations
+        run_migrations(engine)
+        with engine.connect() as conn:
+            seeded = conn.execute(sa.select(sa.func.count()).select_from(User)).scalar()
+        if not seeded:
+            seed.seed(db_url, args.users, args.txns_per_user, log=log)
+    else:
+        seed.seed_sqlite_file(db_path, args.users, args.txns_per_user, reseed=args.reseed, log=log)
+
+    from src import bot as main_module
+    from src import handlers, main_logic
+    from src.database import init_db, engine
+    from src.write_buffer import write_buffer
+    from src.ai_service import get_ai_service
+    init_db()
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.getLogger().setLevel(logging.ERROR)
+    ai_service = get_ai_service()
+    llm = stub_llm.install(
+        ai_service,
+        latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+        error_rate=args.llm_error_rate, seed=args.seed
+    )
+
+    rng = random.Random(args.seed)
+    user_ids = [seed.BASE_TELEGRAM_ID + i for i in range(args.users)]
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with quiet:
+        if args.warmup:
+            await run(handlers, main_module, main_logic, user_ids, rng, mix, args.warmup, {})
+        stats = {}
+        elapsed = await run(handlers, main_module, main_logic, user_ids, rng, mix, args.requests, stats)
+        await write_buffer.close()
+
+    handlers_report = summarise(stats, elapsed)
+    all_latencies = sorted(l for entry in stats.values() for l in entry['latencies'])
+    report = {
+        'database': engine.url.render_as_string(hide_password=True),
+        'dataset': {'users': args.users, 'txns_per_user': args.txns_per_user},
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'mix': mix,
+        'llm_stub': {
+            'latency_ms': args.llm_latency_ms, 'jitter_ms': args.llm_jitter_ms,
+            'error_rate': args.llm_error_rate, **llm.stats()
+        },
+        'seconds': round(elapsed, 3),
+        'throughput_per_sec': round(len(all_latencies) / elapsed, 1) if elapsed else None,
+        'overall': {'p50_ms': pct(all_latencies, 0.50), 'p95_ms': pct(all_latencies, 0.95), 'p99_ms': pct(all_latencies, 0.99)},
+        'handlers': handlers_report,
+        'fast_path': ai_service.fast_path_stats(),
+        'parse_cache': ai_service.cache_stats(),
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    await ai_service.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
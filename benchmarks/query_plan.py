@@ -0,0 +1,94 @@
+import os
+import sys
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+# Shows the plans of the bot's hot queries and checks that they use the
+# indexes added by the migrations. By default it runs against a scratch
+# SQLite database seeded with synthetic rows; --configured-db explains the
+# queries against DATABASE_URL instead (read-only, nothing is seeded).
+#
+#   python -m benchmarks.query_plan
+#   python -m benchmarks.query_plan --configured-db
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--configured-db', action='store_true')
+parser.add_argument('--users', type=int, default=50)
+parser.add_argument('--txns-per-user', type=int, default=400)
+args = parser.parse_args()
+
+if not args.configured_db:
+    scratch = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{scratch}/query_plan.db"
+sys.path.append(os.getcwd())
+
+import sqlalchemy as sa
+from src.database import engine, init_db, User, Transaction
+
+def seed():
+    today = date.today()
+    with engine.begin() as conn:
+        conn.execute(sa.insert(User), [
+            {'telegram_id': 1000 + i, 'language': 'en', 'daily_limit': 0.0, 'is_active': True}
+            for i in range(args.users)
+        ])
+        rows = []
+        for uid in range(1, args.users + 1):
+            for n in range(args.txns_per_user):
+                rows.append({
+                    'user_id': uid, 'type': 'expense' if n % 5 else 'income',
+                    'category': 'food', 'amount': 10.0, 'description': 'seed',
+                    'date': today - timedelta(days=n % 365)
+                })
+        conn.execute(sa.insert(Transaction), rows)
+        conn.execute(sa.text("ANALYZE"))
+
+def hot_queries():
+    today = date.today()
+    return {
+        'user lookup by telegram_id': (
+            sa.select(User).where(User.telegram_id == 1001),
+            ('telegram_id', 'users_telegram_id_key', 'sqlite_autoindex_users'),
+        ),
+        'report rows (user_id, date)': (
+            sa.select(Transaction).where(Transaction.user_id == 1, Transaction.date >= today - timedelta(days=29)),
+            ('ix_transactions_user_date', 'ix_transactions_user_type_date'),
+        ),
+        'budget warm (user_id, type, date)': (
+            sa.select(Transaction.date, sa.func.sum(Transaction.amount)).where(
+                Transaction.user_id == 1, Transaction.type == 'expense',
+                Transaction.date >= today.replace(day=1), Transaction.date <= today
+            ).group_by(Transaction.date),
+            ('ix_transactions_user_type_date',),
+        ),
+    }
+
+def explain(conn, stmt):
+    sql = str(stmt.compile(engine, compile_kwargs={'literal_binds': True}))
+    if engine.dialect.name == 'sqlite':
+        return [row[-1] for row in conn.execute(sa.text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return [row[0] for row in conn.execute(sa.text(f"EXPLAIN {sql}"))]
+
+def main():
+    init_db()
+    if not args.configured_db:
+        seed()
+    failures = 0
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            # Tiny tables make the planner prefer seq scans; ask whether an index *can* be used
+            conn.execute(sa.text("SET enable_seqscan = off"))
+        for name, (stmt, expected) in hot_queries().items():
+            plan = explain(conn, stmt)
+            used = any(idx in line for line in plan for idx in expected)
+            failures += not used
+            print(f"{'OK  ' if used else 'FAIL'} {name}")
+            for line in plan:
+                print(f"       {line}")
+    if failures:
+        print(f"{failures} hot queries are not using an index")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import random
+import time
+from datetime import date, timedelta
+
+# Synthetic data at production-like sizes for the load benchmark. Users get
+# telegram ids from BASE_TELEGRAM_ID, a mix of languages and limits, and
+# transactions spread over the last year; rollups and global stats are
+# rebuilt at the end, as the migration backfills would. Imports of src are
+# deferred so callers can set DATABASE_URL first.
+
+BASE_TELEGRAM_ID = 1_000_000
+CATEGORIES = ['food', 'transport', 'bills', 'shopping', 'health', 'entertainment', 'other']
+INSERT_BATCH = 20000
+
+def seed(url, users, txns_per_user, days=365, rng_seed=42, log=print):
+    import sqlalchemy as sa
+    from src.database import create_db_engine, maintenance_transaction, User, Transaction
+    from src.migrations import run_migrations
+    from src.rollups import rebuild
+    from src.stats import rebuild as rebuild_stats
+
+    rng = random.Random(rng_seed)
+    bind = create_db_engine(url)
+    started = time.perf_counter()
+    try:
+        run_migrations(bind)
+        with bind.begin() as conn:
+            conn.execute(sa.insert(User), [{
+                'telegram_id': BASE_TELEGRAM_ID + i,
+                'username': f"bench{i}",
+                'full_name': f"Bench {i}",
+                'language': 'ar' if i % 2 else 'en',
+                # A third of the users have limits, so the ledger path runs
+                'daily_limit': 200.0 if i % 3 == 0 else 0.0,
+                'weekly_limit': 1000.0 if i % 3 == 0 else 0.0,
+                'monthly_limit': 4000.0 if i % 3 == 0 else 0.0,
+                'is_active': True
+            } for i in range(users)])
+            ids = [row[0] for row in conn.execute(sa.select(User.id).order_by(User.id))]
+
+        today = date.today()
+        batch = []
+        total = 0
+        for user_id in ids:
+            for _ in range(txns_per_user):
+                income = rng.random() < 0.1
+                batch.append({
+                    'user_id': user_id,
+                    'type': 'income' if income else 'expense',
+                    'category': 'salary' if income else rng.choice(CATEGORIES),
+                    'amount': round(rng.uniform(5, 3000 if income else 300), 2),
+                    'description': 'seed',
+                    'date': today - timedelta(days=rng.randrange(days))
+                })
+                if len(batch) >= INSERT_BATCH:
+                    with bind.begin() as conn:
+                        conn.execute(sa.insert(Transaction), batch)
+                    total += len(batch)
+                    batch = []
+                    if total % (INSERT_BATCH * 50) == 0:
+                        log(f"seeded {total} transactions ({time.perf_counter() - started:.0f}s)")
+        if batch:
+            with bind.begin() as conn:
+                conn.execute(sa.insert(Transaction), batch)
+            total += len(batch)
+
+        with maintenance_transaction(bind) as conn:
+            rollups = rebuild(conn)
+            rebuild_stats(conn)
+            if bind.dialect.name == 'sqlite':
+                conn.exec_driver_sql("ANALYZE")
+        log(f"seeded {users} users, {total} transactions, {rollups} rollup rows in {time.perf_counter() - started:.0f}s")
+    finally:
+        bind.dispose()
+
+def seed_sqlite_file(path, users, txns_per_user, reseed=False, log=print):
+    # Seeded files are reused between runs; they are built under a temporary
+    # name so an interrupted seed is never mistaken for a complete one
+    if os.path.exists(path) and not reseed:
+        log(f"reusing seeded database {path}")
+        return path
+    partial = path + '.partial'
+    for stale in (path, partial, partial + '-wal', partial + '-shm'):
+        if os.path.exists(stale):
+            os.remove(stale)
+    seed(f"sqlite:///{partial}", users, txns_per_user, log=log)
+    os.replace(partial, path)
+    return path
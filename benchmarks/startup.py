@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+# Cold-start report. Runs `python -X importtime -c "import src.bot"` in a fresh
+# interpreter and summarises the heaviest modules and top-level packages,
+# then times a second fresh process from spawn until bot.build_application()
+# returns (imports, init_db, handlers registered): everything before the
+# first getUpdates call, which only adds network. Exits 1 when that
+# time-to-first-poll is over --target-ms.
+#
+#   python -m benchmarks.startup
+#   python -m benchmarks.startup --runs 5 --top 20 --target-ms 1500
+
+TARGET_MS = 1500
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--runs', type=int, default=3, help="time-to-first-poll samples (the median is reported)")
+parser.add_argument('--top', type=int, default=15)
+parser.add_argument('--target-ms', type=float, default=TARGET_MS)
+parser.add_argument('--output', help="also write the JSON report here")
+args = parser.parse_args()
+
+# Bring up everything build_application() does, then print how long it took
+# since the interpreter started
+PROBE = """
+import time, os
+started = float(os.environ['STARTUP_PROBE_T0'])
+from src import bot
+imported = time.time()
+bot.build_application()
+print(f"STARTUP {(imported - started) * 1000:.1f} {(time.time() - started) * 1000:.1f}")
+"""
+
+def environment(db_dir):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'startup.db')}"
+    # Offline tool: the bot credentials are never used
+    env.setdefault('TELEGRAM_BOT_TOKEN', '123:unused')
+    env.setdefault('GROQ_API_KEY', 'unused')
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+def import_profile(env):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import src.bot'],
+        env=env, cwd=os.getcwd(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"import src.bot failed:\n{result.stderr[-2000:]}")
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return modules
+
+def summarise(modules):
+    # Top level entries (indent of one space) sum to the whole import
+    total = sum(cumulative for name, _, cumulative in modules if not name.startswith('  '))
+    packages = {}
+    for name, self_us, _ in modules:
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    by_self = sorted(modules, key=lambda m: m[1], reverse=True)[:args.top]
+    by_package = sorted(packages.items(), key=lambda p: p[1], reverse=True)[:args.top]
+    return {
+        'import_main_ms': round(total / 1000, 1),
+        'modules_imported': len(modules),
+        'top_modules_self_ms': {name.strip(): round(self_us / 1000, 1) for name, self_us, _ in by_self},
+        'top_packages_ms': {name: round(us / 1000, 1) for name, us in by_package},
+        'loaded': {name: name in packages for name in ('groq', 'openpyxl', 'matplotlib', 'pandas')},
+    }
+
+def time_to_first_poll(env):
+    samples = []
+    for _ in range(args.runs):
+        env['STARTUP_PROBE_T0'] = repr(time.time())
+        result = subprocess.run([sys.executable, '-c', PROBE], env=env, cwd=os.getcwd(), capture_output=True, text=True)
+        marker = [line for line in result.stdout.splitlines() if line.startswith('STARTUP ')]
+        if result.returncode != 0 or not marker:
+            sys.exit(f"build_application failed:\n{result.stderr[-2000:]}")
+        imported_ms, ready_ms = map(float, marker[-1].split()[1:])
+        samples.append((ready_ms, imported_ms))
+    samples.sort()
+    ready_ms, imported_ms = samples[len(samples) // 2]
+    return {'samples_ms': [s[0] for s in samples], 'imports_done_ms': imported_ms, 'ready_ms': ready_ms}
+
+def main():
+    with tempfile.TemporaryDirectory() as db_dir:
+        env = environment(db_dir)
+        report = summarise(import_profile(env))
+        report['time_to_first_poll'] = time_to_first_poll(env)
+    report['target_ms'] = args.target_ms
+    report['within_target'] = report['time_to_first_poll']['ready_ms'] <= args.target_ms
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    if not report['within_target']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
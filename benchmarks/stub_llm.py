@@ -0,0 +1,112 @@
+import re
+import json
+import random
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+import httpx
+from groq import APITimeoutError, InternalServerError, RateLimitError
+
+# Local stand-in for AsyncGroq: answers chat.completions.create() after a
+# configurable latency, failing a configurable share of calls with the same
+# exceptions the SDK raises (503 / 429 / timeout) so the service's retry and
+# backoff path is exercised too. Answers are built from the amounts in the
+# message, in the single or batched format the prompt asks for (statement
+# import categorisation prompts get 'shopping' for every line).
+
+SINGLE_RE = re.compile(r'Analyze the following[^\n]*:\s*\n\s*"(.*)"\s*\n')
+NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+CATEGORIZE_LINE_RE = re.compile(r'^\s*(\d+): ', re.M)
+
+_REQUEST = httpx.Request("POST", "https://stub.local/openai/v1/chat/completions")
+
+class StubCompletions:
+    def __init__(self, latency_ms=300.0, jitter_ms=100.0, error_rate=0.0, seed=None):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.prompt_chars = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _error(self):
+        kind = self.rng.choice(('server', 'rate_limit', 'timeout'))
+        if kind == 'timeout':
+            return APITimeoutError(request=_REQUEST)
+        status = 503 if kind == 'server' else 429
+        response = httpx.Response(status, request=_REQUEST, headers={'retry-after': '0'})
+        cls = InternalServerError if kind == 'server' else RateLimitError
+        return cls(f"stub {status}", response=response, body=None)
+
+    @staticmethod
+    def _transactions(message):
+        amounts = NUMBER_RE.findall(message) or ['10']
+        words = message.split()
+        return [{
+            'type': 'income' if any(w in message.lower() for w in ('salary', 'راتب', 'received')) else 'expense',
+            'category': 'other',
+            'amount': float(amount),
+            'description': " ".join(w for w in words if not NUMBER_RE.fullmatch(w))[:60] or 'Entry',
+            'date': date.today().isoformat()
+        } for amount in amounts]
+
+    def _answer(self, prompt):
+        match = SINGLE_RE.search(prompt)
+        if match:
+            return {'transactions': self._transactions(match.group(1))}
+        if prompt.lstrip().startswith('Categorize each'):
+            # Statement import categorisation: everything is shopping
+            return {'results': [{'id': int(i), 'category': 'shopping'} for i in CATEGORIZE_LINE_RE.findall(prompt)]}
+        # Batched prompt: one JSON object per message line
+        results = []
+        for line in prompt.splitlines():
+            line = line.strip()
+            if line.startswith('{"id"') and '"message"' in line:
+                entry = json.loads(line)
+                results.append({'id': entry['id'], 'transactions': self._transactions(entry['message'])})
+        return {'results': results}
+
+    async def create(self, messages=None, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]['content']
+        self.prompt_chars += sum(len(m['content']) for m in messages)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(max(0.0, self.rng.gauss(self.latency, self.jitter)))
+            if self.rng.random() < self.error_rate:
+                self.errors += 1
+                raise self._error()
+            content = json.dumps(self._answer(prompt), ensure_ascii=False)
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4,
+                                      total_tokens=(len(prompt) + len(content)) // 4)
+            )
+        finally:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'injected_errors': self.errors,
+            'max_in_flight': self.max_in_flight,
+            'avg_prompt_chars': round(self.prompt_chars / self.calls) if self.calls else 0
+        }
+
+class StubAsyncGroq:
+    def __init__(self, **kwargs):
+        self.completions = StubCompletions(**kwargs)
+        self.chat = SimpleNamespace(completions=self.completions)
+
+    async def close(self):
+        pass
+
+def install(service, **kwargs):
+    # Swap the service's Groq client for the stub; returns the stub
+    stub = StubAsyncGroq(**kwargs)
+    service.async_client = stub
+    return stub.completions
@@ -0,0 +1,83 @@
+import os
+import time
+import json
+import asyncio
+import argparse
+import itertools
+import httpx
+
+# POSTs synthetic Telegram updates at a locally running webhook
+# (BOT_MODE=webhook) and reports how fast they are accepted.
+#
+#   python -m benchmarks.webhook_harness --users 20 --messages 10
+#
+# The bot answers these fake chats through the real Bot API, so replies
+# fail (and are logged) unless the chat ids are real; the harness measures
+# intake and processing, not delivery. Use --chat-id with your own Telegram
+# id to see the replies end to end.
+
+MESSAGES = ["coffee 15", "taxi 30", "lunch 55", "دفعت 50 بنزين", "salary 8000", "قهوة ١٥ أمس"]
+
+_update_ids = itertools.count(int(time.time()))
+
+def make_update(chat_id: int, text: str):
+    return {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": next(_update_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"Load{chat_id}"},
+            "text": text,
+        },
+    }
+
+async def run_user(client, url, headers, chat_id, count, latencies, statuses):
+    # One user's updates are sent sequentially, as Telegram would deliver them
+    for i in range(count):
+        body = json.dumps(make_update(chat_id, MESSAGES[i % len(MESSAGES)]))
+        start = time.perf_counter()
+        response = await client.post(url, content=body, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+async def main():
+    parser = argparse.ArgumentParser()
+    default_url = f"http://127.0.0.1:{os.getenv('WEBHOOK_PORT', '8443')}/{os.getenv('WEBHOOK_PATH', 'telegram')}"
+    parser.add_argument('--url', default=default_url)
+    parser.add_argument('--secret', default=os.getenv('WEBHOOK_SECRET', ''))
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=10, help="updates per user")
+    parser.add_argument('--chat-id', type=int, help="send every update from this one chat")
+    args = parser.parse_args()
+
+    headers = {"Content-Type": "application/json"}
+    if args.secret:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = args.secret
+
+    chat_ids = [args.chat_id] if args.chat_id else [900000000 + i for i in range(args.users)]
+    per_user = args.messages if not args.chat_id else args.messages * args.users
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=30) as client:
+        await asyncio.gather(*[
+            run_user(client, args.url, headers, chat_id, per_user, latencies, statuses)
+            for chat_id in chat_ids
+        ])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+    print(json.dumps({
+        "updates": len(latencies),
+        "seconds": round(elapsed, 3),
+        "updates_per_sec": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "status_codes": statuses,
+        "p50_ms": round(pct(0.50), 2),
+        "p95_ms": round(pct(0.95), 2),
+        "p99_ms": round(pct(0.99), 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from datetime import date
+
+# Compares transaction inserts/sec with one commit per message (the default)
+# against the write-behind buffer, with --concurrency messages in flight at
+# once, on a scratch SQLite database (or DATABASE_URL with --configured-db,
+# which adds rows to it).
+#
+#   python -m benchmarks.write_buffer --messages 2000 --concurrency 32
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--configured-db', action='store_true')
+parser.add_argument('--messages', type=int, default=2000)
+parser.add_argument('--rows-per-message', type=int, default=1)
+parser.add_argument('--concurrency', type=int, default=32)
+parser.add_argument('--users', type=int, default=50)
+parser.add_argument('--max-rows', type=int, default=200)
+parser.add_argument('--max-delay-ms', type=int, default=50)
+args = parser.parse_args()
+
+if not args.configured_db:
+    scratch = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{scratch}/write_buffer.db"
+sys.path.append(os.getcwd())
+
+import sqlalchemy as sa
+from src.database import engine, init_db, run_db, Transaction
+from src import repository
+from src.write_buffer import WriteBuffer
+
+def make_rows(n):
+    return [{
+        'type': 'expense', 'category': 'food', 'amount': 12.5,
+        'description': 'benchmark', 'date': date.today()
+    } for _ in range(n)]
+
+def ensure_users():
+    return [profile.id for profile in (
+        repository.get_or_create_user(800000000 + i, f"bench{i}", "Bench") for i in range(args.users)
+    )]
+
+async def run(user_ids, save):
+    queue = asyncio.Queue()
+    for i in range(args.messages):
+        queue.put_nowait(user_ids[i % len(user_ids)])
+    rows = make_rows(args.rows_per_message)
+
+    async def worker():
+        while not queue.empty():
+            await save(queue.get_nowait(), rows)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    return time.perf_counter() - started
+
+def count_rows():
+    with engine.connect() as conn:
+        return conn.execute(sa.select(sa.func.count()).select_from(Transaction.__table__)).scalar()
+
+async def main():
+    init_db()
+    user_ids = await run_db(ensure_users)
+    total = args.messages * args.rows_per_message
+    results = {}
+
+    before = count_rows()
+    elapsed = await run(user_ids, lambda uid, rows: run_db(repository.add_transactions, uid, rows))
+    assert count_rows() - before == total
+    results['per_message_commit'] = {'seconds': round(elapsed, 3), 'rows_per_sec': round(total / elapsed, 1)}
+
+    buffer = WriteBuffer(args.max_rows, args.max_delay_ms / 1000.0)
+    before = count_rows()
+    started = time.perf_counter()
+    await run(user_ids, buffer.add)
+    await buffer.close()
+    elapsed = time.perf_counter() - started
+    assert count_rows() - before == total
+    results['write_buffer'] = {
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(total / elapsed, 1),
+        'flushes': buffer.flushes,
+        'rows_per_flush': round(buffer.stats()['rows_per_flush'], 1)
+    }
+
+    results['speedup'] = round(results['write_buffer']['rows_per_sec'] / results['per_message_commit']['rows_per_sec'], 2)
+    print(json.dumps({
+        'database': engine.url.render_as_string(hide_password=True),
+        'messages': args.messages,
+        'rows_per_message': args.rows_per_message,
+        'concurrency': args.concurrency,
+        **results
+    }, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,23 +1,93 @@
 import json
+import asyncio
+import random
 import logging
-from groq import Groq
+import threading
+import httpx
 from src.config import Config
+from src.local_parser import LocalParser
+from src.parse_cache import build_parse_cache
+from src import metrics
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "You are a specialized accounting data extractor. You convert natural language entries into structured JSON. You support Arabic and English."
+REQUIRED_KEYS = ["type", "category", "amount", "description", "date"]
+
 class AIService:
     def __init__(self):
-        self.client = Groq(api_key=Config.GROQ_API_KEY)
+        # groq (and pydantic under it) is only imported once the service is built
+        from groq import AsyncGroq, APIStatusError, APITimeoutError, APIConnectionError
+        Config.require('GROQ_API_KEY')
+        self._client = None
+        self._retryable_errors = (APIStatusError, APITimeoutError, APIConnectionError)
         self.model = Config.DEFAULT_MODEL
 
-    def parse_transaction(self, message: str, user_language: str = 'en'):
+        # Async path: one keep-alive connection pool shared by every handler.
+        # Retries are done here (not by the SDK) so backoff and the semaphore
+        # cooperate instead of a retrying call holding a slot.
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=Config.GROQ_MAX_CONCURRENCY,
+                max_keepalive_connections=Config.GROQ_MAX_CONCURRENCY
+            ),
+            timeout=httpx.Timeout(Config.GROQ_TIMEOUT)
+        )
+        self.async_client = AsyncGroq(
+            api_key=Config.GROQ_API_KEY,
+            http_client=self._http_client,
+            timeout=Config.GROQ_TIMEOUT,
+            max_retries=0
+        )
+        self._semaphore = asyncio.Semaphore(Config.GROQ_MAX_CONCURRENCY)
+
+        # Simple entries are parsed locally and never reach Groq
+        self.local_parser = LocalParser(Config.LOCAL_PARSER_MIN_CONFIDENCE) if Config.LOCAL_PARSER_ENABLED else None
+        # Repeated entries ("coffee 15") reuse an earlier completion
+        self.cache = build_parse_cache(Config)
+        # Optional: merge concurrent requests from different users into one completion
+        self.batcher = ParseBatcher(self, Config.PARSE_BATCH_WINDOW_MS / 1000, Config.PARSE_BATCH_MAX_SIZE) \
+            if Config.PARSE_BATCH_ENABLED else None
+
+    @property
+    def client(self):
+        # Sync client, only used by parse_transactions() (scripts, not the bot)
+        if self._client is None:
+            from groq import Groq
+            self._client = Groq(api_key=Config.GROQ_API_KEY)
+        return self._client
+
+    def _parse_locally(self, message: str):
+        if not self.local_parser:
+            return None
+        items = self.local_parser.parse(message)
+        if items:
+            logger.debug("Local parser hit: %s", items)
+        stats = self.local_parser.stats()
+        if (stats['hits'] + stats['misses']) % 100 == 0:
+            logger.info("Local parser hit ratio: %.1f%% (%d LLM calls saved)", stats['hit_ratio'] * 100, stats['hits'])
+        return items
+
+    def fast_path_stats(self):
+        if not self.local_parser:
+            return {'hits': 0, 'misses': 0, 'hit_ratio': 0.0}
+        return self.local_parser.stats()
+
+    def cache_stats(self):
+        if not self.cache:
+            return {'hits': 0, 'misses': 0, 'hit_rate': 0.0, 'size': 0}
+        return self.cache.stats()
+
+    def _build_messages(self, message: str, user_language: str):
         today = datetime.now().strftime('%Y-%m-%d')
         prompt = f"""
         Analyze the following personal accounting message in {'Arabic' if user_language == 'ar' else 'English'}:
         "{message}"
 
-        Return ONLY a JSON object with these keys:
+        The message may describe one transaction or several (e.g. "coffee 15, taxi 30, lunch 55").
+        Return ONLY a JSON object with a single key "transactions" holding a list with one object per transaction, each with these keys:
         - "type": either "income" or "expense"
         - "category": the category of transaction (in English, e.g., "food", "bills", "salary", "transport", "other")
         - "amount": the numeric amount only
@@ -26,62 +96,344 @@ class AIService:
 
         Example Output for "Spent 50 on coffee":
         {{
-            "type": "expense",
-            "category": "food",
-            "amount": 50,
-            "description": "Coffee",
-            "date": "{today}"
+            "transactions": [
+                {{
+                    "type": "expense",
+                    "category": "food",
+                    "amount": 50,
+                    "description": "Coffee",
+                    "date": "{today}"
+                }}
+            ]
         }}
 
-        Example Output for "سددت فاتورة كهرباء 320 ريال":
+        Example Output for "سددت فاتورة كهرباء 320 ريال وتاكسي 30":
         {{
-            "type": "expense",
-            "category": "bills",
-            "amount": 320,
-            "description": "Electricity bill",
-            "date": "{today}"
+            "transactions": [
+                {{
+                    "type": "expense",
+                    "category": "bills",
+                    "amount": 320,
+                    "description": "Electricity bill",
+                    "date": "{today}"
+                }},
+                {{
+                    "type": "expense",
+                    "category": "transport",
+                    "amount": 30,
+                    "description": "Taxi",
+                    "date": "{today}"
+                }}
+            ]
         }}
 
         Strict rules:
         1. Return ONLY valid JSON.
         2. No explanations or extra text.
         3. Ensure the keys are exactly as requested.
+        4. Never merge separate transactions into one.
         """
 
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _load_json(self, response_content):
+        logger.debug("Raw AI response: %s", response_content)
+        
+        # Remove markdown code blocks if present
+        clean_content = response_content.strip()
+        if clean_content.startswith("```"):
+            clean_content = clean_content.split("\n", 1)[1]
+        if clean_content.endswith("```"):
+            clean_content = clean_content.rsplit("\n", 1)[0]
+        clean_content = clean_content.strip()
+
+        return json.loads(clean_content)
+
+    def _validate_items(self, items):
+        if not isinstance(items, list):
+            return None
+
+        # Simple validation to ensure keys exist
+        valid = []
+        for item in items[:Config.MAX_TRANSACTIONS_PER_MESSAGE]:
+            if isinstance(item, dict) and all(key in item for key in REQUIRED_KEYS):
+                valid.append(item)
+            else:
+                logger.debug("Missing keys in AI response: %s", item)
+        return valid or None
+
+    def _parse_response(self, response_content):
+        data = self._load_json(response_content)
+        if isinstance(data, dict) and 'transactions' in data:
+            return self._validate_items(data['transactions'])
+        return self._validate_items([data])  # a bare single object is still accepted
+
+    def parse_transactions(self, message: str, user_language: str = 'en'):
+        local = self._parse_locally(message)
+        if local:
+            return local
+        if self.cache:
+            cached = self.cache.get(message, user_language)
+            if cached:
+                return cached
         try:
             completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are a specialized accounting data extractor. You convert natural language entries into structured JSON. You support Arabic and English."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._build_messages(message, user_language),
                 model=self.model,
                 temperature=0.0,
                 response_format={"type": "json_object"}
             )
-            
-            response_content = completion.choices[0].message.content
-            print(f"DEBUG - Raw AI Response: {response_content}")
-            
-            # Remove markdown code blocks if present
-            clean_content = response_content.strip()
-            if clean_content.startswith("```"):
-                clean_content = clean_content.split("\n", 1)[1]
-            if clean_content.endswith("```"):
-                clean_content = clean_content.rsplit("\n", 1)[0]
-            clean_content = clean_content.strip()
-
-            data = json.loads(clean_content)
-            
-            # Simple validation to ensure keys exist
-            required_keys = ["type", "category", "amount", "description", "date"]
-            if all(key in data for key in required_keys):
-                return data
-            else:
-                print(f"DEBUG - Missing keys in AI response: {data}")
-                return None
+            items = self._parse_response(completion.choices[0].message.content)
+            if items and self.cache:
+                self.cache.put(message, user_language, items)
+            return items
                 
         except Exception as e:
-            print(f"DEBUG - Error calling Groq API or parsing: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error calling Groq API or parsing: {e}")
+            return None
+
+    def parse_transaction(self, message: str, user_language: str = 'en'):
+        items = self.parse_transactions(message, user_language)
+        return items[0] if items else None
+
+    async def _create_completion(self, messages):
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    started = time.perf_counter()
+                    try:
+                        completion = await self.async_client.chat.completions.create(
+                            messages=messages,
+                            model=self.model,
+                            temperature=0.0,
+                            response_format={"type": "json_object"},
+                            timeout=Config.GROQ_TIMEOUT
+                        )
+                    except Exception:
+                        metrics.groq_latency.observe(time.perf_counter() - started, outcome='error')
+                        raise
+                    metrics.groq_latency.observe(time.perf_counter() - started, outcome='ok')
+                    metrics.record_groq_usage(completion)
+                    return completion
+            except self._retryable_errors as e:
+                status = getattr(e, 'status_code', None)
+                retryable = status is None or status == 429 or status >= 500
+                if not retryable or attempt >= Config.GROQ_MAX_RETRIES:
+                    raise
+                delay = Config.GROQ_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, Config.GROQ_BACKOFF_BASE)
+                # Honour the server's hint on rate limits
+                retry_after = None
+                if status == 429 and getattr(e, 'response', None) is not None:
+                    retry_after = e.response.headers.get('retry-after')
+                if retry_after:
+                    try:
+                        delay = max(delay, float(retry_after))
+                    except ValueError:
+                        pass
+                logger.warning("Groq call failed (%s), retrying in %.2fs", status or type(e).__name__, delay)
+                metrics.groq_retries.inc(reason=str(status) if status else 'connection')
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _cache_call(self, func, *args):
+        # The SQLite backend touches disk; keep it off the event loop
+        if self.cache.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def _complete_single(self, message: str, user_language: str):
+        completion = await self._create_completion(self._build_messages(message, user_language))
+        return self._parse_response(completion.choices[0].message.content)
+
+    async def aparse_transactions(self, message: str, user_language: str = 'en'):
+        local = self._parse_locally(message)
+        if local:
+            metrics.parse_results.inc(source='local', outcome='ok')
+            return local
+        if self.cache:
+            cached = await self._cache_call(self.cache.get, message, user_language)
+            if cached:
+                metrics.parse_results.inc(source='cache', outcome='ok')
+                return cached
+        source = 'batch' if self.batcher else 'llm'
+        try:
+            if self.batcher:
+                items = await self.batcher.submit(message, user_language)
+            else:
+                items = await self._complete_single(message, user_language)
+            if items and self.cache:
+                await self._cache_call(self.cache.put, message, user_language, items)
+            metrics.parse_results.inc(source=source, outcome='ok' if items else 'empty')
+            return items
+
+        except Exception as e:
+            metrics.parse_results.inc(source=source, outcome='error')
+            logger.exception(f"Error calling Groq API or parsing: {e}")
+            return None
+
+    async def aparse_transaction(self, message: str, user_language: str = 'en'):
+        items = await self.aparse_transactions(message, user_language)
+        return items[0] if items else None
+
+    async def acategorize(self, descriptions, categories):
+        # Statement imports: one completion categorises a whole list of
+        # descriptions. Returns {index: category}; unanswered indexes are left out.
+        lines = "\n".join(f"{i}: {d}" for i, d in enumerate(descriptions))
+        prompt = f"""
+        Categorize each of these bank statement lines (id: description):
+        {lines}
+
+        Allowed categories: {", ".join(categories)}. Use "other" when unsure.
+        Return ONLY a JSON object of the form {{"results": [{{"id": 0, "category": "food"}}]}} with one result per id.
+        """
+        completion = await self._create_completion([
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ])
+        data = self._load_json(completion.choices[0].message.content)
+        results = {}
+        for item in (data.get('results') if isinstance(data, dict) else None) or []:
+            if not isinstance(item, dict):
+                continue
+            index, category = item.get('id'), str(item.get('category', '')).lower()
+            if isinstance(index, int) and 0 <= index < len(descriptions) and category in categories:
+                results[index] = category
+        return results
+
+    async def aclose(self):
+        await self.async_client.close()
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_ai_service(create: bool = True):
+    # The shared service is built on first use (or by warm-up after startup),
+    # not at import; create=False returns None if it doesn't exist yet
+    global _service
+    if _service is None and create:
+        with _service_lock:
+            if _service is None:
+                _service = AIService()
+    return _service
+
+async def close_ai_service():
+    if _service is not None:
+        await _service.aclose()
+
+class ParseBatcher:
+    # Collects parse requests for a short window (or until max_size are
+    # queued) and sends them as one multi-item completion, so the long
+    # instruction prompt is paid once per batch instead of once per message.
+    # Items the batch answer does not cover cleanly are retried one by one.
+
+    def __init__(self, service, window: float, max_size: int):
+        self.service = service
+        self.window = window
+        self.max_size = max_size
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.fallbacks = 0
+
+    @property
+    def queue_depth(self):
+        return len(self._pending)
+
+    async def submit(self, message: str, user_language: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((message, user_language, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._dispatch(batch))
+
+    def _build_messages(self, batch):
+        today = datetime.now().strftime('%Y-%m-%d')
+        entries = "\n".join(
+            json.dumps({"id": i, "language": 'Arabic' if lang == 'ar' else 'English', "message": message}, ensure_ascii=False)
+            for i, (message, lang, _) in enumerate(batch)
+        )
+        prompt = f"""
+        Analyze each of the following personal accounting messages independently. Each line is one message with its id and language:
+        {entries}
+
+        Each message may describe one transaction or several. Return ONLY a JSON object with a single key "results":
+        a list with one object per message, each with "id" (the message id) and "transactions" (a list with one object per transaction, each with these keys):
+        - "type": either "income" or "expense"
+        - "category": the category of transaction (in English, e.g., "food", "bills", "salary", "transport", "other")
+        - "amount": the numeric amount only
+        - "description": exactly what the user wrote but summarized (normalized to English for storage if possible, otherwise keep context)
+        - "date": the date of transaction in YYYY-MM-DD format. If no date is mentioned, use today's date: "{today}"
+
+        Example Output for messages 0: "Spent 50 on coffee" and 1: "استلمت راتب 8000":
+        {{
+            "results": [
+                {{"id": 0, "transactions": [{{"type": "expense", "category": "food", "amount": 50, "description": "Coffee", "date": "{today}"}}]}},
+                {{"id": 1, "transactions": [{{"type": "income", "category": "salary", "amount": 8000, "description": "Salary", "date": "{today}"}}]}}
+            ]
+        }}
+
+        Strict rules:
+        1. Return ONLY valid JSON.
+        2. No explanations or extra text.
+        3. Return exactly one result per id and never mix transactions between messages.
+        """
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _parse_results(self, response_content, size):
+        data = self.service._load_json(response_content)
+        results = {}
+        for result in data.get('results', []) if isinstance(data, dict) else []:
+            if not isinstance(result, dict):
+                continue
+            idx = result.get('id')
+            if isinstance(idx, int) and 0 <= idx < size and idx not in results:
+                items = self.service._validate_items(result.get('transactions'))
+                # A malformed answer for one id is left out, so it is retried
+                if items:
+                    results[idx] = items
+        return results
+
+    async def _single(self, message, user_language):
+        try:
+            return await self.service._complete_single(message, user_language)
+        except Exception as e:
+            logger.warning(f"Error calling Groq API or parsing: {e}")
             return None
+
+    async def _dispatch(self, batch):
+        results = {}
+        if len(batch) > 1:
+            try:
+                completion = await self.service._create_completion(self._build_messages(batch))
+                results = self._parse_results(completion.choices[0].message.content, len(batch))
+                self.batches += 1
+            except Exception as e:
+                logger.warning(f"Batch parse failed, falling back to single calls: {e}")
+
+        # Ids the batch answer skipped or got wrong (or everything, if it was malformed)
+        missing = [i for i in range(len(batch)) if i not in results]
+        self.fallbacks += len(missing) if len(batch) > 1 else 0
+        singles = await asyncio.gather(*[self._single(batch[i][0], batch[i][1]) for i in missing])
+        results.update(zip(missing, singles))
+
+        for i, (_, _, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(results.get(i))
@@ -1,23 +1,430 @@
-import shutil
 import os
-from datetime import datetime
+import sys
+import json
+import gzip
+import shutil
+import sqlite3
+import logging
+import argparse
+import tempfile
+import time
+import asyncio
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+import sqlalchemy as sa
 from src.config import Config
+from src.database import engine, Base
 
-def backup_db():
-    db_path = Config.DATABASE_URL.replace("sqlite:///./", "./")
-    if not os.path.exists(db_path):
-        print(f"Database file {db_path} not found.")
-        return
+logger = logging.getLogger(__name__)
+
+# Online backups that never stop the bot.
+#
+# snapshot (SQLite only): the sqlite3 online backup API copies the live
+#   database a few pages at a time, sleeping between steps, so the writer is
+#   only ever blocked for one short step. Every commit from another
+#   connection restarts the copy, so after BACKUP_SNAPSHOT_MAX_RESTARTS
+#   restarts or BACKUP_SNAPSHOT_TIMEOUT_S seconds a busy database gets a
+#   dump instead. The copy is written uncompressed to a temporary file in
+#   BACKUP_DIR (so it needs free space for the database plus its gzip),
+#   integrity-checked and then gzipped to
+#   BACKUP_DIR/accounting_bot_<timestamp>.db.gz.
+# dump (SQLite and Postgres): a logical, gzipped JSON-lines dump of every
+#   table read inside one transaction (a consistent snapshot), streamed in
+#   batches to BACKUP_DIR/accounting_bot_<timestamp>.jsonl.gz. It can be
+#   restored into either database.
+#
+# Files are written under a .partial name and renamed when complete, and
+# only the newest BACKUP_KEEP of each kind are kept.
+#
+#   python -m src.backup [auto|snapshot|dump]
+#   python -m src.backup list
+#   python -m src.backup verify <file>
+#   python -m src.backup restore <file> --target <database url> [--force]
+
+PREFIX = "accounting_bot_"
+SNAPSHOT_SUFFIX = ".db.gz"
+DUMP_SUFFIX = ".jsonl.gz"
+DUMP_FORMAT = "smart-mezan-dump"
+CHUNK = 1024 * 1024
+INSERT_BATCH = 1000
+
+_backup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+
+class BackupError(Exception):
+    pass
+
+class SnapshotAborted(BackupError):
+    # The database kept changing under the online copy
+    pass
+
+def _is_sqlite(bind):
+    return bind.dialect.name == 'sqlite'
 
-    backup_dir = "backups"
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
+def _sqlite_path(bind):
+    path = bind.url.database
+    if not path or path == ':memory:':
+        raise BackupError("SQLite database has no file to back up")
+    return path
 
+def _new_path(suffix):
+    os.makedirs(Config.BACKUP_DIR, exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = f"{backup_dir}/accounting_bot_{timestamp}.db"
-    
-    shutil.copy2(db_path, backup_file)
-    print(f"Backup created: {backup_file}")
+    return os.path.join(Config.BACKUP_DIR, f"{PREFIX}{timestamp}{suffix}")
+
+def _gzip_file(src_path, dest_path):
+    with open(src_path, 'rb') as src, gzip.open(dest_path, 'wb', compresslevel=6) as dest:
+        shutil.copyfileobj(src, dest, CHUNK)
+
+def _gunzip_file(src_path, dest_path):
+    with gzip.open(src_path, 'rb') as src, open(dest_path, 'wb') as dest:
+        shutil.copyfileobj(src, dest, CHUNK)
+
+def _integrity_check(path):
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise BackupError(f"integrity_check failed: {result}")
+
+def snapshot(bind=engine):
+    # Blocking: online, page-stepped copy of a live SQLite database
+    src_path = _sqlite_path(bind)
+    if not os.path.exists(src_path):
+        raise BackupError(f"Database file {src_path} not found.")
+    dest_path = _new_path(SNAPSHOT_SUFFIX)
+    fd, tmp_path = tempfile.mkstemp(suffix='.db', dir=Config.BACKUP_DIR)
+    os.close(fd)
+    try:
+        src = sqlite3.connect(f"file:{src_path}?mode=ro", uri=True)
+        dest = sqlite3.connect(tmp_path)
+        deadline = time.monotonic() + Config.BACKUP_SNAPSHOT_TIMEOUT_S
+        restarts = 0
+        last_remaining = None
+
+        def progress(status, remaining, total):
+            # Raising here makes sqlite3 abandon the copy
+            nonlocal restarts, last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts > Config.BACKUP_SNAPSHOT_MAX_RESTARTS:
+                    raise SnapshotAborted(f"snapshot restarted {restarts} times by concurrent writes")
+            last_remaining = remaining
+            if time.monotonic() > deadline:
+                raise SnapshotAborted(f"snapshot not finished after {Config.BACKUP_SNAPSHOT_TIMEOUT_S}s")
+            # sqlite3's own sleep= only applies after a busy step; this is
+            # the pause between steps that lets writers in
+            if remaining:
+                time.sleep(Config.BACKUP_STEP_SLEEP_MS / 1000.0)
+
+        try:
+            # Each step holds the read lock for BACKUP_PAGES_PER_STEP pages
+            # only; if the database changes between steps SQLite restarts the
+            # copy, so the result is always a consistent snapshot
+            src.backup(dest, pages=Config.BACKUP_PAGES_PER_STEP, progress=progress,
+                       sleep=Config.BACKUP_STEP_SLEEP_MS / 1000.0)
+        finally:
+            dest.close()
+            src.close()
+        _integrity_check(tmp_path)
+        _gzip_file(tmp_path, dest_path + '.partial')
+        os.replace(dest_path + '.partial', dest_path)
+    finally:
+        for path in (tmp_path, dest_path + '.partial'):
+            if os.path.exists(path):
+                os.remove(path)
+    return dest_path
+
+def _tables():
+    # Parents before children, so a restore never violates a foreign key
+    return Base.metadata.sorted_tables
+
+def _encode(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _decoder(column):
+    if isinstance(column.type, sa.DateTime):
+        return lambda v: None if v is None else datetime.fromisoformat(v)
+    if isinstance(column.type, sa.Date):
+        return lambda v: None if v is None else date.fromisoformat(v)
+    return None
+
+def _schema_version(conn):
+    from src.migrations import schema_version
+    if not sa.inspect(conn).has_table(schema_version.name):
+        return 0
+    return conn.execute(sa.select(sa.func.max(schema_version.c.version))).scalar() or 0
+
+def dump(bind=engine):
+    # Blocking: logical dump of every table from one consistent read
+    dest_path = _new_path(DUMP_SUFFIX)
+    partial = dest_path + '.partial'
+    conn = bind.connect()
+    if bind.dialect.name == 'postgresql':
+        conn = conn.execution_options(isolation_level='REPEATABLE READ')
+    try:
+        with conn.begin(), gzip.open(partial, 'wt', encoding='utf-8', compresslevel=6) as out:
+            if _is_sqlite(bind):
+                # pysqlite only opens a transaction before writes; without an
+                # explicit BEGIN every SELECT would see a different snapshot
+                conn.exec_driver_sql("BEGIN")
+            existing = set(sa.inspect(conn).get_table_names())
+            header = {
+                'format': DUMP_FORMAT,
+                'version': 1,
+                'schema_version': _schema_version(conn),
+                'dialect': bind.dialect.name,
+                'created_at': datetime.utcnow().isoformat()
+            }
+            out.write(json.dumps(header) + '\n')
+            for table in _tables():
+                if table.name not in existing:
+                    continue
+                columns = [c.name for c in table.columns]
+                out.write(json.dumps({'table': table.name, 'columns': columns}) + '\n')
+                result = conn.execution_options(stream_results=True, yield_per=Config.EXPORT_BATCH_SIZE).execute(
+                    sa.select(*table.columns).order_by(*table.primary_key.columns)
+                )
+                rows = 0
+                for row in result:
+                    out.write(json.dumps([_encode(v) for v in row], ensure_ascii=False) + '\n')
+                    rows += 1
+                out.write(json.dumps({'end': table.name, 'rows': rows}) + '\n')
+        os.replace(partial, dest_path)
+    finally:
+        conn.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+    return dest_path
+
+def rotate(keep=None):
+    keep = max(1, Config.BACKUP_KEEP if keep is None else keep)
+    removed = []
+    for suffix in (SNAPSHOT_SUFFIX, DUMP_SUFFIX):
+        # Timestamped names sort chronologically
+        for name in list_backups(suffix)[:-keep]:
+            os.remove(os.path.join(Config.BACKUP_DIR, name))
+            removed.append(name)
+    return removed
+
+def list_backups(suffix=None):
+    if not os.path.isdir(Config.BACKUP_DIR):
+        return []
+    suffixes = (suffix,) if suffix else (SNAPSHOT_SUFFIX, DUMP_SUFFIX)
+    return sorted(
+        name for name in os.listdir(Config.BACKUP_DIR)
+        if name.startswith(PREFIX) and name.endswith(suffixes)
+    )
+
+def run_backup(method=None, bind=engine):
+    # Blocking: one backup plus rotation; the scheduled job calls this
+    method = method or Config.BACKUP_METHOD
+    if method == 'auto':
+        method = 'snapshot' if _is_sqlite(bind) else 'dump'
+    if method == 'snapshot':
+        try:
+            path = snapshot(bind)
+        except SnapshotAborted as e:
+            logger.warning(f"{e}; taking a logical dump instead")
+            path = dump(bind)
+    elif method == 'dump':
+        path = dump(bind)
+    else:
+        raise BackupError(f"Unknown backup method {method}")
+    removed = rotate()
+    logger.info(f"Backup created: {path} ({os.path.getsize(path)} bytes), rotated out {len(removed)}")
+    return path
+
+def _read_dump(path):
+    # Yields the header, then each table's start record, its rows (lists)
+    # and its end record, streaming from the gzip file
+    with gzip.open(path, 'rt', encoding='utf-8') as src:
+        header = json.loads(src.readline())
+        if header.get('format') != DUMP_FORMAT:
+            raise BackupError(f"{path} is not a database dump")
+        yield header
+        for line in src:
+            yield json.loads(line)
+
+def _reset_sequences(conn):
+    if conn.dialect.name != 'postgresql':
+        return
+    for table in _tables():
+        if 'id' in table.columns and table.c.id.autoincrement is not False:
+            conn.execute(sa.text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+            ))
+
+def restore_dump(path, target_url, force=False):
+    # Blocking: loads a dump into target_url (schema created by the
+    # migrations); returns {table: rows} as recorded in the dump
+    from src.migrations import run_migrations, MIGRATIONS
+    target = sa.create_engine(target_url)
+    try:
+        code_version = max(m[0] for m in MIGRATIONS)
+        run_migrations(target)
+        tables = {t.name: t for t in _tables()}
+        expected = {}
+        with target.begin() as conn:
+            if not force and any(conn.execute(sa.select(sa.func.count()).select_from(t)).scalar() for t in tables.values()):
+                raise BackupError("Target database is not empty (use --force to replace its data)")
+            for table in reversed(_tables()):
+                conn.execute(table.delete())
+            table, columns, decoders, batch = None, None, None, []
+            records = _read_dump(path)
+            header = next(records)
+            if header['schema_version'] > code_version:
+                raise BackupError(f"Dump is at schema {header['schema_version']}, this code only knows {code_version}")
+            for record in records:
+                if isinstance(record, list):
+                    if table is None:
+                        continue
+                    batch.append({
+                        name: (decode(value) if decode else value)
+                        for name, value, decode in zip(columns, record, decoders) if name is not None
+                    })
+                    if len(batch) >= INSERT_BATCH:
+                        conn.execute(table.insert(), batch)
+                        batch = []
+                elif 'table' in record:
+                    # Unknown tables (e.g. from newer code) are skipped, and so
+                    # are columns this schema no longer has
+                    table = tables.get(record['table'])
+                    columns = [c if table is not None and c in table.columns else None for c in record['columns']]
+                    decoders = [_decoder(table.columns[c]) if c else None for c in columns] if table is not None else None
+                else:
+                    if batch:
+                        conn.execute(table.insert(), batch)
+                        batch = []
+                    if table is not None:
+                        expected[record['end']] = record['rows']
+                    table = None
+            # Dumps taken before the global stats existed get them recomputed
+            if 'stat_counters' in tables and 'stat_counters' not in expected:
+                from src.stats import rebuild as rebuild_stats
+                rebuild_stats(conn)
+            _reset_sequences(conn)
+        return expected
+    finally:
+        target.dispose()
+
+def restore_snapshot(path, target_url, force=False):
+    # Blocking: a snapshot is a whole SQLite file; only SQLite targets
+    url = sa.engine.make_url(target_url)
+    if not url.drivername.startswith('sqlite') or not url.database or url.database == ':memory:':
+        raise BackupError("Snapshots can only be restored to a SQLite file; use a dump for other databases")
+    if os.path.exists(url.database) and not force:
+        raise BackupError(f"{url.database} exists (use --force to replace it)")
+    partial = url.database + '.partial'
+    _gunzip_file(path, partial)
+    try:
+        _integrity_check(partial)
+        os.replace(partial, url.database)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return None
+
+def restore(path, target_url, force=False):
+    if path.endswith(SNAPSHOT_SUFFIX):
+        return restore_snapshot(path, target_url, force)
+    return restore_dump(path, target_url, force)
+
+def verify(path):
+    # Blocking: restores the backup into a scratch SQLite file and checks it
+    scratch = tempfile.mkdtemp(prefix="backup_verify_")
+    db_path = os.path.join(scratch, "verify.db")
+    url = f"sqlite:///{db_path}"
+    report = {'file': path, 'checks': {}, 'ok': False}
+    try:
+        expected = restore(path, url)
+        _integrity_check(db_path)
+        report['checks']['integrity'] = 'ok'
+        target = sa.create_engine(url)
+        try:
+            with target.connect() as conn:
+                existing = set(sa.inspect(conn).get_table_names())
+                counts = {
+                    t.name: conn.execute(sa.select(sa.func.count()).select_from(t)).scalar()
+                    for t in _tables() if t.name in existing
+                }
+                report['schema_version'] = _schema_version(conn)
+                report['counts'] = counts
+                if expected is not None:
+                    mismatched = {k: (v, counts.get(k)) for k, v in expected.items() if counts.get(k) != v}
+                    if mismatched:
+                        raise BackupError(f"Row counts differ from the dump: {mismatched}")
+                    report['checks']['row_counts'] = 'ok'
+                report['checks']['rollups'] = _check_rollups(conn, existing)
+        finally:
+            target.dispose()
+        report['ok'] = True
+    except Exception as e:
+        report['error'] = str(e)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return report
+
+def _check_rollups(conn, existing):
+    # The rollups must add up to the raw transactions they summarise
+    from src.database import Transaction, DailyRollup
+    if DailyRollup.__tablename__ not in existing:
+        return 'skipped'
+    raw = conn.execute(sa.select(sa.func.count(), sa.func.coalesce(sa.func.sum(Transaction.amount), 0))).one()
+    rolled = conn.execute(sa.select(
+        sa.func.coalesce(sa.func.sum(DailyRollup.count), 0), sa.func.coalesce(sa.func.sum(DailyRollup.total), 0)
+    )).one()
+    if raw[0] != rolled[0] or abs(raw[1] - rolled[1]) > 0.01:
+        raise BackupError(f"Rollups {tuple(rolled)} do not match transactions {tuple(raw)}")
+    return 'ok'
+
+async def backup_job(context):
+    # JobQueue callback: runs on its own thread so backups never overlap
+    # and never occupy the DB workers
+    from src.write_buffer import write_buffer
+    await write_buffer.flush()
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(_backup_executor, run_backup)
+    except Exception as e:
+        logger.error(f"Scheduled backup failed: {e}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.backup")
+    parser.add_argument('command', nargs='?', default='auto',
+                        choices=['auto', 'snapshot', 'dump', 'list', 'verify', 'restore'])
+    parser.add_argument('file', nargs='?')
+    parser.add_argument('--target', help="database URL to restore into")
+    parser.add_argument('--force', action='store_true', help="replace existing data in the target")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'list':
+            for name in list_backups():
+                print(name)
+        elif args.command == 'verify':
+            if not args.file:
+                parser.error("verify needs a backup file")
+            report = verify(args.file)
+            print(json.dumps(report, indent=2))
+            return 0 if report['ok'] else 1
+        elif args.command == 'restore':
+            if not args.file or not args.target:
+                parser.error("restore needs a backup file and --target")
+            # Stop the bot (or point --target at a fresh database) first
+            restore(args.file, args.target, force=args.force)
+            print(f"Restored {args.file} into {sa.engine.make_url(args.target).render_as_string(hide_password=True)}")
+        else:
+            print(f"Backup created: {run_backup(args.command)}")
+    except BackupError as e:
+        print(f"Backup error: {e}")
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    backup_db()
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
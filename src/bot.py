@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, filters
+from src.config import Config
+from src.database import init_db
+from src.handlers import start, language_choice, set_limit_handler, handle_message, digest_handler, admin_approve, admin_deny, admin_list_users, admin_users_callback, admin_stats
+
+# Setup logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+from src.main_logic import today_report, week_report, month_report, export_excel_cmd, import_document
+from src.ai_service import get_ai_service, close_ai_service
+from src.update_processor import PerChatUpdateProcessor
+from src.rate_limit import OutboundRateLimiter
+from src.write_buffer import write_buffer
+from src.backup import backup_job
+from src.digest import digest_job, digest_time
+from src import metrics
+from src.metrics import track_handler
+
+def _warm_ai_service():
+    try:
+        get_ai_service()
+    except Exception as e:
+        logging.error(f"AI service warm-up failed: {e}")
+
+async def post_init(application):
+    # Build the AI service (groq import, HTTP clients) in the background so
+    # polling starts without waiting for it
+    asyncio.get_running_loop().run_in_executor(None, _warm_ai_service)
+    # Start the chart workers now rather than on the first report
+    if Config.CHARTS_ENABLED:
+        from src import charts
+        charts.warm_up()
+
+async def post_shutdown(application):
+    # Commit anything still sitting in the write buffer
+    await write_buffer.close()
+    # Release the pooled Groq HTTP connections
+    await close_ai_service()
+    if Config.CHARTS_ENABLED:
+        from src import charts
+        charts.shutdown()
+
+async def report_callback(update, context):
+    query = update.callback_query
+    await query.answer()
+    
+    if query.data == 'rep_today':
+        await today_report(update, context)
+    elif query.data == 'rep_week':
+        await week_report(update, context)
+    elif query.data == 'rep_month':
+        await month_report(update, context)
+    elif query.data == 'nav_limit':
+        from src.handlers import set_limit_handler
+        await set_limit_handler(update, context)
+    elif query.data == 'nav_export':
+        await export_excel_cmd(update, context)
+
+def build_application():
+    # Initialize DB
+    init_db()
+    
+    # Build application
+    # Updates from different chats run concurrently; each chat stays in order
+    application = (
+        ApplicationBuilder()
+        .token(Config.TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(PerChatUpdateProcessor(Config.UPDATE_WORKERS, Config.UPDATE_QUEUE_LIMIT))
+        # Keep replies/edits within Telegram's global and per-chat send limits
+        .rate_limiter(OutboundRateLimiter(
+            private_chat_rate=Config.TELEGRAM_PRIVATE_CHAT_RATE,
+            private_chat_burst=Config.TELEGRAM_PRIVATE_CHAT_BURST,
+            overall_max_rate=Config.TELEGRAM_GLOBAL_RATE,
+            overall_time_period=1,
+            group_max_rate=Config.TELEGRAM_GROUP_RATE_PER_MINUTE,
+            group_time_period=60
+        ))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    
+    # Handlers
+    application.add_handler(CommandHandler('start', track_handler(start)))
+    application.add_handler(CallbackQueryHandler(track_handler(language_choice), pattern='^lang_'))
+    application.add_handler(CallbackQueryHandler(track_handler(report_callback), pattern='^(rep_|nav_)'))
+    application.add_handler(CommandHandler('setlimit', track_handler(set_limit_handler)))
+    application.add_handler(CommandHandler('today', track_handler(today_report)))
+    application.add_handler(CommandHandler('week', track_handler(week_report)))
+    application.add_handler(CommandHandler('month', track_handler(month_report)))
+    application.add_handler(CommandHandler('report', track_handler(month_report)))
+    application.add_handler(CommandHandler('export', track_handler(export_excel_cmd)))
+    application.add_handler(CommandHandler('digest', track_handler(digest_handler)))
+    
+    # Admin commands
+    application.add_handler(CommandHandler('approve', track_handler(admin_approve)))
+    application.add_handler(CommandHandler('deny', track_handler(admin_deny)))
+    application.add_handler(CommandHandler('users', track_handler(admin_list_users)))
+    application.add_handler(CallbackQueryHandler(track_handler(admin_users_callback), pattern='^usr:'))
+    application.add_handler(CommandHandler('stats', track_handler(admin_stats)))
+    
+    application.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), track_handler(handle_message)))
+    # CSV/XLSX bank statements to import
+    application.add_handler(MessageHandler(filters.Document.ALL, track_handler(import_document)))
+
+    # Online database backups inside the bot process
+    if Config.BACKUP_ENABLED:
+        if application.job_queue:
+            interval = Config.BACKUP_INTERVAL_HOURS * 3600
+            application.job_queue.run_repeating(backup_job, interval=interval, first=min(interval, 600), name='backup')
+        else:
+            logging.warning("BACKUP_ENABLED but the job queue is unavailable (install python-telegram-bot[job-queue])")
+
+    # Opt-in end-of-day digest; shortly after startup, finish a run a restart interrupted
+    if Config.DIGEST_ENABLED:
+        if application.job_queue:
+            application.job_queue.run_daily(digest_job, time=digest_time(), name='digest')
+            application.job_queue.run_once(digest_job, when=30, data={'resume_only': True}, name='digest_resume')
+        else:
+            logging.warning("DIGEST_ENABLED but the job queue is unavailable (install python-telegram-bot[job-queue])")
+    return application
+
+def main():
+    Config.require('TELEGRAM_BOT_TOKEN', 'GROQ_API_KEY')
+    application = build_application()
+
+    # Prometheus-format metrics on a local port
+    if Config.METRICS_ENABLED:
+        metrics.register_default_collectors(application.update_processor)
+        metrics.start_http_server(Config.METRICS_HOST, Config.METRICS_PORT)
+    
+    if Config.BOT_MODE == 'webhook':
+        # Local HTTP server for a reverse proxy to forward Telegram's POSTs to
+        print(f"Bot is running (webhook on {Config.WEBHOOK_LISTEN}:{Config.WEBHOOK_PORT}/{Config.WEBHOOK_PATH})...")
+        application.run_webhook(
+            listen=Config.WEBHOOK_LISTEN,
+            port=Config.WEBHOOK_PORT,
+            url_path=Config.WEBHOOK_PATH,
+            webhook_url=f"{Config.WEBHOOK_URL.rstrip('/')}/{Config.WEBHOOK_PATH}" if Config.WEBHOOK_URL else None,
+            secret_token=Config.WEBHOOK_SECRET or None,
+            max_connections=Config.WEBHOOK_MAX_CONNECTIONS
+        )
+    else:
+        print("Bot is running...")
+        application.run_polling()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+import sqlalchemy as sa
+from src.database import session_scope, Transaction
+
+# Running per-user expense totals for the current day, week and month so the
+# over-limit check after each insert needs no SUM() query. A user's totals
+# are warmed from one grouped query the first time they are needed, then
+# kept current by record() on every insert.
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+class _Totals:
+    __slots__ = ('anchor', 'day', 'week', 'month')
+
+    def __init__(self, anchor, day=0.0, week=0.0, month=0.0):
+        self.anchor = anchor
+        self.day = day
+        self.week = week
+        self.month = month
+
+    def roll_to(self, today: date):
+        # Date boundary: reset only the periods that actually ended
+        if today == self.anchor:
+            return
+        if _week_start(today) != _week_start(self.anchor):
+            self.week = 0.0
+        if (today.year, today.month) != (self.anchor.year, self.anchor.month):
+            self.month = 0.0
+        self.day = 0.0
+        self.anchor = today
+
+    def add(self, amount: float, txn_date: date):
+        if txn_date > self.anchor:
+            return
+        if txn_date == self.anchor:
+            self.day += amount
+        if _week_start(txn_date) == _week_start(self.anchor):
+            self.week += amount
+        if (txn_date.year, txn_date.month) == (self.anchor.year, self.anchor.month):
+            self.month += amount
+
+    def as_dict(self):
+        return {'daily': self.day, 'weekly': self.week, 'monthly': self.month}
+
+class BudgetLedger:
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._totals = OrderedDict()
+        # Users being warmed, and those that saw an insert meanwhile (their
+        # warm snapshot may be missing it and is redone)
+        self._warming = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def peek(self, user_id: int):
+        # Non-blocking; None means the user still has to be warmed
+        today = date.today()
+        with self._lock:
+            totals = self._totals.get(user_id)
+            if totals is None:
+                return None
+            self._totals.move_to_end(user_id)
+            totals.roll_to(today)
+            return totals.as_dict()
+
+    def warm(self, user_id: int):
+        # Blocking: call through run_db()
+        with self._lock:
+            self._warming[user_id] = self._warming.get(user_id, 0) + 1
+        try:
+            while True:
+                with self._lock:
+                    self._dirty.discard(user_id)
+                totals = self._load(user_id)
+                with self._lock:
+                    if user_id in self._dirty:
+                        continue
+                    self._totals[user_id] = totals
+                    self._totals.move_to_end(user_id)
+                    while len(self._totals) > self.max_users:
+                        self._totals.popitem(last=False)
+                    return totals.as_dict()
+        finally:
+            with self._lock:
+                self._warming[user_id] -= 1
+                if not self._warming[user_id]:
+                    del self._warming[user_id]
+                    self._dirty.discard(user_id)
+
+    def _load(self, user_id: int):
+        today = date.today()
+        totals = _Totals(today)
+        start = min(_week_start(today), today.replace(day=1))
+        with session_scope() as db:
+            rows = db.query(Transaction.date, sa.func.sum(Transaction.amount)).filter(
+                Transaction.user_id == user_id,
+                Transaction.type == 'expense',
+                Transaction.date >= start,
+                Transaction.date <= today
+            ).group_by(Transaction.date).all()
+        for txn_date, amount in rows:
+            totals.add(amount or 0.0, txn_date)
+        return totals
+
+    def record(self, user_id: int, txn_type: str, amount: float, txn_date: date):
+        if txn_type != 'expense':
+            return
+        today = date.today()
+        with self._lock:
+            if user_id in self._warming:
+                self._dirty.add(user_id)
+            totals = self._totals.get(user_id)
+            if totals is not None:
+                totals.roll_to(today)
+                totals.add(amount, txn_date)
+
+    def forget(self, user_id: int):
+        with self._lock:
+            self._totals.pop(user_id, None)
+
+budget_ledger = BudgetLedger()
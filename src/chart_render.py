@@ -0,0 +1,58 @@
+import io
+
+# Runs inside the chart process pool, so it imports nothing from the bot:
+# the payload is plain data and the result is PNG bytes.
+
+def warm():
+    # Pays matplotlib's import and font-cache cost before the first request
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    return True
+
+def render_report_chart(payload):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    categories = payload['categories']
+    days = payload['days']
+    limit = payload['daily_limit']
+
+    fig, (pie_ax, bar_ax) = plt.subplots(
+        1, 2, figsize=(11, 4.8), dpi=100, gridspec_kw={'width_ratios': [1, 1.6]}
+    )
+    try:
+        fig.suptitle(payload['title'], fontsize=13)
+
+        if categories:
+            labels = [label for label, _ in categories]
+            values = [value for _, value in categories]
+            pie_ax.pie(values, labels=labels, autopct='%1.0f%%', startangle=90, counterclock=False,
+                       textprops={'fontsize': 9}, wedgeprops={'linewidth': 1, 'edgecolor': 'white'})
+            pie_ax.axis('equal')
+        else:
+            pie_ax.axis('off')
+        pie_ax.set_title(payload['pie_title'], fontsize=11)
+
+        x = range(len(days))
+        amounts = [amount for _, amount in days]
+        colors = ['#d9534f' if limit and amount > limit else '#5b8def' for amount in amounts]
+        bar_ax.bar(x, amounts, color=colors, width=0.8)
+        if limit:
+            bar_ax.axhline(limit, color='#d9534f', linestyle='--', linewidth=1.2, label=payload['limit_label'])
+            bar_ax.legend(loc='upper left', fontsize=9)
+        step = max(1, len(days) // 10)
+        bar_ax.set_xticks(list(x)[::step])
+        bar_ax.set_xticklabels([label for label, _ in days][::step], fontsize=8)
+        bar_ax.set_title(payload['bar_title'], fontsize=11)
+        bar_ax.spines['top'].set_visible(False)
+        bar_ax.spines['right'].set_visible(False)
+        bar_ax.grid(axis='y', alpha=0.3)
+
+        fig.tight_layout()
+        output = io.BytesIO()
+        fig.savefig(output, format='png')
+        return output.getvalue()
+    finally:
+        plt.close(fig)
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+import sqlalchemy as sa
+from src.config import Config
+from src.database import session_scope, DailyRollup
+from src.reports import translate
+from src import chart_render
+
+# Spending charts for the weekly/monthly reports: a category pie and daily
+# expense bars against the daily limit. Rendering (matplotlib, Agg) runs in
+# a small process pool so it never blocks the event loop or holds the GIL.
+# PNGs are cached per (user, period, language, data version), where the
+# version is a digest of the chart's input data, so repeated taps reuse the
+# image and a new transaction (or a changed limit) produces a new one.
+
+TITLES = {
+    'en': {7: "Last 7 days", 30: "Last 30 days", 'pie': "Spending by category", 'bar': "Daily spending", 'limit': "Daily limit"},
+    'ar': {7: "آخر 7 أيام", 30: "آخر 30 يوماً", 'pie': "المصاريف حسب الفئة", 'bar': "المصاريف اليومية", 'limit': "الحد اليومي"},
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _pool_context():
+    # Workers fork from a forkserver that has only imported chart_render, so
+    # the bot's threads and DB connections stay out of them. Like 'spawn',
+    # each worker still re-runs the entry script, which is why main.py only
+    # imports the bot under its __main__ guard. Platforms without
+    # forkserver (Windows) use 'spawn'
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['src.chart_render'])
+    return context
+
+def _get_pool():
+    # Created on first use
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=Config.CHART_WORKERS, mp_context=_pool_context())
+        return _pool
+
+def _shaper(lang):
+    # Matplotlib can't shape Arabic; use arabic-reshaper + python-bidi when
+    # installed, otherwise label Arabic charts in English
+    if lang != 'ar':
+        return None
+    try:
+        import arabic_reshaper
+        from bidi.algorithm import get_display
+    except ImportError:
+        return None
+    return lambda text: get_display(arabic_reshaper.reshape(text))
+
+class ChartCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._images.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_size:
+                self._images.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0,
+                'size': len(self._images)
+            }
+
+chart_cache = ChartCache(Config.CHART_CACHE_SIZE)
+_rendering = {}  # cache key -> future, so concurrent taps render once
+
+def get_chart_data(user_id: int, days: int):
+    # Blocking: daily and per-category expense totals from the rollups
+    start_date = date.today() - timedelta(days=days-1)
+    with session_scope() as db:
+        rows = db.query(DailyRollup.date, DailyRollup.category, sa.func.sum(DailyRollup.total)).filter(
+            DailyRollup.user_id == user_id,
+            DailyRollup.type == 'expense',
+            DailyRollup.date >= start_date
+        ).group_by(DailyRollup.date, DailyRollup.category).all()
+    daily = {start_date + timedelta(days=i): 0.0 for i in range(days)}
+    categories = {}
+    for day, category, total in rows:
+        daily[day] = daily.get(day, 0.0) + (total or 0.0)
+        categories[category] = categories.get(category, 0.0) + (total or 0.0)
+    return daily, categories
+
+def _payload(daily, categories, days, lang, daily_limit):
+    shape = _shaper(lang)
+    label_lang = lang if shape else 'en'
+    shape = shape or (lambda text: text)
+    titles = TITLES[label_lang]
+    return {
+        'title': shape(titles.get(days, f"{days} days")),
+        'pie_title': shape(titles['pie']),
+        'bar_title': shape(titles['bar']),
+        'limit_label': shape(titles['limit']),
+        'categories': [
+            (shape(translate(category, label_lang)), round(total, 2))
+            for category, total in sorted(categories.items(), key=lambda c: -c[1]) if total > 0
+        ],
+        'days': [(day.strftime('%d/%m'), round(total, 2)) for day, total in sorted(daily.items())],
+        'daily_limit': daily_limit or 0.0,
+    }
+
+def _version(payload):
+    return hashlib.blake2b(repr(sorted(payload.items())).encode('utf-8'), digest_size=12).hexdigest()
+
+async def get_report_chart(user, days: int):
+    # PNG bytes for the user's chart, or None when there is nothing to draw
+    from src.database import run_db
+    daily, categories = await run_db(get_chart_data, user.id, days)
+    if not any(total > 0 for total in categories.values()):
+        return None
+    payload = _payload(daily, categories, days, user.language, user.daily_limit)
+    key = (user.id, days, user.language, _version(payload))
+
+    image = chart_cache.get(key)
+    if image is not None:
+        return image
+    future = _rendering.get(key)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        future = _rendering[key] = loop.run_in_executor(_get_pool(), chart_render.render_report_chart, payload)
+        future.add_done_callback(lambda _: _rendering.pop(key, None))
+    image = await asyncio.shield(future)
+    chart_cache.put(key, image)
+    return image
+
+def warm_up():
+    # Start the workers and import matplotlib there before the first report
+    for _ in range(Config.CHART_WORKERS):
+        _get_pool().submit(chart_render.warm)
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -15,8 +15,134 @@ class Config:
 
     DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "llama-3.3-70b-versatile")
     ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
+    # Users per page in the admin /users listing
+    ADMIN_USERS_PAGE_SIZE = int(os.getenv("ADMIN_USERS_PAGE_SIZE", "20"))
+    # 'polling' or 'webhook'
+    BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+    # Public base URL Telegram should call, e.g. https://bot.example.com
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
 
-    if not TELEGRAM_BOT_TOKEN:
-        raise ValueError("TELEGRAM_BOT_TOKEN is not set in environment variables")
-    if not GROQ_API_KEY:
-        raise ValueError("GROQ_API_KEY is not set in environment variables")
+    # Concurrent update handling: worker pool size and max updates in flight
+    UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "16"))
+    UPDATE_QUEUE_LIMIT = int(os.getenv("UPDATE_QUEUE_LIMIT", "512"))
+
+    # Inbound flood protection for transaction messages
+    USER_RATE_PER_MINUTE = float(os.getenv("USER_RATE_PER_MINUTE", "20"))
+    USER_RATE_BURST = int(os.getenv("USER_RATE_BURST", "5"))
+    ADMISSION_MAX_ACTIVE = int(os.getenv("ADMISSION_MAX_ACTIVE", "32"))
+    ADMISSION_MAX_DEPTH = int(os.getenv("ADMISSION_MAX_DEPTH", "200"))
+
+    # Outbound Bot API limits (Telegram: ~30 msg/s overall, ~20 msg/min per group, ~1 msg/s per chat)
+    TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+    TELEGRAM_GROUP_RATE_PER_MINUTE = float(os.getenv("TELEGRAM_GROUP_RATE_PER_MINUTE", "20"))
+    TELEGRAM_PRIVATE_CHAT_RATE = float(os.getenv("TELEGRAM_PRIVATE_CHAT_RATE", "1"))
+    TELEGRAM_PRIVATE_CHAT_BURST = int(os.getenv("TELEGRAM_PRIVATE_CHAT_BURST", "3"))
+
+    # Size of the thread pool that runs blocking database calls
+    DB_WORKERS = int(os.getenv("DB_WORKERS", "8"))
+    # Engine profile: 'tuned' (below) or 'default' (SQLAlchemy defaults)
+    DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+    # SQLite pragmas (cache_size < 0 is in KiB)
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+    # Connection pool and timeouts for Postgres (and other server databases)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(DB_WORKERS + 2)))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    PG_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "15000"))
+    PG_LOCK_TIMEOUT_MS = int(os.getenv("PG_LOCK_TIMEOUT_MS", "5000"))
+    PG_IDLE_IN_TRANSACTION_TIMEOUT_MS = int(os.getenv("PG_IDLE_IN_TRANSACTION_TIMEOUT_MS", "60000"))
+    # Write-behind buffer: commit transactions in batches (rows pending on a crash are lost)
+    WRITE_BUFFER_ENABLED = os.getenv("WRITE_BUFFER_ENABLED", "false").lower() == "true"
+    WRITE_BUFFER_MAX_ROWS = int(os.getenv("WRITE_BUFFER_MAX_ROWS", "200"))
+    WRITE_BUFFER_MAX_DELAY_MS = int(os.getenv("WRITE_BUFFER_MAX_DELAY_MS", "200"))
+    # Max users kept in the per-process profile cache
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+    # Async Groq client tuning
+    GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "15"))
+    GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "10"))
+    GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+    GROQ_BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+
+    # Upper bound on entries taken from a single message
+    MAX_TRANSACTIONS_PER_MESSAGE = int(os.getenv("MAX_TRANSACTIONS_PER_MESSAGE", "20"))
+
+    # Cross-user micro-batching of LLM parse requests (off by default)
+    PARSE_BATCH_ENABLED = os.getenv("PARSE_BATCH_ENABLED", "false").lower() == "true"
+    PARSE_BATCH_WINDOW_MS = int(os.getenv("PARSE_BATCH_WINDOW_MS", "50"))
+    PARSE_BATCH_MAX_SIZE = int(os.getenv("PARSE_BATCH_MAX_SIZE", "8"))
+
+    # Local fast-path parser in front of the LLM
+    LOCAL_PARSER_ENABLED = os.getenv("LOCAL_PARSER_ENABLED", "true").lower() == "true"
+    LOCAL_PARSER_MIN_CONFIDENCE = float(os.getenv("LOCAL_PARSER_MIN_CONFIDENCE", "0.75"))
+
+    # LLM parse-result cache ('memory' or 'sqlite' backend)
+    PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "true").lower() == "true"
+    PARSE_CACHE_BACKEND = os.getenv("PARSE_CACHE_BACKEND", "memory")
+    PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", "./parse_cache.db")
+    PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "5000"))
+    PARSE_CACHE_TTL = int(os.getenv("PARSE_CACHE_TTL", str(7 * 24 * 3600)))
+
+    # Streaming export
+    EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    EXPORT_SPOOL_BYTES = int(os.getenv("EXPORT_SPOOL_BYTES", str(8 * 1024 * 1024)))
+    # Above this many rows /export sends a gzipped CSV instead of a workbook
+    EXPORT_XLSX_MAX_ROWS = int(os.getenv("EXPORT_XLSX_MAX_ROWS", "100000"))
+
+    # Bank statement import (CSV/XLSX documents sent to the bot)
+    IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "1"))
+    IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(20 * 1024 * 1024)))  # Telegram's bot download limit
+    IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "100000"))
+    IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "1000"))  # rows per dedupe query and insert
+    IMPORT_LLM_BATCH_SIZE = int(os.getenv("IMPORT_LLM_BATCH_SIZE", "40"))  # descriptions per completion
+    IMPORT_LLM_MAX_DESCRIPTIONS = int(os.getenv("IMPORT_LLM_MAX_DESCRIPTIONS", "2000"))  # per import, the rest are 'other'
+    IMPORT_PROGRESS_INTERVAL = float(os.getenv("IMPORT_PROGRESS_INTERVAL", "3"))  # seconds between progress edits
+
+    # Spending charts on weekly/monthly reports (rendered in a process pool)
+    CHARTS_ENABLED = os.getenv("CHARTS_ENABLED", "true").lower() == "true"
+    CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+    CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "256"))
+
+    # Metrics endpoint (Prometheus text format); keep it on a private interface
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+    # Scheduled online backups (method: auto, snapshot (SQLite only) or dump)
+    BACKUP_ENABLED = os.getenv("BACKUP_ENABLED", "true").lower() == "true"
+    BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+    BACKUP_METHOD = os.getenv("BACKUP_METHOD", "auto")
+    BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "24"))
+    BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+    BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+    BACKUP_STEP_SLEEP_MS = int(os.getenv("BACKUP_STEP_SLEEP_MS", "50"))
+    # A snapshot that writes keep restarting falls back to a dump
+    BACKUP_SNAPSHOT_MAX_RESTARTS = int(os.getenv("BACKUP_SNAPSHOT_MAX_RESTARTS", "5"))
+    BACKUP_SNAPSHOT_TIMEOUT_S = float(os.getenv("BACKUP_SNAPSHOT_TIMEOUT_S", "900"))
+
+    # Opt-in end-of-day digest (/digest on), sent at DIGEST_TIME server time
+    DIGEST_ENABLED = os.getenv("DIGEST_ENABLED", "true").lower() == "true"
+    DIGEST_TIME = os.getenv("DIGEST_TIME", "21:00")
+    DIGEST_CHUNK_SIZE = int(os.getenv("DIGEST_CHUNK_SIZE", "1000"))  # users per aggregation query
+    DIGEST_BATCH_SIZE = int(os.getenv("DIGEST_BATCH_SIZE", "50"))  # sends per checkpoint
+    DIGEST_CONCURRENCY = int(os.getenv("DIGEST_CONCURRENCY", "10"))
+
+    @classmethod
+    def require(cls, *names):
+        # Each entry point checks only the settings it actually uses, so
+        # e.g. backups and migrations run without bot or Groq credentials
+        missing = [name for name in names if not getattr(cls, name, None)]
+        if missing:
+            raise ValueError(f"{', '.join(missing)} is not set in environment variables")
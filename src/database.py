@@ -1,9 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Date
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Date, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 import sqlalchemy as sa
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import asyncio
+import functools
 from src.config import Config
+from src.metrics import instrument_engine
 
 Base = declarative_base()
 
@@ -15,7 +20,10 @@ class User(Base):
     full_name = Column(String(200), nullable=True)
     language = Column(String(2), default='ar')  # 'ar' or 'en'
     daily_limit = Column(Float, default=0.0)
+    weekly_limit = Column(Float, default=0.0)
+    monthly_limit = Column(Float, default=0.0)
     is_active = Column(sa.Boolean, default=True)
+    digest_enabled = Column(sa.Boolean, default=False)  # opt-in end-of-day digest
     created_at = Column(DateTime, default=datetime.utcnow)
     
     transactions = relationship("Transaction", back_populates="user")
@@ -33,11 +41,156 @@ class Transaction(Base):
 
     user = relationship("User", back_populates="transactions")
 
-engine = create_engine(Config.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # Reports filter on (user_id, date), limit checks on (user_id, type, date)
+    __table_args__ = (
+        Index('ix_transactions_user_date', 'user_id', 'date'),
+        Index('ix_transactions_user_type_date', 'user_id', 'type', 'date'),
+    )
+
+class DailyRollup(Base):
+    # One row per (user, date, type, category), maintained on every insert
+    # so reports read a handful of pre-summed rows instead of raw transactions
+    __tablename__ = 'daily_rollups'
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    date = Column(Date, nullable=False)
+    type = Column(String(10), nullable=False)
+    category = Column(String(50), nullable=False)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'date', 'type', 'category', name='uq_daily_rollups_key'),
+    )
+
+# Global aggregates behind the admin /stats command (see src.stats). They are
+# updated in the same transaction as the rows they count, so /stats reads a
+# few small tables instead of scanning transactions.
+
+class StatCounter(Base):
+    # All-time counters by name (users, transactions, parse outcomes, ...)
+    __tablename__ = 'stat_counters'
+    name = Column(String(50), primary_key=True)
+    value = Column(Float, nullable=False, default=0.0)
+
+class DailyStat(Base):
+    # Per-day counters by name, keyed by the UTC day the event happened
+    __tablename__ = 'daily_stats'
+    date = Column(Date, primary_key=True)
+    name = Column(String(50), primary_key=True)
+    value = Column(Float, nullable=False, default=0.0)
+
+class CategoryStat(Base):
+    # daily_rollups summed over all users
+    __tablename__ = 'category_stats'
+    date = Column(Date, primary_key=True)
+    type = Column(String(10), primary_key=True)
+    category = Column(String(50), primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
+class UserActivity(Base):
+    # One row per user per UTC day with recorded transactions; the day's
+    # first insert for a user is what counts them as active that day
+    __tablename__ = 'user_activity'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    date = Column(Date, primary_key=True)
+
+class DigestRun(Base):
+    # Progress of the daily digest fan-out (src.digest): users are sent in
+    # id order and last_user_id is claimed before each batch goes out, so a
+    # restarted run resumes after it instead of sending twice
+    __tablename__ = 'digest_runs'
+    date = Column(Date, primary_key=True)
+    last_user_id = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # Per-connection settings; journal_mode=WAL also persists in the file
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={Config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(Config.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(Config.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={int(Config.SQLITE_CACHE_SIZE)}")
+    finally:
+        cursor.close()
+
+def create_db_engine(url=None, profile=None):
+    # DB_PROFILE=default keeps SQLAlchemy's stock settings; 'tuned' applies
+    # the SQLite pragmas or the server pool / timeout settings from Config
+    url = sa.engine.make_url(url or Config.DATABASE_URL)
+    profile = profile or Config.DB_PROFILE
+    if profile == 'default':
+        return create_engine(url)
+    if profile != 'tuned':
+        raise ValueError(f"Unknown DB_PROFILE {profile}")
+
+    if url.get_backend_name() == 'sqlite':
+        tuned = create_engine(url)
+        sa.event.listen(tuned, 'connect', _sqlite_pragmas)
+        return tuned
+
+    kwargs = {
+        'pool_size': Config.DB_POOL_SIZE,
+        'max_overflow': Config.DB_MAX_OVERFLOW,
+        'pool_pre_ping': Config.DB_POOL_PRE_PING,
+        'pool_recycle': Config.DB_POOL_RECYCLE,
+        'pool_timeout': Config.DB_POOL_TIMEOUT,
+    }
+    if url.get_backend_name() == 'postgresql':
+        options = []
+        if Config.PG_STATEMENT_TIMEOUT_MS:
+            options.append(f"-c statement_timeout={Config.PG_STATEMENT_TIMEOUT_MS}")
+        if Config.PG_LOCK_TIMEOUT_MS:
+            options.append(f"-c lock_timeout={Config.PG_LOCK_TIMEOUT_MS}")
+        if Config.PG_IDLE_IN_TRANSACTION_TIMEOUT_MS:
+            options.append(f"-c idle_in_transaction_session_timeout={Config.PG_IDLE_IN_TRANSACTION_TIMEOUT_MS}")
+        if options:
+            kwargs['connect_args'] = {'options': ' '.join(options)}
+    return create_engine(url, **kwargs)
+
+engine = create_db_engine()
+instrument_engine(engine)
+# expire_on_commit=False so objects returned from a closed session stay readable
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Blocking DB work runs here so handlers never stall the event loop
+_db_executor = ThreadPoolExecutor(max_workers=Config.DB_WORKERS, thread_name_prefix="db")
+
+@contextmanager
+def maintenance_transaction(bind=None):
+    # engine.begin() for migrations, backfills and rebuilds. Their full-table
+    # statements are exempt from the tuned Postgres statement_timeout, which
+    # is sized for chat traffic (SET LOCAL lasts until the commit).
+    with (bind or engine).begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(sa.text("SET LOCAL statement_timeout = 0"))
+        yield conn
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    # Schema changes live in src/migrations.py so existing databases are upgraded too
+    from src.migrations import run_migrations
+    run_migrations(engine)
+
+@contextmanager
+def session_scope():
+    db = SessionLocal()
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def run_db(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
 
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta
+import sqlalchemy as sa
+from src.config import Config
+from src.database import session_scope, run_db, User, DailyRollup, DigestRun
+from src.reports import ReportSummary, generate_summary_text
+
+logger = logging.getLogger(__name__)
+
+# The daily job and the startup resume job must never walk a run together;
+# the daily job waits for a resume in progress (it may be yesterday's run)
+_running = asyncio.Lock()
+
+# Opt-in end-of-day digest. Users are read DIGEST_CHUNK_SIZE at a time with
+# one set-based query per chunk (their rollup rows for the day joined to the
+# user fields), never a report query per user. Sends go through the bot's
+# rate limiter with at most DIGEST_CONCURRENCY in flight. Progress lives in
+# digest_runs: each batch of DIGEST_BATCH_SIZE users is claimed there before
+# it is sent, so a restart resumes after the last claimed batch. A crash can
+# cost some of that batch its digest but never sends anyone two.
+
+def digest_time():
+    # DIGEST_TIME (HH:MM) in the server's local timezone, for run_daily
+    hour, minute = (int(part) for part in Config.DIGEST_TIME.split(':'))
+    return time(hour, minute, tzinfo=datetime.now().astimezone().tzinfo)
+
+def _start_run(day, resume_only=False):
+    # Returns (day, last_user_id, sent, failed) to continue from, or None
+    # when there is nothing to do
+    with session_scope() as db:
+        if resume_only:
+            # An unfinished run from today or yesterday that a restart cut short
+            run = db.query(DigestRun).filter(
+                DigestRun.finished_at.is_(None),
+                DigestRun.date >= day - timedelta(days=1)
+            ).order_by(DigestRun.date.desc()).first()
+        else:
+            run = db.get(DigestRun, day)
+            if run is None:
+                run = DigestRun(date=day, last_user_id=0, sent=0, failed=0, started_at=datetime.utcnow())
+                db.add(run)
+                db.commit()
+        if run is None or run.finished_at is not None:
+            return None
+        return run.date, run.last_user_id, run.sent, run.failed
+
+def _checkpoint(day, last_user_id, sent, failed, finished=False):
+    with session_scope() as db:
+        values = {'last_user_id': last_user_id, 'sent': sent, 'failed': failed}
+        if finished:
+            values['finished_at'] = datetime.utcnow()
+        db.query(DigestRun).filter(DigestRun.date == day).update(values)
+        db.commit()
+
+def load_chunk(day, after_id, size):
+    # Blocking; the next `size` opted-in active users after after_id with
+    # their rollup rows for the day. Returns ([(user row, summary)], last id
+    # scanned); users with nothing recorded that day are skipped.
+    users = sa.select(User.id, User.telegram_id, User.language, User.daily_limit).where(
+        User.is_active.is_(True),
+        User.digest_enabled.is_(True),
+        User.id > after_id
+    ).order_by(User.id).limit(size).subquery()
+    query = sa.select(
+        users, DailyRollup.type.label('txn_type'), DailyRollup.category,
+        DailyRollup.total, DailyRollup.count.label('txn_count')
+    ).outerjoin(DailyRollup, sa.and_(
+        DailyRollup.user_id == users.c.id, DailyRollup.date == day
+    )).order_by(users.c.id)
+    with session_scope() as db:
+        rows = db.execute(query).all()
+
+    digests = {}
+    for row in rows:
+        if row.txn_type is None:
+            continue
+        if row.id not in digests:
+            digests[row.id] = (row, ReportSummary())
+        digests[row.id][1].add(row.txn_type, row.category, row.total, row.txn_count)
+    return list(digests.values()), (rows[-1].id if rows else None)
+
+def digest_text(user, summary):
+    from src.handlers import get_limit_alerts
+    lang = user.language or 'ar'
+    title = "🌙 *Today's Summary*" if lang == 'en' else "🌙 *ملخص اليوم*"
+    text = f"{title}\n\n{generate_summary_text(summary, lang)}"
+    limit = user.daily_limit or 0.0
+    if limit > 0:
+        alert = get_limit_alerts(user, {'daily': summary.expense}, lang)
+        if alert:
+            text += "\n" + alert
+        else:
+            left = limit - summary.expense
+            text += (f"\n\n✅ Within your daily limit ({left:.2f} left)" if lang == 'en'
+                     else f"\n\n✅ ضمن حدك اليومي (متبقي {left:.2f})")
+    return text
+
+def _disable(user_ids):
+    # Users who blocked the bot stop getting digests
+    from src.user_cache import user_cache
+    with session_scope() as db:
+        telegram_ids = [t for (t,) in db.query(User.telegram_id).filter(User.id.in_(user_ids))]
+        db.query(User).filter(User.id.in_(user_ids)).update({'digest_enabled': False}, synchronize_session=False)
+        db.commit()
+    for telegram_id in telegram_ids:
+        user_cache.invalidate(telegram_id)
+
+async def run_digest(bot, day=None, resume_only=False):
+    # Returns {'date', 'sent', 'failed'} for the run, or None if there was none to do
+    from telegram.error import Forbidden, TelegramError
+    run = await run_db(_start_run, day or date.today(), resume_only)
+    if run is None:
+        return None
+    day, after_id, sent, failed = run
+    semaphore = asyncio.Semaphore(Config.DIGEST_CONCURRENCY)
+    blocked = []
+
+    async def send(user, summary):
+        async with semaphore:
+            try:
+                await bot.send_message(chat_id=user.telegram_id, text=digest_text(user, summary), parse_mode='Markdown')
+                return True
+            except Forbidden:
+                blocked.append(user.id)
+            except TelegramError as e:
+                logger.warning(f"Digest to {user.telegram_id} failed: {e}")
+            return False
+
+    while True:
+        digests, last_id = await run_db(load_chunk, day, after_id, Config.DIGEST_CHUNK_SIZE)
+        if last_id is None:
+            break
+        for start in range(0, len(digests), Config.DIGEST_BATCH_SIZE):
+            batch = digests[start:start + Config.DIGEST_BATCH_SIZE]
+            # Claim the batch before sending it (see the module comment)
+            await run_db(_checkpoint, day, batch[-1][0].id, sent, failed)
+            results = await asyncio.gather(*[send(user, summary) for user, summary in batch])
+            sent += sum(results)
+            failed += len(results) - sum(results)
+        after_id = last_id
+        await run_db(_checkpoint, day, after_id, sent, failed)
+        if blocked:
+            await run_db(_disable, blocked)
+            blocked = []
+    await run_db(_checkpoint, day, after_id, sent, failed, True)
+    logger.info(f"Daily digest for {day}: {sent} sent, {failed} failed")
+    return {'date': day, 'sent': sent, 'failed': failed}
+
+async def digest_job(context):
+    # JobQueue callback; job data {'resume_only': True} only finishes a run
+    # that a restart interrupted
+    from src.write_buffer import write_buffer
+    await write_buffer.flush()
+    resume_only = bool(context.job.data and context.job.data.get('resume_only'))
+    if resume_only and _running.locked():
+        return
+    async with _running:
+        try:
+            await run_digest(context.bot, resume_only=resume_only)
+        except Exception as e:
+            logger.error(f"Daily digest failed: {e}")
@@ -0,0 +1,176 @@
+import io
+import csv
+import gzip
+import zipfile
+import tempfile
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import sqlalchemy as sa
+from src.config import Config
+from src.database import session_scope, Transaction, DailyRollup
+from src.reports import translate, HEADER_MAP
+from src import repository
+
+# Streaming transaction export. Rows are paged from the database (server-side
+# cursor where the driver supports it) and written straight into an
+# openpyxl write-only workbook, a gzipped CSV or a zip of monthly CSVs, so memory stays flat no
+# matter how long the history is. Exports run on their own small pool so a
+# heavy export never occupies the DB workers used by chat replies.
+
+# /export [days] accepts 1..EXPORT_MAX_DAYS (ten years)
+EXPORT_MAX_DAYS = 3650
+
+EXPORT_COLUMNS = ['Type', 'Category', 'Amount', 'Description', 'Date']
+USER_EXPORT_COLUMNS = ['telegram_id', 'username', 'full_name', 'language', 'status', 'daily_limit',
+                       'weekly_limit', 'monthly_limit', 'registered', 'transactions', 'last_activity']
+
+_export_executor = ThreadPoolExecutor(max_workers=Config.EXPORT_WORKERS, thread_name_prefix="export")
+
+class _Labels(dict):
+    # Memoised translate(): one dict lookup per cell instead of a function call
+    def __init__(self, lang):
+        super().__init__()
+        self.lang = lang
+
+    def __missing__(self, key):
+        value = translate(key, self.lang)
+        self[key] = value
+        return value
+
+def count_rows(user_id: int, start_date: date):
+    with session_scope() as db:
+        return db.query(sa.func.sum(DailyRollup.count)).filter(
+            DailyRollup.user_id == user_id,
+            DailyRollup.date >= start_date
+        ).scalar() or 0
+
+def _iter_rows(user_id: int, start_date: date, lang: str):
+    labels = _Labels(lang)
+    with session_scope() as db:
+        query = db.query(
+            Transaction.type, Transaction.category, Transaction.amount,
+            Transaction.description, Transaction.date
+        ).filter(
+            Transaction.user_id == user_id,
+            Transaction.date >= start_date
+        ).order_by(Transaction.date, Transaction.id).execution_options(
+            stream_results=True, yield_per=Config.EXPORT_BATCH_SIZE
+        )
+        for txn_type, category, amount, description, txn_date in query:
+            yield labels[txn_type], labels[category], amount, description, txn_date
+
+def _headers(lang):
+    return [HEADER_MAP.get(c, {}).get(lang, c) for c in EXPORT_COLUMNS]
+
+def _spool():
+    return tempfile.SpooledTemporaryFile(max_size=Config.EXPORT_SPOOL_BYTES)
+
+def write_xlsx(user_id: int, start_date: date, lang: str, per_month: bool = False):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    headers = _headers(lang)
+    sheet = None
+    sheet_month = None
+    rows = 0
+    for row in _iter_rows(user_id, start_date, lang):
+        month = row[4].strftime('%Y-%m') if per_month else None
+        if sheet is None or month != sheet_month:
+            sheet = workbook.create_sheet(title=month or 'Transactions')
+            sheet.append(headers)
+            sheet_month = month
+        sheet.append(row)
+        rows += 1
+    if rows == 0:
+        return None
+    output = _spool()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+def write_csv_gz(user_id: int, start_date: date, lang: str):
+    output = _spool()
+    rows = 0
+    with gzip.GzipFile(fileobj=output, mode='wb') as gz:
+        # utf-8-sig so Excel shows Arabic text correctly
+        text = io.TextIOWrapper(gz, encoding='utf-8-sig', newline='')
+        writer = csv.writer(text)
+        writer.writerow(_headers(lang))
+        for row in _iter_rows(user_id, start_date, lang):
+            writer.writerow(row)
+            rows += 1
+        text.flush()
+        text.detach()
+    if rows == 0:
+        return None
+    output.seek(0)
+    return output
+
+def write_csv_zip(user_id: int, start_date: date, lang: str):
+    # Monthly CSV: one file per month in a zip. Rows arrive in date order,
+    # so each month's entry is written once and closed before the next
+    output = _spool()
+    headers = _headers(lang)
+    rows = 0
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        entry = text = writer = None
+        month = None
+        for row in _iter_rows(user_id, start_date, lang):
+            row_month = row[4].strftime('%Y-%m')
+            if row_month != month:
+                if text is not None:
+                    text.close()
+                month = row_month
+                entry = archive.open(f"{month}.csv", 'w', force_zip64=True)
+                text = io.TextIOWrapper(entry, encoding='utf-8-sig', newline='')
+                writer = csv.writer(text)
+                writer.writerow(headers)
+            writer.writerow(row)
+            rows += 1
+        if text is not None:
+            text.close()
+    if rows == 0:
+        return None
+    output.seek(0)
+    return output
+
+def write_users_csv(status=None, language=None):
+    # Admin bulk review: every matching user with their stats, streamed
+    # from the database into a spooled CSV
+    output = _spool()
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(USER_EXPORT_COLUMNS)
+    rows = 0
+    for u in repository.iter_users_with_stats(status, language, Config.EXPORT_BATCH_SIZE):
+        writer.writerow([
+            u.telegram_id, u.username or '', u.full_name or '', u.language,
+            'active' if u.is_active else 'pending', u.daily_limit, u.weekly_limit, u.monthly_limit,
+            u.created_at.strftime('%Y-%m-%d %H:%M') if u.created_at else '', u.txn_count, u.last_activity or ''
+        ])
+        rows += 1
+    text.flush()
+    text.detach()
+    if rows == 0:
+        return None
+    output.seek(0)
+    return output
+
+def build_export(user_id: int, lang: str, days: int = 365, fmt: str = 'xlsx', per_month: bool = False):
+    # Blocking; returns (file, extension) or (None, None) when there is no data
+    start_date = date.today() - timedelta(days=days-1)
+    if fmt == 'xlsx' and count_rows(user_id, start_date) > Config.EXPORT_XLSX_MAX_ROWS:
+        fmt = 'csv'  # very large ranges: CSV streams far faster than a workbook
+    if fmt == 'csv':
+        if per_month:
+            return write_csv_zip(user_id, start_date, lang), 'zip'
+        return write_csv_gz(user_id, start_date, lang), 'csv.gz'
+    return write_xlsx(user_id, start_date, lang, per_month), 'xlsx'
+
+async def run_export(*args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_export_executor, lambda: build_export(*args, **kwargs))
+
+async def run_users_export(status=None, language=None):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_export_executor, write_users_csv, status, language)
@@ -1,13 +1,21 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler
-from src.database import SessionLocal, User, Transaction
-from src.ai_service import AIService
+from src.database import run_db
+from src.ai_service import get_ai_service
 from src.config import Config
+from src import repository, stats
+from src.budget import budget_ledger
+from src.write_buffer import write_buffer
+from src.user_cache import get_profile, get_or_create_profile
+from src.rate_limit import InboundLimiter, AdmissionQueue, AdmissionQueueFull
 from datetime import datetime, date
-import sqlalchemy as sa
 import re
+import logging
 
-ai_service = AIService()
+logger = logging.getLogger(__name__)
+
+inbound_limiter = InboundLimiter(Config.USER_RATE_PER_MINUTE / 60.0, Config.USER_RATE_BURST)
+admission_queue = AdmissionQueue(Config.ADMISSION_MAX_ACTIVE, Config.ADMISSION_MAX_DEPTH)
 
 # Multi-language strings for buttons
 STRINGS = {
@@ -31,7 +39,22 @@ STRINGS = {
         'admin_only': "⛔ This command is for administrators only.",
         'user_not_found': "User not found.",
         'users_list': "Registered Users:",
-        'invalid_number': "Please enter a valid number (e.g., 300 or 150.5)."
+        'invalid_number': "Please enter a valid number (e.g., 300 or 150.5).",
+        'slow_down': "⏳ You're sending messages too fast, so this message was not recorded. Please wait a moment and resend it — tip: you can put several transactions in one message.",
+        'busy': "⏳ The bot is very busy right now and this message was not recorded. Please try again in a few seconds.",
+        'digest_on': "🌙 Daily digest on: you'll get a summary of your day every evening (only on days with transactions). Send /digest off to stop.",
+        'digest_off': "🌙 Daily digest off. Send /digest on to turn it back on.",
+        'digest_status': "🌙 Daily digest is {state}. Use /digest on or /digest off.",
+        'import_unsupported': "📄 To import your history, send a bank statement or spreadsheet as a .csv or .xlsx file.",
+        'import_too_big': "❌ The file is too large to import (the limit is {mb} MB).",
+        'import_busy': "⏳ An import is already running. Please wait for it to finish.",
+        'import_started': "📥 Reading your file...",
+        'import_progress': "📥 Importing... {read:,} rows read, {added:,} added, {duplicates:,} duplicates skipped.",
+        'import_done': "✅ Import finished: {added:,} transactions added, {duplicates:,} duplicates skipped, {skipped:,} rows without a date or amount ignored.",
+        'import_truncated': "⚠️ Only the first {rows:,} rows were read.",
+        'import_no_columns': "❌ I couldn't find the columns. The file needs a header row with a date column and an amount (or debit/credit) column. You can name them in the caption, e.g. date=Posting Date, amount=Value",
+        'import_bad_file': "❌ I couldn't read this file. Please send a .csv or .xlsx file.",
+        'import_failed': "❌ The import stopped because of an error. {added:,} transactions were added before it stopped; sending the file again skips them."
     },
     'ar': {
         'main_menu': "القائمة الرئيسية 🏠",
@@ -53,7 +76,22 @@ STRINGS = {
         'admin_only': "⛔ هذا الأمر مخصص للمسؤولين فقط.",
         'user_not_found': "المستخدم غير موجود.",
         'users_list': "المستخدمين المسجلين:",
-        'invalid_number': "يرجى إدخال رقم صحيح (مثلاً: 300 أو 150.5)."
+        'invalid_number': "يرجى إدخال رقم صحيح (مثلاً: 300 أو 150.5).",
+        'slow_down': "⏳ أنت ترسل الرسائل بسرعة كبيرة ولم يتم تسجيل هذه الرسالة. يرجى الانتظار قليلاً ثم إعادة إرسالها — نصيحة: يمكنك كتابة عدة عمليات في رسالة واحدة.",
+        'busy': "⏳ البوت مشغول جداً الآن ولم يتم تسجيل هذه الرسالة. يرجى المحاولة بعد بضع ثوانٍ.",
+        'digest_on': "🌙 تم تفعيل الملخص اليومي: ستصلك خلاصة يومك كل مساء (فقط في الأيام التي فيها عمليات). أرسل /digest off للإيقاف.",
+        'digest_off': "🌙 تم إيقاف الملخص اليومي. أرسل /digest on لإعادة تفعيله.",
+        'digest_status': "🌙 الملخص اليومي {state}. استخدم /digest on أو /digest off.",
+        'import_unsupported': "📄 لاستيراد سجلك، أرسل كشف الحساب أو الجدول كملف ‎.csv أو ‎.xlsx.",
+        'import_too_big': "❌ الملف كبير جداً للاستيراد (الحد الأقصى {mb} ميجابايت).",
+        'import_busy': "⏳ هناك عملية استيراد جارية. يرجى الانتظار حتى تنتهي.",
+        'import_started': "📥 جاري قراءة الملف...",
+        'import_progress': "📥 جاري الاستيراد... تمت قراءة {read:,} صف، إضافة {added:,}، وتخطي {duplicates:,} مكرر.",
+        'import_done': "✅ اكتمل الاستيراد: تمت إضافة {added:,} عملية، وتخطي {duplicates:,} مكرر، وتجاهل {skipped:,} صف بدون تاريخ أو مبلغ.",
+        'import_truncated': "⚠️ تمت قراءة أول {rows:,} صف فقط.",
+        'import_no_columns': "❌ لم أتمكن من تحديد الأعمدة. يجب أن يحتوي الملف على صف عناوين فيه عمود للتاريخ وعمود للمبلغ (أو مدين/دائن). يمكنك تسميتها في وصف الملف، مثلاً: date=التاريخ, amount=المبلغ",
+        'import_bad_file': "❌ تعذرت قراءة هذا الملف. يرجى إرسال ملف ‎.csv أو ‎.xlsx.",
+        'import_failed': "❌ توقف الاستيراد بسبب خطأ. تمت إضافة {added:,} عملية قبل التوقف، وإعادة إرسال الملف تتخطاها."
     }
 }
 
@@ -71,22 +109,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     username = update.effective_user.username
     full_name = update.effective_user.full_name
     
-    db = SessionLocal()
-    user = db.query(User).filter(User.telegram_id == user_id).first()
-    
-    if not user:
-        # Automatic registration
-        is_active = True
-        user = User(
-            telegram_id=user_id, 
-            username=username,
-            full_name=full_name,
-            language='ar',
-            is_active=is_active
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    await get_or_create_profile(user_id, username, full_name)
 
     keyboard = [
         [
@@ -101,7 +124,6 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Welcome! Please choose your preferred language:",
         reply_markup=reply_markup
     )
-    db.close()
 
 async def language_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -110,26 +132,87 @@ async def language_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     lang = 'ar' if query.data == 'lang_ar' else 'en'
     user_id = query.from_user.id
     
-    db = SessionLocal()
-    user = db.query(User).filter(User.telegram_id == user_id).first()
-    if user:
-        user.language = lang
-        db.commit()
+    await run_db(repository.set_language, user_id, lang)
     
     s = STRINGS[lang]
     await query.message.reply_text(s['lang_msg'], reply_markup=get_main_menu_keyboard(lang))
-    db.close()
+
+LIMIT_PERIODS = {
+    'daily': 'daily', 'day': 'daily', 'يومي': 'daily',
+    'weekly': 'weekly', 'week': 'weekly', 'أسبوعي': 'weekly', 'اسبوعي': 'weekly',
+    'monthly': 'monthly', 'month': 'monthly', 'شهري': 'monthly',
+}
+
+LIMIT_NAMES = {
+    'daily': {'en': 'Daily', 'ar': 'اليومي'},
+    'weekly': {'en': 'Weekly', 'ar': 'الأسبوعي'},
+    'monthly': {'en': 'Monthly', 'ar': 'الشهري'},
+}
+
+async def save_limit(update, context, lang, period, text):
+    # Clean input: allow commas and dots, remove spaces
+    clean_text = text.replace(',', '.').strip()
+    try:
+        limit = float(clean_text)
+    except ValueError:
+        await update.message.reply_text(STRINGS[lang]['invalid_number'])
+        return
+    await run_db(repository.set_limit, update.effective_user.id, period, limit)
+    name = LIMIT_NAMES[period][lang]
+    msg = f"✅ {name} limit set to {limit}" if lang == 'en' else f"✅ تم ضبط الحد {name} بـ {limit}"
+    await update.message.reply_text(msg, reply_markup=get_main_menu_keyboard(lang))
+    context.user_data['awaiting_limit'] = False
 
 async def set_limit_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    db = SessionLocal()
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await get_profile(user_id)
     lang = user.language if user else 'en'
+
+    # /setlimit [daily|weekly|monthly] [amount]
+    args = list(context.args or []) if update.message else []
+    period = 'daily'
+    if args and args[0].lower() in LIMIT_PERIODS:
+        period = LIMIT_PERIODS[args.pop(0).lower()]
+    if args and user:
+        await save_limit(update, context, lang, period, args[0])
+        return
     
-    msg = "Please send the daily limit amount (e.g., 300):" if lang == 'en' else "يرجى إرسال قيمة الحد اليومي (مثلاً 300):"
-    await update.message.reply_text(msg)
-    context.user_data['awaiting_limit'] = True
-    db.close()
+    name = LIMIT_NAMES[period][lang]
+    msg = f"Please send the {name.lower()} limit amount (e.g., 300):" if lang == 'en' else f"يرجى إرسال قيمة الحد {name} (مثلاً 300):"
+    msg_obj = update.message if update.message else update.callback_query.message
+    await msg_obj.reply_text(msg)
+    context.user_data['awaiting_limit'] = period
+
+async def digest_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    user = await get_profile(user_id)
+    if not user:
+        await update.message.reply_text("Please send /start first.")
+        return
+    lang = user.language
+    s = STRINGS[lang]
+
+    # /digest [on|off]
+    choice = (context.args or [''])[0].lower()
+    if choice in ('on', 'off'):
+        await run_db(repository.set_digest, user_id, choice == 'on')
+        await update.message.reply_text(s['digest_on'] if choice == 'on' else s['digest_off'])
+        return
+    if lang == 'en':
+        state = "on" if user.digest_enabled else "off"
+    else:
+        state = "مفعّل" if user.digest_enabled else "متوقف"
+    await update.message.reply_text(s['digest_status'].format(state=state))
+
+def get_limit_alerts(user, totals, lang):
+    alerts = []
+    for period in ('daily', 'weekly', 'monthly'):
+        limit = getattr(user, f'{period}_limit', 0.0) or 0.0
+        if limit > 0 and totals.get(period, 0.0) > limit:
+            diff = totals[period] - limit
+            name = LIMIT_NAMES[period][lang]
+            alerts.append(f"\n⚠️ You exceeded your {name.lower()} limit by {diff:.2f}" if lang == 'en' else f"\n⚠️ لقد تجاوزت حدك {name} بـ {diff:.2f}")
+    return "".join(alerts) or None
 
 def get_smart_suggestions(user, extracted_txn):
     lang = user.language
@@ -154,19 +237,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text
     user_id = update.effective_user.id
     
-    db = SessionLocal()
-    user = db.query(User).filter(User.telegram_id == user_id).first()
-    if not user:
-        user = User(
-            telegram_id=user_id, 
-            username=update.effective_user.username,
-            full_name=update.effective_user.full_name,
-            language='ar',
-            is_active=True
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    user = await get_or_create_profile(user_id, update.effective_user.username, update.effective_user.full_name)
 
     lang = user.language
     s = STRINGS[lang]
@@ -183,7 +254,6 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if text == s['today_btn']:
         from src.main_logic import today_report
         await today_report(update, context)
-        db.close()
         return
 
     if text == s['reports_btn']:
@@ -193,97 +263,123 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             [InlineKeyboardButton(s['month_rep'], callback_data='rep_month')]
         ]
         await update.message.reply_text(s['choose_report'], reply_markup=InlineKeyboardMarkup(keyboard))
-        db.close()
         return
 
     if text == s['export_btn']:
         from src.main_logic import export_excel_cmd
         await export_excel_cmd(update, context)
-        db.close()
         return
 
     if text == s['limit_btn']:
         await set_limit_handler(update, context)
-        db.close()
         return
 
     if text == s['add_btn']:
         msg = "Ready! Just describe your transaction (e.g., 'Spent 50 for fuel')" if lang == 'en' else "أنا مستعد! فقط اكتب العملية (مثلاً: 'دفعت 50 بنزين')"
         await update.message.reply_text(msg)
-        db.close()
         return
 
     # Handle "Set Limit" value input
-    if context.user_data.get('awaiting_limit'):
-        # Clean input: allow commas and dots, remove spaces
-        clean_text = text.replace(',', '.').strip()
-        try:
-            limit = float(clean_text)
-            user.daily_limit = limit
-            db.commit()
-            msg = f"✅ Daily limit set to {limit}" if lang == 'en' else f"✅ تم ضبط الحد اليومي بـ {limit}"
-            await update.message.reply_text(msg, reply_markup=get_main_menu_keyboard(lang))
-            context.user_data['awaiting_limit'] = False
-        except ValueError:
-            await update.message.reply_text(s['invalid_number'])
-        db.close()
+    awaiting = context.user_data.get('awaiting_limit')
+    if awaiting:
+        period = awaiting if awaiting in LIMIT_NAMES else 'daily'
+        await save_limit(update, context, lang, period, text)
+        return
+
+    # Default: Natural Language Processing (rate limited per user, admitted globally)
+    # Every message is a transaction, so each dropped one gets its own quoted
+    # reply (paced by the outbound limiter) and the user knows what to resend
+    if not inbound_limiter.allow(user_id):
+        await update.message.reply_text(s['slow_down'], do_quote=True)
         return
+    try:
+        async with admission_queue.admit():
+            await record_transactions(update, user, text, lang)
+    except AdmissionQueueFull:
+        await update.message.reply_text(s['busy'], do_quote=True)
 
-    # Default: Natural Language Processing
+async def record_transactions(update, user, text, lang):
     status_msg = await update.message.reply_text("Processing... ⏳" if lang == 'en' else "جاري المعالجة... ⏳")
 
-    extracted = ai_service.parse_transaction(text, lang)
+    extracted = await get_ai_service().aparse_transactions(text, lang)
     
     if extracted:
         try:
-            txn_date = datetime.strptime(extracted['date'], '%Y-%m-%d').date()
-            new_txn = Transaction(
-                user_id=user.id,
-                type=extracted['type'],
-                category=extracted['category'],
-                amount=float(extracted['amount']),
-                description=extracted['description'],
-                date=txn_date
-            )
-            db.add(new_txn)
-            db.commit()
-
-            # Logic for over-limit alert
+            rows = []
+            for item in extracted:
+                try:
+                    rows.append({
+                        'type': item['type'],
+                        'category': item['category'],
+                        'amount': float(item['amount']),
+                        'description': item['description'],
+                        'date': datetime.strptime(item['date'], '%Y-%m-%d').date()
+                    })
+                except (TypeError, ValueError) as e:
+                    logger.debug(f"Skipping invalid item {item}: {e}")
+            if not rows:
+                await run_db(stats.record_parse_failure)
+                raise ValueError("no valid transactions in AI response")
+
+            # One bulk insert and one commit for the whole message (or batched
+            # with other messages when the write buffer is enabled)
+            await write_buffer.add(user.id, rows)
+
+            # Logic for over-limit alert (running totals, no SUM query), once per batch
             alert_text = None
-            if extracted['type'] == 'expense' and user.daily_limit > 0:
-                today_date = date.today()
-                total_spent = db.query(sa.func.sum(Transaction.amount)).filter(
-                    Transaction.user_id == user.id,
-                    Transaction.type == 'expense',
-                    Transaction.date == today_date
-                ).scalar() or 0.0
-                
-                if total_spent > user.daily_limit:
-                    diff = total_spent - user.daily_limit
-                    alert_text = f"\n⚠️ You exceeded your daily limit by {diff:.2f}" if lang == 'en' else f"\n⚠️ لقد تجاوزت حدك اليومي بـ {diff:.2f}"
-
-            # Prepare confirmation message
-            from src.reports import translate
-            translated_cat = translate(extracted['category'], lang)
-            conf_msg = (f"✅ Recorded: {extracted['type'].capitalize()} - {extracted['amount']} "
-                       f"({translated_cat})\n{extracted['description']}") if lang == 'en' else \
-                       (f"✅ تم تسجيل: {translate(extracted['type'], lang)} - {extracted['amount']} "
-                       f"({translated_cat})\n{extracted['description']}")
-            
+            has_limit = any((getattr(user, f'{p}_limit') or 0) > 0 for p in LIMIT_NAMES)
+            if any(r['type'] == 'expense' for r in rows) and has_limit:
+                totals = budget_ledger.peek(user.id)
+                if totals is None:
+                    await write_buffer.barrier(user.id)
+                    totals = await run_db(budget_ledger.warm, user.id)
+                alert_text = get_limit_alerts(user, totals, lang)
+
+            conf_msg = format_confirmation(rows, lang)
             if alert_text:
                 conf_msg += alert_text
 
             # SMART PREDICTION: Suggest next steps
-            suggestions = get_smart_suggestions(user, extracted)
+            expenses = [r for r in rows if r['type'] == 'expense']
+            suggestions = get_smart_suggestions(user, {
+                'type': 'expense' if expenses else 'income',
+                'amount': max(r['amount'] for r in (expenses or rows))
+            })
             
             await status_msg.edit_text(conf_msg, reply_markup=suggestions)
         except Exception as e:
-            print(f"DEBUG - Error saving txn: {e}")
+            logger.exception(f"Error saving txn: {e}")
             await status_msg.edit_text("Error processing entry." if lang == 'en' else "حدث خطأ أثناء المعالجة.")
     else:
         await status_msg.edit_text("I didn't understand. Please be more specific." if lang == 'en' else "لم أفهم العملية. يرجى التوضيح أكثر.")
-    
-    db.close()
+        await run_db(stats.record_parse_failure)
+
+def format_confirmation(rows, lang):
+    from src.reports import translate
+
+    def fmt_amount(amount):
+        return int(amount) if float(amount).is_integer() else amount
+
+    if len(rows) == 1:
+        row = rows[0]
+        translated_cat = translate(row['category'], lang)
+        if lang == 'en':
+            return (f"✅ Recorded: {row['type'].capitalize()} - {fmt_amount(row['amount'])} "
+                    f"({translated_cat})\n{row['description']}")
+        return (f"✅ تم تسجيل: {translate(row['type'], lang)} - {fmt_amount(row['amount'])} "
+                f"({translated_cat})\n{row['description']}")
+
+    lines = [f"✅ Recorded {len(rows)} transactions:" if lang == 'en' else f"✅ تم تسجيل {len(rows)} عمليات:"]
+    for row in rows:
+        txn_type = row['type'].capitalize() if lang == 'en' else translate(row['type'], lang)
+        lines.append(f"- {txn_type} {fmt_amount(row['amount'])} ({translate(row['category'], lang)}) {row['description']}")
+    expense = sum(r['amount'] for r in rows if r['type'] == 'expense')
+    income = sum(r['amount'] for r in rows if r['type'] == 'income')
+    if expense:
+        lines.append(f"💸 Total expense: {expense:.2f}" if lang == 'en' else f"💸 إجمالي المصاريف: {expense:.2f}")
+    if income:
+        lines.append(f"💰 Total income: {income:.2f}" if lang == 'en' else f"💰 إجمالي الدخل: {income:.2f}")
+    return "\n".join(lines)
 
 async def admin_approve(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
@@ -297,11 +393,8 @@ async def admin_approve(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         target_id = int(context.args[0])
-        db = SessionLocal()
-        user = db.query(User).filter(User.telegram_id == target_id).first()
+        user = await run_db(repository.set_active, target_id, True)
         if user:
-            user.is_active = True
-            db.commit()
             await update.message.reply_text(f"✅ User {target_id} approved.")
             # Notify user
             try:
@@ -310,7 +403,6 @@ async def admin_approve(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 pass
         else:
             await update.message.reply_text("User not found.")
-        db.close()
     except ValueError:
         await update.message.reply_text("Invalid ID.")
 
@@ -326,32 +418,125 @@ async def admin_deny(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         target_id = int(context.args[0])
-        db = SessionLocal()
-        user = db.query(User).filter(User.telegram_id == target_id).first()
+        user = await run_db(repository.set_active, target_id, False)
         if user:
-            user.is_active = False
-            db.commit()
             await update.message.reply_text(f"❌ User {target_id} denied.")
         else:
             await update.message.reply_text("User not found.")
-        db.close()
     except ValueError:
         await update.message.reply_text("Invalid ID.")
 
+def _users_page_markup(status, language, first_id, last_id, has_prev, has_next):
+    # Callback data: usr:<action>:<cursor>:<status>:<language>, '-' for no filter
+    filters = f"{status or '-'}:{language or '-'}"
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"usr:prev:{first_id}:{filters}"))
+    if has_next:
+        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f"usr:next:{last_id}:{filters}"))
+    rows = [nav] if nav else []
+    rows.append([InlineKeyboardButton("📥 CSV", callback_data=f"usr:csv:0:{filters}")])
+    return InlineKeyboardMarkup(rows)
+
+async def _users_page(status=None, language=None, after_id=None, before_id=None):
+    # Returns (text, reply_markup) for one page of the admin user list
+    rows, has_more = await run_db(
+        repository.list_users_page, after_id=after_id, before_id=before_id,
+        status=status, language=language, limit=Config.ADMIN_USERS_PAGE_SIZE
+    )
+    filters = ", ".join(f for f in (status, language) if f)
+    title = f"📋 Registered Users ({filters}):" if filters else "📋 Registered Users:"
+    if not rows:
+        return ("No users registered." if not filters else f"{title}\n\nNo matching users."), None
+    msg = title + "\n\n"
+    for u in rows:
+        icon = "✅" if u.is_active else "⏳"
+        last = u.last_activity.strftime('%Y-%m-%d') if u.last_activity else "—"
+        # Names are cut short so a full page stays under Telegram's 4096 characters
+        msg += f"{icon} {u.telegram_id} - @{(u.username or 'N/A')[:32]} ({(u.full_name or 'N/A')[:40]}) [{u.language}]\n"
+        msg += f"    {u.txn_count} txns · last {last}\n"
+    if before_id is not None:
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after_id is not None, has_more
+    return msg, _users_page_markup(status, language, rows[0].id, rows[-1].id, has_prev, has_next)
+
+async def _send_users_csv(message, status=None, language=None):
+    from src.export import run_users_export
+    export_file = await run_users_export(status, language)
+    if not export_file:
+        await message.reply_text("No users registered.")
+        return
+    with export_file:
+        await message.reply_document(document=export_file, filename=f"users_{date.today():%Y%m%d}.csv")
+
 async def admin_list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     if user_id != Config.ADMIN_ID:
         await update.message.reply_text(STRINGS['ar']['admin_only'])
         return
-    
-    db = SessionLocal()
-    users = db.query(User).all()
-    if not users:
-        await update.message.reply_text("No users registered.")
+
+    # /users [pending|active] [ar|en] [csv]
+    args = [a.lower() for a in (context.args or [])]
+    status = next((a for a in args if a in repository.USER_STATUS), None)
+    language = next((a for a in args if a in STRINGS), None)
+    if 'csv' in args:
+        await _send_users_csv(update.message, status, language)
+        return
+    msg, markup = await _users_page(status, language)
+    await update.message.reply_text(msg, reply_markup=markup)
+
+async def admin_users_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if query.from_user.id != Config.ADMIN_ID:
+        await query.answer(STRINGS['ar']['admin_only'])
+        return
+    await query.answer()
+
+    try:
+        _, action, cursor, status, language = query.data.split(':')
+        cursor = int(cursor)
+    except ValueError:
+        return
+    status = status if status in repository.USER_STATUS else None
+    language = language if language in STRINGS else None
+    if action == 'csv':
+        await _send_users_csv(query.message, status, language)
+        return
+    if action == 'next':
+        msg, markup = await _users_page(status, language, after_id=cursor)
     else:
-        msg = "📋 Registered Users:\n\n"
-        for u in users:
-            status = "✅" if u.is_active else "⏳"
-            msg += f"{status} {u.telegram_id} - @{u.username or 'N/A'} ({u.full_name or 'N/A'})\n"
-        await update.message.reply_text(msg)
-    db.close()
+        msg, markup = await _users_page(status, language, before_id=cursor)
+    await query.message.edit_text(msg, reply_markup=markup)
+
+async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    if user_id != Config.ADMIN_ID:
+        await update.message.reply_text(STRINGS['ar']['admin_only'])
+        return
+
+    # Reads the incrementally maintained aggregates only (src/stats.py)
+    data = await run_db(stats.get_stats)
+    c = data['counters']
+    users = int(c.get('users', 0))
+    active = int(c.get('users_active', 0))
+    parsed = int(c.get('parse_ok', 0))
+    failed = int(c.get('parse_failed', 0))
+    rate = (failed / (parsed + failed) * 100) if parsed + failed else 0.0
+    msg = "📈 Bot Statistics\n\n"
+    msg += f"👥 Users: {users:,} (✅ {active:,} active, ⏳ {users - active:,} pending)\n"
+    msg += f"🧾 Transactions: {int(c.get('transactions', 0)):,}\n"
+    msg += f"💸 Expenses: {c.get('expense_total', 0):,.2f} · 💰 Income: {c.get('income_total', 0):,.2f}\n"
+    msg += f"🤖 Parse failures: {failed:,} of {parsed + failed:,} messages ({rate:.1f}%)\n"
+
+    msg += "\n📅 Last 7 days (UTC): active users · new users · transactions · parse failures\n"
+    for day, values in data['daily']:
+        msg += (f"{day:%m-%d}: {int(values.get('active_users', 0))} · {int(values.get('new_users', 0))} · "
+                f"{int(values.get('transactions', 0))} · {int(values.get('parse_failed', 0))}\n")
+
+    if data['categories']:
+        from src.reports import translate
+        msg += "\n📂 Spending by category (last 30 days):\n"
+        for category, total in data['categories']:
+            msg += f"- {translate(category, 'en')}: {total:,.2f}\n"
+    await update.message.reply_text(msg)
@@ -0,0 +1,499 @@
+import os
+import re
+import csv
+import codecs
+import asyncio
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from src.config import Config
+from src.database import session_scope, run_db, Transaction
+from src.local_parser import fold_text, categorize, DIGIT_TRANSLATION
+from src.reports import CATEGORY_MAP
+from src import repository
+
+logger = logging.getLogger(__name__)
+
+# Bulk import of bank statements and spreadsheets sent as a CSV or XLSX
+# document. The file is read as a stream (csv module / openpyxl read-only
+# mode) IMPORT_CHUNK_ROWS rows at a time on the import pool, so memory
+# follows the chunk size, not the file. Each chunk is checked against what
+# the user already has on those dates, then categorised (the file's own
+# category column or the local parser's keywords first, the remaining
+# distinct descriptions in batched Groq calls) and inserted with one commit.
+# No step holds the event loop or a DB worker for longer than one chunk.
+
+MAX_HEADER_ROWS = 20  # rows searched for the header (statements start with account details)
+MEMO_SIZE = 50000  # distinct descriptions remembered per import
+DESCRIPTION_LENGTH = 255  # Transaction.description
+CATEGORY_LENGTH = 50  # Transaction.category
+
+EXTENSIONS = {'.csv': 'csv', '.xlsx': 'xlsx', '.xlsm': 'xlsx'}
+MIME_TYPES = {
+    'text/csv': 'csv',
+    'text/comma-separated-values': 'csv',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
+}
+
+# Header names per field, compared after _header_key()
+COLUMN_ALIASES = {
+    'date': {
+        'date', 'transaction date', 'txn date', 'trans date', 'posting date', 'post date', 'posted date',
+        'value date', 'booking date', 'operation date',
+        'التاريخ', 'تاريخ', 'تاريخ العمليه', 'تاريخ المعامله', 'تاريخ القيد', 'تاريخ الحركه',
+    },
+    'description': {
+        'description', 'details', 'transaction details', 'narrative', 'narration', 'memo', 'payee',
+        'merchant', 'particulars', 'remarks', 'note', 'notes', 'transaction description',
+        'الوصف', 'البيان', 'التفاصيل', 'تفاصيل', 'وصف', 'بيان', 'ملاحظات', 'الملاحظات', 'تفاصيل العمليه',
+    },
+    'amount': {
+        'amount', 'value', 'transaction amount', 'sum',
+        'المبلغ', 'مبلغ', 'القيمه', 'قيمه', 'مبلغ العمليه',
+    },
+    'debit': {
+        'debit', 'debits', 'debit amount', 'withdrawal', 'withdrawals', 'money out', 'paid out', 'out', 'expense',
+        'مدين', 'المدين', 'سحب', 'مسحوبات', 'المسحوبات', 'خصم', 'مصروف', 'مصروفات',
+    },
+    'credit': {
+        'credit', 'credits', 'credit amount', 'deposit', 'deposits', 'money in', 'paid in', 'in', 'income',
+        'دائن', 'الدائن', 'ايداع', 'ايداعات', 'الايداعات', 'دخل',
+    },
+    'type': {
+        'type', 'transaction type', 'txn type', 'dr cr', 'debit credit',
+        'النوع', 'نوع', 'نوع العمليه',
+    },
+    'category': {
+        'category', 'الفئه', 'فئه', 'التصنيف', 'تصنيف',
+    },
+}
+
+# Words in a type column (or after an amount, "50.00 DR") that give the direction
+EXPENSE_MARKERS = {'debit', 'dr', 'd', 'withdrawal', 'expense', 'out', 'purchase', 'payment',
+                   'مدين', 'سحب', 'مصروف', 'خصم', 'شراء'}
+INCOME_MARKERS = {'credit', 'cr', 'c', 'deposit', 'income', 'in', 'refund',
+                  'دائن', 'ايداع', 'دخل', 'راتب', 'استرداد'}
+
+# Day-first formats come first: an ambiguous 03/04 is the 3rd of April
+DATE_FORMATS = (
+    '%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y/%m/%d', '%d/%m/%y', '%d-%m-%y',
+    '%d-%b-%Y', '%d %b %Y', '%d-%b-%y', '%d %B %Y', '%b %d, %Y', '%B %d, %Y', '%m/%d/%Y', '%Y%m%d',
+)
+EXCEL_EPOCH = date(1899, 12, 30)
+
+AMOUNT_RE = re.compile(r'\d+(?:[ ,.\u00a0]\d+)*')
+NEGATIVE_RE = re.compile(r'-\s*\d|\d\s*-$|^\(.*\)$')
+MARKER_RE = re.compile(r'[^\W\d_]+')
+OVERRIDE_RE = re.compile(r'(\w+)\s*=\s*([^,;\n]+)')
+
+# Categories the LLM may answer with (the ones the reports translate)
+LLM_CATEGORIES = tuple(c for c in CATEGORY_MAP if c not in ('income', 'expense'))
+# Category column values: keys and their English/Arabic labels
+CATEGORY_NAMES = {fold_text(k): k for k in LLM_CATEGORIES}
+CATEGORY_NAMES.update({fold_text(label): k for k in LLM_CATEGORIES for label in CATEGORY_MAP[k].values()})
+
+_import_executor = ThreadPoolExecutor(max_workers=Config.IMPORT_WORKERS, thread_name_prefix="import")
+
+class ImportFileError(Exception):
+    # reason is a STRINGS key suffix: 'no_columns' or 'bad_file'
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+class ImportProgress:
+    def __init__(self):
+        self.read = 0
+        self.added = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.llm_categorized = 0
+        self.truncated = False
+
+def file_kind(file_name, mime_type=None):
+    # 'csv', 'xlsx' or None for anything else
+    extension = os.path.splitext(file_name or '')[1].lower()
+    return EXTENSIONS.get(extension) or MIME_TYPES.get(mime_type or '')
+
+def parse_overrides(caption):
+    # "date=Posting Date, amount=Value" -> {'date': 'Posting Date', 'amount': 'Value'}
+    return {
+        field.lower(): column.strip() for field, column in OVERRIDE_RE.findall(caption or '')
+        if field.lower() in COLUMN_ALIASES
+    }
+
+def _header_key(value):
+    text = re.sub(r'\(.*?\)|\[.*?\]', ' ', fold_text(str(value or '')))
+    return ' '.join(re.sub(r'[\W_]+', ' ', text).split())
+
+def find_columns(row, overrides=None):
+    # {field: column index} when row is a header with a date and an amount
+    # (or debit/credit) column, else None
+    keys = [_header_key(cell) for cell in row]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        if overrides and field in overrides:
+            aliases = {_header_key(overrides[field])}
+        for index, key in enumerate(keys):
+            if key and key in aliases and index not in columns.values():
+                columns[field] = index
+                break
+    if 'date' in columns and ({'amount', 'debit', 'credit'} & columns.keys()):
+        return columns
+    return None
+
+def parse_amount(value):
+    # Signed float from a spreadsheet number or text such as "1,234.50",
+    # "(12.00)", "SAR -50" or "١٬٥٠٠"; None when there is no number
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).translate(DIGIT_TRANSLATION).strip()
+    match = AMOUNT_RE.search(text)
+    if not match:
+        return None
+    raw = re.sub(r'[ \u00a0]', '', match.group())
+    if ',' in raw and '.' in raw:
+        # Whichever comes last is the decimal point
+        if raw.rfind(',') > raw.rfind('.'):
+            raw = raw.replace('.', '').replace(',', '.')
+        else:
+            raw = raw.replace(',', '')
+    elif ',' in raw:
+        parts = raw.split(',')
+        raw = ''.join(parts) if all(len(p) == 3 for p in parts[1:]) else raw.replace(',', '.')
+    elif raw.count('.') > 1:
+        raw = raw.replace('.', '')
+    try:
+        amount = float(raw)
+    except ValueError:
+        return None
+    return -amount if NEGATIVE_RE.search(text) else amount
+
+def _markers(value):
+    return set(MARKER_RE.findall(fold_text(str(value)))) if value not in (None, '') else set()
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return ' '.join(str(value).split())
+
+def _csv_encoding(path):
+    # UTF-8 (with or without a BOM) when the whole file decodes as such,
+    # otherwise Windows-1256, which Excel uses for Arabic CSVs
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                decoder.decode(block)
+            decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return 'cp1256'
+    return 'utf-8-sig'
+
+def _iter_csv(path):
+    with open(path, newline='', encoding=_csv_encoding(path), errors='replace') as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+def _iter_xlsx(path):
+    from openpyxl import load_workbook
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        logger.warning(f"Unreadable workbook {path}: {e}")
+        raise ImportFileError('bad_file')
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def _iter_rows(path, kind):
+    return _iter_csv(path) if kind == 'csv' else _iter_xlsx(path)
+
+def _is_blank(row):
+    return not any(cell not in (None, '') for cell in row)
+
+class StatementReader:
+    # Blocking; turns the file into transaction rows (dicts with type,
+    # category, amount, description and date) chunk by chunk. category is
+    # None where neither the file nor the keywords decide it.
+    def __init__(self, path, kind, overrides=None, max_rows=None):
+        self._rows = _iter_rows(path, kind)
+        self.max_rows = max_rows or Config.IMPORT_MAX_ROWS
+        self.read = 0
+        self.skipped = 0
+        self.truncated = False
+        self._date_format = None
+        self.columns = None
+        header_rows = 0
+        try:
+            for _ in range(MAX_HEADER_ROWS):
+                row = next(self._rows, None)
+                if row is None:
+                    break
+                header_rows += 1
+                self.columns = find_columns(row, overrides)
+                if self.columns:
+                    break
+            if not self.columns:
+                self.close()
+                raise ImportFileError('no_columns')
+            # Direction of positive amounts in a signed amount column.
+            # Statements sign their debits, so if any amount in the file is
+            # negative the positive ones are income; a list of spending has
+            # no signs at all. Debit/credit columns say it themselves.
+            self._positive = 'income'
+            if 'amount' in self.columns and not self._has_negative_amounts(path, kind, header_rows):
+                self._positive = 'expense'
+        except (csv.Error, UnicodeError) as e:
+            self.close()
+            logger.warning(f"Unreadable CSV {path}: {e}")
+            raise ImportFileError('bad_file')
+
+    def close(self):
+        self._rows.close()
+
+    def next_chunk(self, size):
+        # Up to `size` transaction rows; [] once the file is exhausted
+        result = []
+        while not result:
+            raw_rows = []
+            for row in self._rows:
+                if self.read >= self.max_rows:
+                    self.truncated = True
+                    break
+                if _is_blank(row):
+                    continue
+                self.read += 1
+                raw_rows.append(row)
+                if len(raw_rows) >= size:
+                    break
+            if not raw_rows:
+                self.close()
+                return result
+            for row in raw_rows:
+                txn = self._convert(row)
+                if txn is None:
+                    self.skipped += 1
+                else:
+                    result.append(txn)
+        return result
+
+    def _cell(self, row, field):
+        index = self.columns.get(field)
+        return row[index] if index is not None and index < len(row) else None
+
+    def _has_negative_amounts(self, path, kind, header_rows):
+        # A separate streaming pass over the rows an import would read,
+        # stopping at the first negative amount, so no row is classified
+        # before the whole file has been seen
+        rows = _iter_rows(path, kind)
+        try:
+            for _ in range(header_rows):
+                next(rows, None)
+            seen = 0
+            for row in rows:
+                if _is_blank(row):
+                    continue
+                seen += 1
+                if seen > self.max_rows:
+                    break
+                amount = parse_amount(self._cell(row, 'amount'))
+                if amount is not None and amount < 0:
+                    return True
+        finally:
+            rows.close()
+        return False
+
+    def _parse_date(self, value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # An Excel serial day number in a cell without a date format
+            return EXCEL_EPOCH + timedelta(days=int(value)) if 20000 < value < 80000 else None
+        text = _text(value).translate(DIGIT_TRANSLATION)
+        if not text:
+            return None
+        # The format that matched last time is tried first
+        formats = (self._date_format,) + DATE_FORMATS if self._date_format else DATE_FORMATS
+        candidates = (text, text.split()[0].split('T')[0]) if (' ' in text or 'T' in text) else (text,)
+        for candidate in candidates:
+            for fmt in formats:
+                try:
+                    parsed = datetime.strptime(candidate, fmt).date()
+                except ValueError:
+                    continue
+                self._date_format = fmt
+                return parsed
+        return None
+
+    def _direction(self, row, raw_amount, amount):
+        markers = _markers(self._cell(row, 'type')) | _markers(raw_amount if isinstance(raw_amount, str) else None)
+        if markers & EXPENSE_MARKERS and not markers & INCOME_MARKERS:
+            return 'expense'
+        if markers & INCOME_MARKERS and not markers & EXPENSE_MARKERS:
+            return 'income'
+        return 'expense' if amount < 0 else self._positive
+
+    def _category(self, value):
+        text = _text(value)
+        if not text:
+            return None
+        key = fold_text(text).strip()
+        return CATEGORY_NAMES.get(key) or categorize(text) or key[:CATEGORY_LENGTH]
+
+    def _convert(self, row):
+        txn_date = self._parse_date(self._cell(row, 'date'))
+        if txn_date is None:
+            return None
+        amount = txn_type = None
+        debit = parse_amount(self._cell(row, 'debit'))
+        credit = parse_amount(self._cell(row, 'credit'))
+        if debit:
+            amount, txn_type = abs(debit), 'expense'
+        elif credit:
+            amount, txn_type = abs(credit), 'income'
+        elif 'amount' in self.columns:
+            raw = self._cell(row, 'amount')
+            signed = parse_amount(raw)
+            if signed:
+                amount, txn_type = abs(signed), self._direction(row, raw, signed)
+        if not amount:
+            return None
+        description = _text(self._cell(row, 'description')) or _text(self._cell(row, 'category'))
+        return {
+            'type': txn_type,
+            'category': self._category(self._cell(row, 'category')),
+            'amount': round(amount, 2),
+            'description': description[:DESCRIPTION_LENGTH],
+            'date': txn_date,
+        }
+
+class _Categorizer:
+    # Fills in the categories a chunk left open. Distinct descriptions are
+    # memoised for the whole import, so a merchant that appears on every
+    # page costs one lookup. Groq gets IMPORT_LLM_BATCH_SIZE descriptions per
+    # call, one call at a time (chat messages keep the rest of the Groq
+    # concurrency), at most IMPORT_LLM_MAX_DESCRIPTIONS per import; anything
+    # beyond that or after a failed call is 'other'.
+    def __init__(self):
+        self.memo = {}
+        self.llm_budget = Config.IMPORT_LLM_MAX_DESCRIPTIONS
+        self.llm_categorized = 0
+
+    def _remember(self, key, category):
+        if len(self.memo) < MEMO_SIZE:
+            self.memo[key] = category
+
+    async def resolve(self, rows):
+        pending = {}
+        for row in rows:
+            if row['category'] is not None:
+                continue
+            key = fold_text(row['description']).strip()
+            if not key:
+                row['category'] = 'other'
+            elif key in self.memo:
+                row['category'] = self.memo[key]
+            else:
+                category = categorize(key)
+                if category:
+                    self._remember(key, category)
+                    row['category'] = category
+                else:
+                    pending.setdefault(key, row['description'])
+
+        answered = {}
+        keys = list(pending)[:max(self.llm_budget, 0)]
+        if keys:
+            from src.ai_service import get_ai_service
+            service = get_ai_service()
+            for start in range(0, len(keys), Config.IMPORT_LLM_BATCH_SIZE):
+                batch = keys[start:start + Config.IMPORT_LLM_BATCH_SIZE]
+                try:
+                    results = await service.acategorize([pending[k] for k in batch], LLM_CATEGORIES)
+                except Exception as e:
+                    logger.warning(f"Import categorisation failed, the rest is 'other': {e}")
+                    self.llm_budget = 0
+                    break
+                self.llm_budget -= len(batch)
+                self.llm_categorized += len(results)
+                for index, key in enumerate(batch):
+                    answered[key] = results.get(index, 'other')
+                    self._remember(key, answered[key])
+
+        for row in rows:
+            if row['category'] is None:
+                row['category'] = answered.get(fold_text(row['description']).strip(), 'other')
+
+def _key(txn_date, txn_type, amount, description):
+    return txn_date, txn_type, round(amount, 2), description or ''
+
+def new_rows(user_id, rows, inserted):
+    # Blocking; the rows the user doesn't already have (same date, type,
+    # amount and description). inserted counts this import's own rows, so
+    # lines repeated in the file are all kept; the returned rows are added
+    # to it.
+    first, last = min(r['date'] for r in rows), max(r['date'] for r in rows)
+    with session_scope() as db:
+        existing = Counter(_key(*row) for row in db.query(
+            Transaction.date, Transaction.type, Transaction.amount, Transaction.description
+        ).filter(
+            Transaction.user_id == user_id,
+            Transaction.date >= first,
+            Transaction.date <= last
+        ))
+    for key in existing:
+        existing[key] -= inserted.get(key, 0)
+
+    fresh = []
+    for row in rows:
+        key = _key(row['date'], row['type'], row['amount'], row['description'])
+        if existing[key] > 0:
+            existing[key] -= 1
+            continue
+        fresh.append(row)
+        inserted[key] += 1
+    return fresh
+
+async def run_import(path, kind, user_id, overrides=None, progress=None):
+    # Returns the final ImportProgress; progress(state) is awaited after
+    # every chunk. Raises ImportFileError for files it can't use.
+    loop = asyncio.get_running_loop()
+    reader = await loop.run_in_executor(_import_executor, StatementReader, path, kind, overrides)
+    state = ImportProgress()
+    categorizer = _Categorizer()
+    inserted = Counter()
+    try:
+        while True:
+            rows = await loop.run_in_executor(_import_executor, reader.next_chunk, Config.IMPORT_CHUNK_ROWS)
+            state.read, state.skipped, state.truncated = reader.read, reader.skipped, reader.truncated
+            if not rows:
+                break
+            # Duplicates are dropped first so they never cost a Groq call
+            fresh = await run_db(new_rows, user_id, rows, inserted)
+            state.duplicates += len(rows) - len(fresh)
+            if fresh:
+                await categorizer.resolve(fresh)
+                state.llm_categorized = categorizer.llm_categorized
+                await run_db(repository.add_transaction_batches, [(user_id, fresh)], parsed_messages=False)
+                state.added += len(fresh)
+            if progress:
+                await progress(state)
+    finally:
+        # Also when an error stops the import part way through
+        await loop.run_in_executor(_import_executor, reader.close)
+    logger.info(f"Import for user {user_id}: {state.read} rows, {state.added} added, "
+                f"{state.duplicates} duplicates, {state.skipped} skipped, {state.llm_categorized} categorised by Groq")
+    return state
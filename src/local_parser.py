@@ -0,0 +1,293 @@
+import re
+import threading
+from datetime import date, timedelta
+from src.reports import CATEGORY_MAP
+
+# Deterministic parser for the simple, well-structured entries that make up
+# most traffic ("Spent 50 on coffee", "دفعت 50 بنزين", "salary 8000").
+# Anything it is not sure about is left to the LLM.
+
+DIGIT_TRANSLATION = str.maketrans({
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+    '۰': '0', '۱': '1', '۲': '2', '۳': '3', '۴': '4',
+    '۵': '5', '۶': '6', '۷': '7', '۸': '8', '۹': '9',
+    '٫': '.', '٬': ',', '،': ','
+})
+
+# Letter variants that users type interchangeably
+ARABIC_FOLDING = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ة': 'ه', 'ى': 'ي', 'ـ': ''})
+ARABIC_DIACRITICS = re.compile(r'[ً-ْ]')
+ARABIC_PREFIXES = ('وبال', 'بال', 'وال', 'لل', 'ال', 'و', 'ب', 'ل')
+
+# Larger amounts are rare enough to leave to the LLM
+MAX_AMOUNT = 1_000_000
+
+NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)*')
+ISO_DATE_RE = re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b')
+TOKEN_RE = re.compile(r'[\w$.]+')
+# Separators between entries in "coffee 15, taxi 30\nlunch 55"; a comma
+# followed by three digits is a thousands separator, not a separator
+SEGMENT_SPLIT_RE = re.compile(r'\n|;|،|\+|,(?!\d{3}(?!\d))|\band\b')
+
+# keyword -> (category, English description)
+CATEGORY_KEYWORDS = {
+    # food
+    'coffee': ('food', 'Coffee'), 'cafe': ('food', 'Coffee'), 'tea': ('food', 'Tea'),
+    'lunch': ('food', 'Lunch'), 'dinner': ('food', 'Dinner'), 'breakfast': ('food', 'Breakfast'),
+    'food': ('food', 'Food'), 'restaurant': ('food', 'Restaurant'), 'groceries': ('food', 'Groceries'),
+    'grocery': ('food', 'Groceries'), 'pizza': ('food', 'Pizza'), 'burger': ('food', 'Burger'),
+    'قهوه': ('food', 'Coffee'), 'كوفي': ('food', 'Coffee'), 'شاي': ('food', 'Tea'),
+    'غداء': ('food', 'Lunch'), 'غدا': ('food', 'Lunch'), 'عشاء': ('food', 'Dinner'), 'عشا': ('food', 'Dinner'),
+    'فطور': ('food', 'Breakfast'), 'اكل': ('food', 'Food'), 'مطعم': ('food', 'Restaurant'),
+    'بقاله': ('food', 'Groceries'), 'مقاضي': ('food', 'Groceries'), 'بيتزا': ('food', 'Pizza'),
+    # transport
+    'taxi': ('transport', 'Taxi'), 'uber': ('transport', 'Uber'), 'careem': ('transport', 'Careem'),
+    'bus': ('transport', 'Bus'), 'metro': ('transport', 'Metro'), 'parking': ('transport', 'Parking'),
+    'تاكسي': ('transport', 'Taxi'), 'اوبر': ('transport', 'Uber'), 'كريم': ('transport', 'Careem'),
+    'باص': ('transport', 'Bus'), 'مترو': ('transport', 'Metro'), 'مواقف': ('transport', 'Parking'),
+    # fuel
+    'fuel': ('fuel', 'Fuel'), 'petrol': ('fuel', 'Fuel'), 'gas': ('fuel', 'Fuel'), 'gasoline': ('fuel', 'Fuel'),
+    'بنزين': ('fuel', 'Fuel'), 'وقود': ('fuel', 'Fuel'), 'ديزل': ('fuel', 'Fuel'),
+    # bills
+    'bill': ('bills', 'Bill'), 'bills': ('bills', 'Bills'), 'electricity': ('bills', 'Electricity bill'),
+    'water': ('bills', 'Water bill'), 'internet': ('bills', 'Internet bill'), 'phone': ('bills', 'Phone bill'),
+    'فاتوره': ('bills', 'Bill'), 'فواتير': ('bills', 'Bills'), 'كهرباء': ('bills', 'Electricity bill'),
+    'ماء': ('bills', 'Water bill'), 'مويه': ('bills', 'Water bill'), 'انترنت': ('bills', 'Internet bill'),
+    'جوال': ('bills', 'Phone bill'), 'نت': ('bills', 'Internet bill'),
+    # rent
+    'rent': ('rent', 'Rent'), 'ايجار': ('rent', 'Rent'),
+    # health
+    'pharmacy': ('health', 'Pharmacy'), 'doctor': ('health', 'Doctor'), 'medicine': ('health', 'Medicine'),
+    'hospital': ('health', 'Hospital'), 'clinic': ('health', 'Clinic'),
+    'صيدليه': ('health', 'Pharmacy'), 'دكتور': ('health', 'Doctor'), 'دواء': ('health', 'Medicine'),
+    'علاج': ('health', 'Medicine'), 'مستشفي': ('health', 'Hospital'), 'مستوصف': ('health', 'Clinic'),
+    # entertainment
+    'cinema': ('entertainment', 'Cinema'), 'movie': ('entertainment', 'Movie'), 'netflix': ('entertainment', 'Netflix'),
+    'game': ('entertainment', 'Game'), 'games': ('entertainment', 'Games'),
+    'سينما': ('entertainment', 'Cinema'), 'فيلم': ('entertainment', 'Movie'), 'نتفلكس': ('entertainment', 'Netflix'),
+    'العاب': ('entertainment', 'Games'),
+    # shopping
+    'shopping': ('shopping', 'Shopping'), 'clothes': ('shopping', 'Clothes'), 'shoes': ('shopping', 'Shoes'),
+    'mall': ('shopping', 'Shopping'), 'تسوق': ('shopping', 'Shopping'), 'ملابس': ('shopping', 'Clothes'),
+    'جزمه': ('shopping', 'Shoes'), 'مول': ('shopping', 'Shopping'),
+    # income
+    'salary': ('salary', 'Salary'), 'راتب': ('salary', 'Salary'), 'معاش': ('salary', 'Salary'),
+}
+
+# Only map to categories the reports know how to translate
+KNOWN_KEYWORDS = {k: v for k, v in CATEGORY_KEYWORDS.items() if v[0] in CATEGORY_MAP}
+
+# Descriptions a more specific keyword in the same message should replace
+GENERIC_DESCRIPTIONS = {'Bill', 'Bills', 'Food'}
+
+INCOME_WORDS = {
+    'received', 'receive', 'got', 'earned', 'income', 'bonus', 'deposit',
+    'استلمت', 'قبضت', 'دخل', 'نزل', 'مكافاه', 'ايداع',
+}
+EXPENSE_WORDS = {
+    'spent', 'spend', 'paid', 'pay', 'bought', 'buy', 'expense',
+    'صرفت', 'دفعت', 'اشتريت', 'سددت', 'شريت', 'مصروف',
+}
+CURRENCY_WORDS = {
+    'sar', 'sr', 'riyal', 'riyals', 'rial', 'rials', 'usd', 'dollar', 'dollars', '$',
+    'aed', 'dirham', 'dirhams', 'egp', 'pound', 'pounds',
+    'ريال', 'ريالات', 'رس', 'دولار', 'دولارات', 'درهم', 'دراهم', 'جنيه',
+}
+STOP_WORDS = {
+    'on', 'for', 'at', 'in', 'the', 'a', 'an', 'to', 'of', 'my', 'from', 'i', 'me', 'and', 'with',
+    'علي', 'في', 'من', 'الي', 'حق', 'عن', 'مع',
+}
+# word -> day offset
+RELATIVE_DATES = {
+    'today': 0, 'tonight': 0, 'yesterday': -1,
+    'اليوم': 0, 'امس': -1, 'البارحه': -1, 'مبارح': -1,
+}
+# multi-word phrases, matched before tokenising
+RELATIVE_DATE_PHRASES = {
+    'day before yesterday': -2, 'قبل امس': -2, 'اول امس': -2, 'اول امبارح': -2,
+}
+
+def fold_text(text: str) -> str:
+    text = text.translate(DIGIT_TRANSLATION)
+    text = ARABIC_DIACRITICS.sub('', text)
+    return text.translate(ARABIC_FOLDING).lower()
+
+def _parse_amount(raw: str):
+    # "8,000" is a thousands separator, "150,5" a decimal comma
+    if ',' in raw:
+        parts = raw.split(',')
+        if all(len(p) == 3 for p in parts[1:]):
+            raw = ''.join(parts)
+        elif len(parts) == 2:
+            raw = '.'.join(parts)
+        else:
+            return None
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+def _candidates(token: str):
+    # Two letters left after a prefix are usually part of another word
+    # ("بنت" is not "ب" + "نت"), so short keywords only match whole tokens
+    yield token
+    for prefix in ARABIC_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 3:
+            yield token[len(prefix):]
+
+def _lookup(token: str, vocabulary):
+    for cand in _candidates(token):
+        if cand in vocabulary:
+            return cand
+    return None
+
+def categorize(text: str, keywords=None):
+    # Category named by the keywords in free text (e.g. a bank statement
+    # line), or None when it has none or they disagree
+    keywords = keywords or KNOWN_KEYWORDS
+    found = None
+    for token in TOKEN_RE.findall(fold_text(text)):
+        keyword = _lookup(token.strip('.'), keywords)
+        if keyword is None:
+            continue
+        if found is not None and keywords[keyword][0] != found:
+            return None
+        found = keywords[keyword][0]
+    return found
+
+class LocalParser:
+    def __init__(self, min_confidence: float = 0.75):
+        self.min_confidence = min_confidence
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.keywords = KNOWN_KEYWORDS
+
+    def parse(self, message: str):
+        # A list with one item per entry, or None if any entry is unclear
+        result = []
+        for segment in SEGMENT_SPLIT_RE.split(message):
+            if not segment.strip():
+                continue
+            item = self._parse(segment)
+            if item is None:
+                result = None
+                break
+            result.append(item)
+        result = result or None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / total) if total else 0.0
+            }
+
+    def _parse(self, message: str):
+        text = fold_text(message)
+        today = date.today()
+        txn_date = None
+
+        match = ISO_DATE_RE.search(text)
+        if match:
+            try:
+                txn_date = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            except ValueError:
+                return None
+            text = text[:match.start()] + ' ' + text[match.end():]
+
+        for phrase, offset in RELATIVE_DATE_PHRASES.items():
+            if phrase in text:
+                if txn_date is not None:
+                    return None
+                txn_date = today + timedelta(days=offset)
+                text = text.replace(phrase, ' ')
+
+        numbers = NUMBER_RE.findall(text)
+        if len(numbers) != 1:
+            return None
+        # A leading zero ("0501234567") is a phone or account number, not a price
+        if len(numbers[0]) > 1 and numbers[0][0] == '0' and numbers[0][1].isdigit():
+            return None
+        amount = _parse_amount(numbers[0])
+        if not amount or amount <= 0 or amount > MAX_AMOUNT:
+            return None
+        text = NUMBER_RE.sub(' ', text)
+        # "ر.س" loses its dot after folding/tokenising
+        text = text.replace('ر.س', ' رس ')
+
+        category = None
+        description = None
+        direction = None
+        known = 0
+        unknown = []
+        tokens = [t.strip('.') for t in TOKEN_RE.findall(text)]
+        tokens = [t for t in tokens if t]
+        for token in tokens:
+            keyword = _lookup(token, self.keywords)
+            if keyword:
+                cat, desc = self.keywords[keyword]
+                if category and cat != category:
+                    return None  # two different categories, let the LLM decide
+                if description is None or description in GENERIC_DESCRIPTIONS:
+                    description = desc
+                category = cat
+                known += 1
+                continue
+            word = _lookup(token, RELATIVE_DATES)
+            if word:
+                if txn_date is not None and txn_date != today + timedelta(days=RELATIVE_DATES[word]):
+                    return None
+                txn_date = today + timedelta(days=RELATIVE_DATES[word])
+                known += 1
+                continue
+            if _lookup(token, INCOME_WORDS):
+                if direction == 'expense':
+                    return None
+                direction = 'income'
+                known += 1
+                continue
+            if _lookup(token, EXPENSE_WORDS):
+                if direction == 'income':
+                    return None
+                direction = 'expense'
+                known += 1
+                continue
+            if _lookup(token, CURRENCY_WORDS) or _lookup(token, STOP_WORDS):
+                known += 1
+                continue
+            unknown.append(token)
+
+        if not category:
+            return None
+        is_income = category == 'salary'
+        # A direction that contradicts the category ("paid salary 3000" is
+        # an expense) is left to the LLM
+        if direction == 'income' and not is_income:
+            return None
+        if direction == 'expense' and is_income:
+            return None
+        txn_type = 'income' if is_income else 'expense'
+
+        confidence = known / (known + len(unknown))
+        if confidence < self.min_confidence:
+            return None
+        if unknown:
+            description = f"{description} - {' '.join(unknown)}"
+
+        return {
+            "type": txn_type,
+            "category": category,
+            "amount": int(amount) if amount.is_integer() else amount,
+            "description": description,
+            "date": (txn_date or today).strftime('%Y-%m-%d')
+        }
@@ -1,59 +1,150 @@
-from src.database import SessionLocal, User
-from src.reports import get_report_data, generate_summary_text, export_to_excel
-import io
+import logging
+from src.database import run_db
+from src.reports import get_report_summary, generate_summary_text
+from src.export import run_export, EXPORT_MAX_DAYS
+from src.user_cache import get_profile
+from src.write_buffer import write_buffer
+from src.config import Config
+from src import importer
 
-async def today_report(update, context):
+logger = logging.getLogger(__name__)
+
+async def _send_summary(update, days):
     user_id = update.effective_user.id
-    db = SessionLocal()
-    user = db.query(User).filter(User.telegram_id == user_id).first()
-    lang = user.language if user else 'en'
-    df = get_report_data(user.id, days=1)
+    user = await get_profile(user_id)
+    msg_obj = update.message if update.message else update.callback_query.message
+    if not user:
+        await msg_obj.reply_text("Please send /start first.")
+        return
+    lang = user.language
+    await write_buffer.barrier(user.id)
+    summary = await run_db(get_report_summary, user.id, days=days)
     
-    # Check if this is a callback query or a message
-    if update.message:
-        await update.message.reply_text(generate_summary_text(df, lang), parse_mode='Markdown')
-    elif update.callback_query:
-        await update.callback_query.message.reply_text(generate_summary_text(df, lang), parse_mode='Markdown')
-    db.close()
+    # Works for both a command message and a callback query
+    await msg_obj.reply_text(generate_summary_text(summary, lang), parse_mode='Markdown')
+
+    # Weekly/monthly reports also get a spending chart (cached until the data changes)
+    if Config.CHARTS_ENABLED and days >= 7 and summary.expense > 0:
+        try:
+            from src.charts import get_report_chart
+            chart = await get_report_chart(user, days)
+            if chart:
+                await msg_obj.reply_photo(photo=chart)
+        except Exception as e:
+            logger.warning(f"Chart failed: {e}")
+
+async def today_report(update, context):
+    await _send_summary(update, days=1)
 
 async def week_report(update, context):
-    user_id = update.effective_user.id
-    db = SessionLocal()
-    user = db.query(User).filter(User.telegram_id == user_id).first()
-    lang = user.language if user else 'en'
-    df = get_report_data(user.id, days=7)
-    
-    if update.message:
-        await update.message.reply_text(generate_summary_text(df, lang), parse_mode='Markdown')
-    elif update.callback_query:
-        await update.callback_query.message.reply_text(generate_summary_text(df, lang), parse_mode='Markdown')
-    db.close()
+    await _send_summary(update, days=7)
 
 async def month_report(update, context):
-    user_id = update.effective_user.id
-    db = SessionLocal()
-    user = db.query(User).filter(User.telegram_id == user_id).first()
-    lang = user.language if user else 'en'
-    df = get_report_data(user.id, days=30)
-    
-    if update.message:
-        await update.message.reply_text(generate_summary_text(df, lang), parse_mode='Markdown')
-    elif update.callback_query:
-        await update.callback_query.message.reply_text(generate_summary_text(df, lang), parse_mode='Markdown')
-    db.close()
+    await _send_summary(update, days=30)
 
 async def export_excel_cmd(update, context):
     user_id = update.effective_user.id
-    db = SessionLocal()
-    user = db.query(User).filter(User.telegram_id == user_id).first()
-    lang = user.language if user else 'en'
-    df = get_report_data(user.id, days=365) # Export last year
-    
+    user = await get_profile(user_id)
     msg_obj = update.message if update.message else update.callback_query.message
+    if not user:
+        await msg_obj.reply_text("Please send /start first.")
+        return
+    lang = user.language
+
+    # /export [csv] [monthly] [days]
+    args = [a.lower() for a in (context.args or [])] if update.message else []
+    fmt = 'csv' if 'csv' in args else 'xlsx'
+    per_month = 'monthly' in args
+    days = next((int(a) for a in args if a.isdigit()), 365) # Export last year by default
+    if not 1 <= days <= EXPORT_MAX_DAYS:
+        await msg_obj.reply_text(
+            f"Usage: /export [csv] [monthly] [days], with days from 1 to {EXPORT_MAX_DAYS}." if lang == 'en'
+            else f"الاستخدام: /export [csv] [monthly] [عدد الأيام]، وعدد الأيام من 1 إلى {EXPORT_MAX_DAYS}."
+        )
+        return
+
+    await write_buffer.barrier(user.id)
+    export_file, extension = await run_export(user.id, lang, days=days, fmt=fmt, per_month=per_month)
     
-    if not df.empty:
-        excel_file = export_to_excel(df, lang)
-        await msg_obj.reply_document(document=excel_file, filename=f"report_{user_id}.xlsx")
+    if export_file:
+        with export_file:
+            await msg_obj.reply_document(document=export_file, filename=f"report_{user_id}.{extension}")
     else:
         await msg_obj.reply_text("No data to export." if lang == 'en' else "لا توجد بيانات للتصدير.")
-    db.close()
+
+# Users with an import in progress (one at a time per user)
+_active_imports = set()
+
+async def import_document(update, context):
+    # A CSV/XLSX bank statement sent as a document. The import runs as a
+    # background task so the user's other messages are handled meanwhile.
+    from src.handlers import STRINGS
+    user_id = update.effective_user.id
+    user = await get_profile(user_id)
+    if not user:
+        await update.message.reply_text("Please send /start first.")
+        return
+    s = STRINGS[user.language]
+    document = update.message.document
+    kind = importer.file_kind(document.file_name, document.mime_type)
+    if kind is None:
+        await update.message.reply_text(s['import_unsupported'])
+        return
+    if (document.file_size or 0) > Config.IMPORT_MAX_BYTES:
+        await update.message.reply_text(s['import_too_big'].format(mb=Config.IMPORT_MAX_BYTES // (1024 * 1024)))
+        return
+    if user.id in _active_imports:
+        await update.message.reply_text(s['import_busy'])
+        return
+    _active_imports.add(user.id)
+    try:
+        status = await update.message.reply_text(s['import_started'])
+    except Exception:
+        _active_imports.discard(user.id)
+        raise
+    overrides = importer.parse_overrides(update.message.caption)
+    context.application.create_task(_run_import(user, document, kind, overrides, status, s), update=update)
+
+async def _run_import(user, document, kind, overrides, status, s):
+    import os
+    import time
+    import tempfile
+    state = importer.ImportProgress()
+    last_edit = time.monotonic()
+
+    async def progress(current):
+        nonlocal state, last_edit
+        state = current
+        # Edits are throttled; Telegram rate-limits them per chat
+        if time.monotonic() - last_edit < Config.IMPORT_PROGRESS_INTERVAL:
+            return
+        last_edit = time.monotonic()
+        try:
+            await status.edit_text(s['import_progress'].format(
+                read=current.read, added=current.added, duplicates=current.duplicates))
+        except Exception as e:
+            logger.debug(f"Import progress edit failed: {e}")
+
+    fd, path = tempfile.mkstemp(prefix="import_", suffix=f".{kind}")
+    os.close(fd)
+    try:
+        tg_file = await document.get_file()
+        await tg_file.download_to_drive(path)
+        # Rows still in the write buffer must be visible to the duplicate check
+        await write_buffer.barrier(user.id)
+        state = await importer.run_import(path, kind, user.id, overrides, progress)
+        text = s['import_done'].format(added=state.added, duplicates=state.duplicates, skipped=state.skipped)
+        if state.truncated:
+            text += "\n" + s['import_truncated'].format(rows=Config.IMPORT_MAX_ROWS)
+    except importer.ImportFileError as e:
+        text = s[f'import_{e.reason}']
+    except Exception as e:
+        logger.exception(f"Import failed for user {user.id}: {e}")
+        text = s['import_failed'].format(added=state.added)
+    finally:
+        _active_imports.discard(user.id)
+        os.remove(path)
+    try:
+        await status.edit_text(text)
+    except Exception:
+        await status.reply_text(text)
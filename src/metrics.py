@@ -0,0 +1,326 @@
+import time
+import bisect
+import logging
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Small in-process metrics registry rendered in the Prometheus text format
+# (version 0.0.4) on a local HTTP endpoint. Recording is a lock plus a dict
+# update (histograms add a bisect), cheap enough to leave on permanently;
+# gauges and counters owned by other components (queue depths, cache hits)
+# are read by callbacks only when /metrics is scraped.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(labels[n] for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (the last slot is +Inf), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = [(key, (list(e[0]), e[1], e[2])) for key, e in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _format_value(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class CallbackMetric(_Metric):
+    # Value(s) read at scrape time: func() returns a number, or a dict
+    # mapping label-value tuples to numbers
+    def __init__(self, name, help_text, func, kind='gauge', labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.kind = kind
+        self.func = func
+
+    def render(self):
+        try:
+            values = self.func()
+        except Exception as e:
+            logger.warning(f"Metric {self.name} callback failed: {e}")
+            return []
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(float(value))}"
+            for key, value in values.items() if value is not None
+        ]
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name, help_text, func, kind='gauge', labelnames=()):
+        # Re-registering replaces the callback (e.g. a rebuilt component)
+        metric = CallbackMetric(name, help_text, func, kind, labelnames)
+        with self._lock:
+            self._metrics[name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+# Metrics recorded directly by the code paths that own them
+handler_latency = registry.histogram(
+    'bot_handler_duration_seconds', "Time spent in each Telegram handler", ('handler',))
+handler_errors = registry.counter(
+    'bot_handler_errors_total', "Handler calls that raised", ('handler',))
+groq_latency = registry.histogram(
+    'groq_request_duration_seconds', "Latency of each Groq completion attempt", ('outcome',))
+groq_tokens = registry.counter(
+    'groq_tokens_total', "Tokens reported in Groq completion usage", ('kind',))
+groq_retries = registry.counter(
+    'groq_retries_total', "Groq calls retried after a retryable error", ('reason',))
+parse_results = registry.counter(
+    'parse_results_total', "Message parse outcomes by where they were answered", ('source', 'outcome'))
+db_queries = registry.histogram(
+    'db_query_duration_seconds', "SQL statement execution time", ('operation',), QUERY_BUCKETS)
+
+def track_handler(callback, name=None):
+    # Wraps a PTB handler callback with a latency histogram and error count
+    name = name or callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            handler_errors.inc(handler=name)
+            raise
+        finally:
+            handler_latency.observe(time.perf_counter() - started, handler=name)
+    return wrapper
+
+def record_groq_usage(completion):
+    usage = getattr(completion, 'usage', None)
+    if usage is None:
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        value = getattr(usage, kind, None)
+        if value:
+            groq_tokens.inc(value, kind=kind.split('_')[0])
+
+def _operation(statement):
+    head = statement.lstrip()[:10].split(None, 1)
+    return head[0].lower() if head else 'other'
+
+def instrument_engine(bind):
+    # SQL count and duration per statement type via engine events
+    from sqlalchemy import event
+
+    @event.listens_for(bind, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(bind, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        operation = _operation(statement)
+        if operation not in ('select', 'insert', 'update', 'delete'):
+            operation = 'other'
+        db_queries.observe(time.perf_counter() - started, operation=operation)
+
+    @event.listens_for(bind, 'handle_error')
+    def _error(context):
+        stack = context.connection.info.get('query_started') if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+def _hits_misses(stats_funcs):
+    # {cache: stats()} -> ({(cache,): hits}, {(cache,): misses}, {(cache,): ratio})
+    hits, misses, ratios = {}, {}, {}
+    for cache, func in stats_funcs.items():
+        stats = func()
+        if stats is None:
+            continue
+        hits[(cache,)] = stats['hits']
+        misses[(cache,)] = stats['misses']
+        total = stats['hits'] + stats['misses']
+        ratios[(cache,)] = (stats['hits'] / total) if total else 0.0
+    return hits, misses, ratios
+
+def _chart_stats():
+    # Only once charts have been used, so the scrape never imports them
+    import sys
+    charts = sys.modules.get('src.charts')
+    return charts.chart_cache.stats() if charts else None
+
+def register_default_collectors(update_processor=None):
+    # Scrape-time readers for the counters and queues other components keep.
+    # The AI service is looked up on each scrape: it is built lazily.
+    from src import handlers, database
+    from src.ai_service import get_ai_service
+    from src.user_cache import user_cache
+    from src.write_buffer import write_buffer
+
+    def service_part(name):
+        service = get_ai_service(create=False)
+        return getattr(service, name, None) if service else None
+
+    def batcher_value(name):
+        batcher = service_part('batcher')
+        return getattr(batcher, name) if batcher else None
+
+    caches = {
+        'user_profile': user_cache.stats,
+        'parse_cache': lambda: service_part('cache') and service_part('cache').stats(),
+        'local_parser': lambda: service_part('local_parser') and service_part('local_parser').stats(),
+        'chart': _chart_stats,
+    }
+    registry.callback('cache_hits_total', "Cache hits", lambda: _hits_misses(caches)[0], 'counter', ('cache',))
+    registry.callback('cache_misses_total', "Cache misses", lambda: _hits_misses(caches)[1], 'counter', ('cache',))
+    registry.callback('cache_hit_ratio', "Cache hit ratio since start", lambda: _hits_misses(caches)[2], 'gauge', ('cache',))
+
+    def queues():
+        depths = {
+            ('admission_waiting',): handlers.admission_queue.waiting,
+            ('admission_active',): handlers.admission_queue.active,
+            ('write_buffer_rows',): write_buffer.depth,
+            ('db_executor',): database._db_executor._work_queue.qsize(),
+            ('parse_batcher',): batcher_value('queue_depth'),
+        }
+        if update_processor is not None:
+            depths[('update_chats',)] = update_processor.active_chats
+        return depths
+    registry.callback('queue_depth', "Items waiting or in progress per queue", queues, 'gauge', ('queue',))
+
+    registry.callback('rejected_messages_total', "Messages refused by flood protection", lambda: {
+        ('user_rate_limit',): handlers.inbound_limiter.rejected,
+        ('admission_queue',): handlers.admission_queue.rejected,
+    }, 'counter', ('reason',))
+    registry.callback('write_buffer_flushes_total', "Write buffer commits", lambda: write_buffer.flushes, 'counter')
+    registry.callback('parse_batches_total', "Batched parse completions", lambda: batcher_value('batches'), 'counter')
+    registry.callback('parse_batch_fallbacks_total', "Batched items re-sent as single calls",
+                      lambda: batcher_value('fallbacks'), 'counter')
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(host, port):
+    # Serves /metrics from a daemon thread; returns the server
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Metrics on http://{host}:{port}/metrics")
+    return server
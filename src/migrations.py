@@ -0,0 +1,90 @@
+import logging
+from datetime import datetime
+import sqlalchemy as sa
+from src.database import engine, maintenance_transaction, User, Transaction, DailyRollup, StatCounter, DailyStat, CategoryStat, UserActivity, DigestRun
+from src.rollups import rebuild as rebuild_rollups
+from src.stats import rebuild as rebuild_stats
+
+logger = logging.getLogger(__name__)
+
+# Versioned schema migrations. Each one runs once, in order, inside its own
+# transaction, and its version is recorded in `schema_version`. Migrations
+# must be idempotent: databases created before versioning existed already
+# have some of these objects and start from version 0.
+
+_version_metadata = sa.MetaData()
+schema_version = sa.Table(
+    'schema_version', _version_metadata,
+    sa.Column('version', sa.Integer, primary_key=True),
+    sa.Column('description', sa.String(200)),
+    sa.Column('applied_at', sa.DateTime, default=datetime.utcnow),
+)
+
+MIGRATIONS = []
+
+def migration(version, description):
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+def _columns(conn, table):
+    return {c['name'] for c in sa.inspect(conn).get_columns(table)}
+
+def _add_column(conn, table, name, ddl_type, default):
+    if name not in _columns(conn, table):
+        conn.execute(sa.text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type} DEFAULT {default}"))
+
+@migration(1, "Base users and transactions tables")
+def _base_tables(conn):
+    User.__table__.create(conn, checkfirst=True)
+    Transaction.__table__.create(conn, checkfirst=True)
+
+@migration(2, "Weekly and monthly limits")
+def _period_limits(conn):
+    _add_column(conn, 'users', 'weekly_limit', 'FLOAT', '0.0')
+    _add_column(conn, 'users', 'monthly_limit', 'FLOAT', '0.0')
+
+@migration(3, "Composite indexes for report and limit queries")
+def _transaction_indexes(conn):
+    for index in Transaction.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+@migration(4, "Daily rollup table, backfilled from transactions")
+def _daily_rollups(conn):
+    DailyRollup.__table__.create(conn, checkfirst=True)
+    rebuild_rollups(conn)
+
+@migration(5, "Global stats tables, backfilled from users, transactions and rollups")
+def _global_stats(conn):
+    for model in (StatCounter, DailyStat, CategoryStat, UserActivity):
+        model.__table__.create(conn, checkfirst=True)
+    rebuild_stats(conn)
+
+@migration(6, "Daily digest opt-in and run checkpoints")
+def _daily_digest(conn):
+    _add_column(conn, 'users', 'digest_enabled', 'BOOLEAN', 'FALSE')
+    DigestRun.__table__.create(conn, checkfirst=True)
+
+def current_version(conn):
+    schema_version.create(conn, checkfirst=True)
+    return conn.execute(sa.select(sa.func.max(schema_version.c.version))).scalar() or 0
+
+def run_migrations(bind=engine):
+    with maintenance_transaction(bind) as conn:
+        version = current_version(conn)
+    for target, description, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if target <= version:
+            continue
+        logger.info("Applying migration %d: %s", target, description)
+        with maintenance_transaction(bind) as conn:
+            func(conn)
+            conn.execute(schema_version.insert().values(
+                version=target, description=description, applied_at=datetime.utcnow()
+            ))
+        version = target
+    return version
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Schema at version {run_migrations()}")
@@ -0,0 +1,172 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from src.local_parser import fold_text
+
+# Cache of LLM parse results keyed on the normalised message text + language.
+# Dates are stored relative to the day the entry was cached and re-resolved
+# on every hit, so a cached "coffee 15" from last week still lands on today.
+
+WHITESPACE_RE = re.compile(r'\s+')
+# Messages that name a calendar date keep the absolute date from the LLM
+EXPLICIT_DATE_RE = re.compile(
+    r'\d{1,4}[-/]\d{1,2}|'
+    r'\b(jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|may|june?|july?|aug(ust)?|sep(t|tember)?|oct(ober)?|nov(ember)?|dec(ember)?)\b|'
+    r'يناير|فبراير|مارس|ابريل|مايو|يونيو|يوليو|اغسطس|سبتمبر|اكتوبر|نوفمبر|ديسمبر'
+)
+
+def normalize_message(message: str) -> str:
+    return WHITESPACE_RE.sub(' ', fold_text(message)).strip()
+
+class MemoryCacheBackend:
+    blocking = False
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key, payload, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCacheBackend:
+    # Survives restarts; lives in its own file so it never contends with the
+    # main database's writer lock.
+    blocking = True
+
+    def __init__(self, path: str, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parse_cache ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_parse_cache_last_used ON parse_cache (last_used)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM parse_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE parse_cache SET last_used = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+
+    def set(self, key, payload, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parse_cache (key, payload, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(payload, ensure_ascii=False), now + ttl, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0]
+            if count > self.max_size:
+                # Evict least recently used rows (plus anything expired)
+                self._conn.execute("DELETE FROM parse_cache WHERE expires_at < ?", (now,))
+                self._conn.execute(
+                    "DELETE FROM parse_cache WHERE key IN "
+                    "(SELECT key FROM parse_cache ORDER BY last_used LIMIT ?)",
+                    (max(0, count - self.max_size),)
+                )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0]
+
+class ParseCache:
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def blocking(self):
+        return self.backend.blocking
+
+    def _key(self, message, lang):
+        return f"{lang}:{normalize_message(message)}"
+
+    def get(self, message: str, lang: str):
+        payload = self.backend.get(self._key(message, lang))
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if payload is None:
+            return None
+        items = []
+        for entry in payload if isinstance(payload, list) else [payload]:
+            data = dict(entry)
+            offset = data.pop('date_offset', None)
+            if offset is not None:
+                data['date'] = (date.today() + timedelta(days=offset)).strftime('%Y-%m-%d')
+            items.append(data)
+        return items
+
+    def put(self, message: str, lang: str, items):
+        relative = not EXPLICIT_DATE_RE.search(normalize_message(message))
+        payload = []
+        for data in items:
+            entry = dict(data)
+            if relative:
+                try:
+                    parsed = datetime.strptime(str(data['date']), '%Y-%m-%d').date()
+                except ValueError:
+                    return
+                entry['date_offset'] = (parsed - date.today()).days
+                del entry['date']
+            payload.append(entry)
+        self.backend.set(self._key(message, lang), payload, self.ttl)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0,
+                'size': len(self.backend)
+            }
+
+def build_parse_cache(config):
+    if not config.PARSE_CACHE_ENABLED:
+        return None
+    if config.PARSE_CACHE_BACKEND == 'sqlite':
+        backend = SQLiteCacheBackend(config.PARSE_CACHE_PATH, config.PARSE_CACHE_SIZE)
+    else:
+        backend = MemoryCacheBackend(config.PARSE_CACHE_SIZE)
+    return ParseCache(backend, config.PARSE_CACHE_TTL)
@@ -0,0 +1,118 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from telegram.ext import AIORateLimiter
+
+# Inbound: a token bucket per telegram_id plus a global admission queue in
+# front of the expensive part of handle_message (LLM parse + DB write), so
+# one user flooding the bot cannot starve everyone else.
+# Outbound: Telegram's global and per-chat send limits for every Bot API call.
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class InboundLimiter:
+    def __init__(self, rate: float, burst: int, max_users: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self.rejected = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, telegram_id):
+        bucket = self._buckets.get(telegram_id)
+        if bucket is None:
+            bucket = self._buckets[telegram_id] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(telegram_id)
+        return bucket
+
+    def allow(self, telegram_id: int):
+        with self._lock:
+            if self._bucket(telegram_id).try_acquire():
+                return True
+            self.rejected += 1
+            return False
+
+class AdmissionQueueFull(Exception):
+    pass
+
+class AdmissionQueue:
+    # At most `max_active` messages in the expensive section at once and at
+    # most `max_depth` waiting for a slot; beyond that new work is refused
+    def __init__(self, max_active: int, max_depth: int):
+        self.max_depth = max_depth
+        self.waiting = 0
+        self.active = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_active)
+
+    @asynccontextmanager
+    async def admit(self):
+        if self.waiting >= self.max_depth:
+            self.rejected += 1
+            raise AdmissionQueueFull()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+class OutboundRateLimiter(AIORateLimiter):
+    # AIORateLimiter already enforces the global limit, the per-group limit
+    # and RetryAfter back-off; this adds pacing for private chats, which it
+    # leaves unlimited (Telegram asks for about one message per second per chat)
+
+    def __init__(self, private_chat_rate: float = 1.0, private_chat_burst: int = 3, **kwargs):
+        super().__init__(**kwargs)
+        self._private_rate = private_chat_rate
+        self._private_burst = private_chat_burst
+        self._private_limiters = OrderedDict()
+
+    def _private_limiter(self, chat_id):
+        from aiolimiter import AsyncLimiter
+        limiter = self._private_limiters.get(chat_id)
+        if limiter is None:
+            limiter = self._private_limiters[chat_id] = AsyncLimiter(
+                self._private_burst, self._private_burst / self._private_rate
+            )
+            # Forget idle chats once there are many
+            while len(self._private_limiters) > 1024:
+                oldest, old = next(iter(self._private_limiters.items()))
+                if not old.has_capacity(old.max_rate):
+                    break
+                del self._private_limiters[oldest]
+        self._private_limiters.move_to_end(chat_id)
+        return limiter
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if isinstance(chat_id, int) and chat_id > 0:
+            async with self._private_limiter(chat_id):
+                return await super().process_request(callback, args, kwargs, endpoint, data, rate_limit_args)
+        return await super().process_request(callback, args, kwargs, endpoint, data, rate_limit_args)
@@ -1,28 +1,54 @@
-from src.database import SessionLocal, Transaction, User
+from src.database import session_scope, DailyRollup
 from datetime import datetime, timedelta, date
 import sqlalchemy as sa
-import pandas as pd
-import io
 
-def get_report_data(user_id: int, days: int = 1):
-    db = SessionLocal()
+class ReportSummary:
+    # Totals for one report period; all chat replies are built from this
+    __slots__ = ('income', 'expense', 'categories', 'count')
+
+    def __init__(self, income=0.0, expense=0.0, categories=None, count=0):
+        self.income = income
+        self.expense = expense
+        self.categories = categories or {}  # expense category -> amount
+        self.count = count
+
+    def add(self, txn_type, category, total, count):
+        # One rollup row (or a sum of them) for the period
+        self.count += count or 0
+        if txn_type == 'income':
+            self.income += total or 0.0
+        elif txn_type == 'expense':
+            self.expense += total or 0.0
+            self.categories[category] = self.categories.get(category, 0.0) + (total or 0.0)
+
+    @property
+    def balance(self):
+        return self.income - self.expense
+
+    @property
+    def empty(self):
+        return self.count == 0
+
+# Blocking: one GROUP BY over the daily_rollups rows of the period, so the
+# cost is bounded by days x categories rather than the transaction count
+def get_report_summary(user_id: int, days: int = 1):
     start_date = date.today() - timedelta(days=days-1)
-    
-    txns = db.query(Transaction).filter(
-        Transaction.user_id == user_id,
-        Transaction.date >= start_date
-    ).all()
-    
-    df = pd.DataFrame([{
-        'Type': t.type,
-        'Category': t.category,
-        'Amount': t.amount,
-        'Description': t.description,
-        'Date': t.date
-    } for t in txns])
-    
-    db.close()
-    return df
+
+    with session_scope() as db:
+        rows = db.query(
+            DailyRollup.type,
+            DailyRollup.category,
+            sa.func.sum(DailyRollup.total),
+            sa.func.sum(DailyRollup.count)
+        ).filter(
+            DailyRollup.user_id == user_id,
+            DailyRollup.date >= start_date
+        ).group_by(DailyRollup.type, DailyRollup.category).all()
+
+    summary = ReportSummary()
+    for txn_type, category, total, count in rows:
+        summary.add(txn_type, category, total, count)
+    return summary
 
 # Category translation mapping
 CATEGORY_MAP = {
@@ -55,18 +81,16 @@ def translate(key, lang='en'):
         return CATEGORY_MAP[key_lower].get(lang, key)
     return key
 
-def generate_summary_text(df, lang='en'):
-    if df.empty:
+def generate_summary_text(summary, lang='en'):
+    if summary.empty:
         return "No transactions found." if lang == 'en' else "لا توجد معاملات."
     
-    income = df[df['Type'] == 'income']['Amount'].sum()
-    expense = df[df['Type'] == 'expense']['Amount'].sum()
-    balance = income - expense
-    
-    category_summary = df[df['Type'] == 'expense'].groupby('Category')['Amount'].sum()
+    income = summary.income
+    expense = summary.expense
+    balance = summary.balance
     
     cat_lines = []
-    for cat, amt in category_summary.items():
+    for cat, amt in sorted(summary.categories.items()):
         translated_cat = translate(cat, lang)
         cat_lines.append(f"- {translated_cat}: {amt:.2f}")
     cat_text = "\n".join(cat_lines)
@@ -84,23 +108,3 @@ def generate_summary_text(df, lang='en'):
                 f"⚖️ الرصيد: {balance:.2f}\n\n"
                 f"📂 *تصنيف المصاريف:*\n{cat_text}")
     return text
-
-def export_to_excel(df, lang='en'):
-    if df.empty:
-        return None
-        
-    # Create a copy for translation
-    pdf = df.copy()
-    
-    # Translate values
-    pdf['Type'] = pdf['Type'].apply(lambda x: translate(x, lang))
-    pdf['Category'] = pdf['Category'].apply(lambda x: translate(x, lang))
-    
-    # Translate headers
-    pdf.columns = [HEADER_MAP.get(c, {}).get(lang, c) for c in pdf.columns]
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        pdf.to_excel(writer, index=False, sheet_name='Transactions')
-    output.seek(0)
-    return output
@@ -0,0 +1,164 @@
+from datetime import date
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+from src.database import session_scope, User, Transaction, DailyRollup
+from src.budget import budget_ledger
+from src.rollups import apply_rollup
+from src import stats
+from src.user_cache import user_cache, profile_from_user
+
+LIMIT_COLUMNS = {'daily': 'daily_limit', 'weekly': 'weekly_limit', 'monthly': 'monthly_limit'}
+USER_STATUS = {'active': True, 'pending': False}
+USER_COLUMNS = (User.id, User.telegram_id, User.username, User.full_name, User.language, User.is_active,
+                User.daily_limit, User.weekly_limit, User.monthly_limit, User.created_at)
+
+# Blocking data-access helpers. Handlers call these through run_db() so the
+# queries run on the DB thread pool instead of the event loop. User reads and
+# writes return UserProfile tuples and refresh the profile cache; handlers go
+# through src.user_cache.get_profile() so a cache hit skips the DB entirely.
+
+def _cache_user(user):
+    if user is None:
+        return None
+    profile = profile_from_user(user)
+    user_cache.put(profile)
+    return profile
+
+def get_user(telegram_id: int):
+    with session_scope() as db:
+        return _cache_user(db.query(User).filter(User.telegram_id == telegram_id).first())
+
+def get_or_create_user(telegram_id: int, username=None, full_name=None):
+    with session_scope() as db:
+        user = db.query(User).filter(User.telegram_id == telegram_id).first()
+        if not user:
+            # Automatic registration
+            user = User(
+                telegram_id=telegram_id,
+                username=username,
+                full_name=full_name,
+                language='ar',
+                is_active=True
+            )
+            db.add(user)
+            try:
+                stats.record_registration(db, user.is_active)
+                db.commit()
+            except IntegrityError:
+                # Registered concurrently by another update
+                db.rollback()
+                user = db.query(User).filter(User.telegram_id == telegram_id).one()
+            db.refresh(user)
+        return _cache_user(user)
+
+def _update_user(telegram_id: int, **values):
+    with session_scope() as db:
+        user = db.query(User).filter(User.telegram_id == telegram_id).first()
+        if user:
+            for key, value in values.items():
+                if key == 'is_active' and bool(user.is_active) != bool(value):
+                    stats.record_activation(db, value)
+                setattr(user, key, value)
+            db.commit()
+        else:
+            user_cache.invalidate(telegram_id)
+        return _cache_user(user)
+
+def set_language(telegram_id: int, lang: str):
+    return _update_user(telegram_id, language=lang)
+
+def set_limit(telegram_id: int, period: str, limit: float):
+    return _update_user(telegram_id, **{LIMIT_COLUMNS[period]: limit})
+
+def set_active(telegram_id: int, is_active: bool):
+    return _update_user(telegram_id, is_active=is_active)
+
+def set_digest(telegram_id: int, enabled: bool):
+    return _update_user(telegram_id, digest_enabled=enabled)
+
+def _user_filters(status=None, language=None):
+    filters = []
+    if status in USER_STATUS:
+        filters.append(User.is_active == USER_STATUS[status])
+    if language:
+        filters.append(User.language == language)
+    return filters
+
+def list_users_page(after_id=None, before_id=None, status=None, language=None, limit=20):
+    # Keyset page over users.id (never OFFSET), with each user's transaction
+    # count and last transaction date summed from the rollups in the same
+    # query. Rows come back in id order; has_more says whether rows exist
+    # beyond the page in the direction of travel (after_id forwards,
+    # before_id backwards).
+    page = sa.select(*USER_COLUMNS).where(*_user_filters(status, language))
+    if before_id is not None:
+        page = page.where(User.id < before_id).order_by(User.id.desc())
+    else:
+        page = page.where(User.id > (after_id or 0)).order_by(User.id)
+    page = page.limit(limit + 1).subquery()
+    query = sa.select(
+        *page.c,
+        sa.func.coalesce(sa.func.sum(DailyRollup.count), 0).label('txn_count'),
+        sa.func.max(DailyRollup.date).label('last_activity')
+    ).outerjoin(DailyRollup, DailyRollup.user_id == page.c.id).group_by(*page.c).order_by(page.c.id)
+    with session_scope() as db:
+        rows = db.execute(query).all()
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[1:] if before_id is not None else rows[:limit]
+    return rows, has_more
+
+def iter_users_with_stats(status=None, language=None, batch_size=1000):
+    # Every matching user with the same per-user stats, streamed in id order
+    activity = sa.select(
+        DailyRollup.user_id,
+        sa.func.sum(DailyRollup.count).label('txn_count'),
+        sa.func.max(DailyRollup.date).label('last_activity')
+    ).group_by(DailyRollup.user_id).subquery()
+    query = sa.select(
+        *USER_COLUMNS,
+        sa.func.coalesce(activity.c.txn_count, 0).label('txn_count'),
+        activity.c.last_activity
+    ).outerjoin(activity, activity.c.user_id == User.id).where(
+        *_user_filters(status, language)
+    ).order_by(User.id).execution_options(stream_results=True, yield_per=batch_size)
+    with session_scope() as db:
+        yield from db.execute(query)
+
+def _transaction(user_id, row):
+    return Transaction(
+        user_id=user_id,
+        type=row['type'],
+        category=row['category'],
+        amount=row['amount'],
+        description=row['description'],
+        date=row['date']
+    )
+
+def add_transaction_batches(batches, record_ledger: bool = True, parsed_messages: bool = True):
+    # batches: (user_id, rows) pairs, possibly for many users, one per parsed
+    # message unless parsed_messages is False. Everything, rollups and global
+    # stats included, goes in with a single commit.
+    with session_scope() as db:
+        txns = [_transaction(user_id, row) for user_id, rows in batches for row in rows]
+        db.add_all(txns)
+        apply_rollup(db, txns)
+        stats.record_transactions(db, txns, len(batches) if parsed_messages else 0)
+        db.commit()
+    if record_ledger:
+        for txn in txns:
+            budget_ledger.record(txn.user_id, txn.type, txn.amount, txn.date)
+    return txns
+
+def add_transactions(user_id: int, rows):
+    # rows: dicts with type, category, amount, description and date
+    return add_transaction_batches([(user_id, rows)])
+
+def add_transaction(user_id: int, txn_type: str, category: str, amount: float, description: str, txn_date: date):
+    return add_transactions(user_id, [{
+        'type': txn_type,
+        'category': category,
+        'amount': amount,
+        'description': description,
+        'date': txn_date
+    }])[0]
@@ -0,0 +1,105 @@
+import sys
+import argparse
+import sqlalchemy as sa
+from src.database import engine, maintenance_transaction, DailyRollup, Transaction, User
+
+# Maintenance of the daily_rollups table. apply_rollup() runs inside the
+# session that inserts the transactions, so rollups and raw rows always
+# commit (or roll back) together.
+
+ROLLUP_KEY = ('user_id', 'date', 'type', 'category')
+
+def rollup_category(category):
+    return category or 'other'
+
+def _aggregate(txns):
+    totals = {}
+    for t in txns:
+        key = (t.user_id, t.date, t.type, rollup_category(t.category))
+        total, count = totals.get(key, (0.0, 0))
+        totals[key] = (total + t.amount, count + 1)
+    return [
+        dict(zip(ROLLUP_KEY, key), total=total, count=count)
+        for key, (total, count) in totals.items()
+    ]
+
+def _dialect_insert(dialect_name):
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+_upserts = {}
+
+def upsert_increment(db, table, key_columns, rows, value_columns):
+    # Adds each row's value columns onto the existing row with the same key,
+    # inserting it if there is none
+    if not rows:
+        return
+    dialect_name = db.get_bind().dialect.name
+    insert = _dialect_insert(dialect_name)
+    if insert is not None:
+        # Built once per table and run with the rows as parameters, so
+        # neither the construct nor its compiled SQL is rebuilt per call
+        cache_key = (dialect_name, table.name, tuple(key_columns), tuple(value_columns))
+        stmt = _upserts.get(cache_key)
+        if stmt is None:
+            stmt = insert(table)
+            stmt = _upserts[cache_key] = stmt.on_conflict_do_update(
+                index_elements=[table.c[k] for k in key_columns],
+                set_={c: table.c[c] + stmt.excluded[c] for c in value_columns}
+            )
+        db.execute(stmt, rows)
+        return
+    # Portable fallback for dialects without an upsert
+    for row in rows:
+        key_filter = sa.and_(*[table.c[k] == row[k] for k in key_columns])
+        result = db.execute(table.update().where(key_filter).values(
+            **{c: table.c[c] + row[c] for c in value_columns}
+        ))
+        if result.rowcount == 0:
+            db.execute(table.insert().values(**row))
+
+def apply_rollup(db, txns):
+    upsert_increment(db, DailyRollup.__table__, ROLLUP_KEY, _aggregate(txns), ('total', 'count'))
+
+def rebuild(conn, user_id=None):
+    table = DailyRollup.__table__
+    txns = Transaction.__table__
+    delete = table.delete()
+    category = sa.func.coalesce(txns.c.category, 'other')
+    select = sa.select(
+        txns.c.user_id, txns.c.date, txns.c.type, category,
+        sa.func.sum(txns.c.amount), sa.func.count()
+    ).where(txns.c.date.isnot(None))
+    if user_id is not None:
+        delete = delete.where(table.c.user_id == user_id)
+        select = select.where(txns.c.user_id == user_id)
+    select = select.group_by(txns.c.user_id, txns.c.date, txns.c.type, category)
+    conn.execute(delete)
+    result = conn.execute(table.insert().from_select(list(ROLLUP_KEY) + ['total', 'count'], select))
+    return result.rowcount
+
+def rebuild_rollups(user_id=None):
+    with maintenance_transaction() as conn:
+        return rebuild(conn, user_id)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the daily_rollups table")
+    sub = parser.add_subparsers(dest='command', required=True)
+    cmd = sub.add_parser('rebuild', help="Recompute rollups from the transactions table")
+    cmd.add_argument('--telegram-id', type=int, help="Only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    user_id = None
+    if args.telegram_id is not None:
+        with engine.connect() as conn:
+            user_id = conn.execute(sa.select(User.id).where(User.telegram_id == args.telegram_id)).scalar()
+        if user_id is None:
+            print(f"User {args.telegram_id} not found.")
+            sys.exit(1)
+    rows = rebuild_rollups(user_id)
+    print(f"Rebuilt daily rollups ({rows} rows).")
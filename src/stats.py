@@ -0,0 +1,190 @@
+import argparse
+import threading
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from src.database import maintenance_transaction, session_scope, SessionLocal, User, Transaction, DailyRollup, StatCounter, DailyStat, CategoryStat, UserActivity
+from src.rollups import upsert_increment, rollup_category, _dialect_insert
+
+# Global analytics for the admin /stats command. The counters are bumped by
+# the code paths that change what they count, inside the same transaction:
+# repository.add_transaction_batches (transactions, spend by category,
+# active users), get_or_create_user / set_active (users) and the parse
+# failure path in handle_message. Reading them touches a handful of small
+# rows whatever the size of the transactions table. rebuild() recomputes
+# everything derivable from the base tables; the parse outcome counters
+# exist nowhere else, so it keeps them.
+
+PARSE_COUNTERS = ('parse_ok', 'parse_failed')
+
+# (day, user ids) already known to have an activity row, so most inserts
+# skip that statement. Ids are added only once their row has committed.
+_active_seen = [None, set()]
+_active_lock = threading.Lock()
+
+@sa.event.listens_for(SessionLocal, 'after_commit')
+def _remember_active(session):
+    pending = session.info.pop('stats_active', None)
+    if pending:
+        day, user_ids = pending
+        with _active_lock:
+            if _active_seen[0] != day:
+                _active_seen[0], _active_seen[1] = day, set()
+            _active_seen[1].update(user_ids)
+
+def _today():
+    # Stats days are UTC, like the created_at columns the rebuild reads
+    return datetime.utcnow().date()
+
+def bump(db, counters=None, daily=None, day=None):
+    # Adds to all-time counters and to the day's counters ({name: delta})
+    day = day or _today()
+    upsert_increment(db, StatCounter.__table__, ('name',), [
+        {'name': name, 'value': value} for name, value in (counters or {}).items() if value
+    ], ('value',))
+    upsert_increment(db, DailyStat.__table__, ('date', 'name'), [
+        {'date': day, 'name': name, 'value': value} for name, value in (daily or {}).items() if value
+    ], ('value',))
+
+def _mark_active(db, user_ids, day):
+    # Returns how many of user_ids had no activity recorded for the day yet
+    table = UserActivity.__table__
+    rows = [{'user_id': user_id, 'date': day} for user_id in sorted(user_ids)]
+    insert = _dialect_insert(db.get_bind().dialect.name)
+    if insert is not None:
+        return db.execute(insert(table).values(rows).on_conflict_do_nothing()).rowcount
+    existing = set(db.execute(sa.select(table.c.user_id).where(
+        table.c.date == day, table.c.user_id.in_(user_ids)
+    )).scalars())
+    new_rows = [row for row in rows if row['user_id'] not in existing]
+    if new_rows:
+        db.execute(table.insert(), new_rows)
+    return len(new_rows)
+
+def record_transactions(db, txns, parsed_messages=0):
+    # Called next to apply_rollup, before the insert commits
+    if not txns:
+        return
+    day = _today()
+    categories = {}
+    expense = income = 0.0
+    for t in txns:
+        key = (t.date, t.type, rollup_category(t.category))
+        total, count = categories.get(key, (0.0, 0))
+        categories[key] = (total + t.amount, count + 1)
+        if t.type == 'expense':
+            expense += t.amount
+        else:
+            income += t.amount
+    upsert_increment(db, CategoryStat.__table__, ('date', 'type', 'category'), [
+        {'date': d, 'type': t, 'category': c, 'total': total, 'count': count}
+        for (d, t, c), (total, count) in categories.items()
+    ], ('total', 'count'))
+    with _active_lock:
+        seen = _active_seen[1] if _active_seen[0] == day else set()
+        user_ids = {t.user_id for t in txns} - seen
+    active = 0
+    if user_ids:
+        active = _mark_active(db, user_ids, day)
+        db.info['stats_active'] = (day, user_ids)
+    bump(db, counters={
+        'transactions': len(txns), 'expense_total': expense, 'income_total': income, 'parse_ok': parsed_messages
+    }, daily={
+        'transactions': len(txns), 'active_users': active, 'parse_ok': parsed_messages
+    }, day=day)
+
+def record_registration(db, is_active=True):
+    bump(db, counters={'users': 1, 'users_active': 1 if is_active else 0}, daily={'new_users': 1})
+
+def record_activation(db, is_active):
+    bump(db, counters={'users_active': 1 if is_active else -1})
+
+def record_parse_failure():
+    # Blocking; a message the bot could not turn into transactions
+    with session_scope() as db:
+        bump(db, counters={'parse_failed': 1}, daily={'parse_failed': 1})
+        db.commit()
+
+def get_stats(days=7, category_days=30, top_categories=8):
+    # Blocking; reads at most days * names daily rows and
+    # category_days * categories category rows
+    today = _today()
+    with session_scope() as db:
+        counters = dict(db.execute(sa.select(StatCounter.name, StatCounter.value)).all())
+        daily = {}
+        for day, name, value in db.execute(sa.select(DailyStat.date, DailyStat.name, DailyStat.value).where(
+            DailyStat.date >= today - timedelta(days=days - 1)
+        )):
+            daily.setdefault(day, {})[name] = value
+        spend = sa.func.sum(CategoryStat.total)
+        categories = db.execute(sa.select(CategoryStat.category, spend).where(
+            CategoryStat.type == 'expense',
+            CategoryStat.date >= today - timedelta(days=category_days - 1)
+        ).group_by(CategoryStat.category).order_by(spend.desc()).limit(top_categories)).all()
+    return {
+        'counters': counters,
+        'daily': [(today - timedelta(days=i), daily.get(today - timedelta(days=i), {})) for i in range(days)],
+        'categories': categories,
+    }
+
+def rebuild(conn):
+    counters = StatCounter.__table__
+    daily = DailyStat.__table__
+    category = CategoryStat.__table__
+    activity = UserActivity.__table__
+    users = User.__table__
+    txns = Transaction.__table__
+    rollups = DailyRollup.__table__
+
+    conn.execute(counters.delete().where(counters.c.name.notin_(PARSE_COUNTERS)))
+    conn.execute(daily.delete().where(daily.c.name.notin_(PARSE_COUNTERS)))
+    conn.execute(category.delete())
+    conn.execute(activity.delete())
+    with _active_lock:
+        _active_seen[0], _active_seen[1] = None, set()
+
+    # Spend by category and the transaction totals come from the per-user rollups
+    conn.execute(category.insert().from_select(['date', 'type', 'category', 'total', 'count'], sa.select(
+        rollups.c.date, rollups.c.type, rollups.c.category, sa.func.sum(rollups.c.total), sa.func.sum(rollups.c.count)
+    ).group_by(rollups.c.date, rollups.c.type, rollups.c.category)))
+    user_count, active_count = conn.execute(sa.select(
+        sa.func.count(), sa.func.coalesce(sa.func.sum(sa.case((users.c.is_active, 1), else_=0)), 0)
+    )).one()
+    txn_count, expense, income = conn.execute(sa.select(
+        sa.func.coalesce(sa.func.sum(rollups.c.count), 0),
+        sa.func.coalesce(sa.func.sum(sa.case((rollups.c.type == 'expense', rollups.c.total), else_=0)), 0),
+        sa.func.coalesce(sa.func.sum(sa.case((rollups.c.type == 'income', rollups.c.total), else_=0)), 0)
+    )).one()
+    totals = {
+        'users': user_count, 'users_active': active_count, 'transactions': txn_count,
+        'expense_total': expense, 'income_total': income,
+    }
+    # Zeros are left out so a fresh database stays empty (restores check that)
+    rows = [{'name': name, 'value': value} for name, value in totals.items() if value]
+    if rows:
+        conn.execute(counters.insert(), rows)
+
+    # Per-day history from the creation timestamps (a one-off full scan)
+    for table, name in ((users, 'new_users'), (txns, 'transactions')):
+        day = sa.func.date(table.c.created_at)
+        conn.execute(daily.insert().from_select(['date', 'name', 'value'], sa.select(
+            day, sa.literal(name), sa.func.count()
+        ).where(table.c.created_at.isnot(None)).group_by(day)))
+    txn_day = sa.func.date(txns.c.created_at)
+    conn.execute(activity.insert().from_select(['user_id', 'date'], sa.select(
+        txns.c.user_id, txn_day
+    ).where(txns.c.created_at.isnot(None)).distinct()))
+    conn.execute(daily.insert().from_select(['date', 'name', 'value'], sa.select(
+        activity.c.date, sa.literal('active_users'), sa.func.count()
+    ).group_by(activity.c.date)))
+    return txn_count
+
+def rebuild_stats():
+    with maintenance_transaction() as conn:
+        return rebuild(conn)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the global /stats aggregates")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('rebuild', help="Recompute the aggregates from users, transactions and rollups")
+    args = parser.parse_args()
+    print(f"Rebuilt global stats ({rebuild_stats()} transactions).")
@@ -0,0 +1,60 @@
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    # Processes updates concurrently on a bounded pool of `workers` while
+    # keeping strict arrival order within each chat, so a user's "set limit"
+    # and the number that follows can never race. Different chats run in
+    # parallel.
+    #
+    # PTB's own semaphore (max_concurrent_updates) is held while an update
+    # waits for its chat, so it is sized as an admission limit (`queue_limit`)
+    # and the worker pool is a second semaphore taken only once the chat lock
+    # is held. A burst from one chat therefore never occupies the workers
+    # other chats need.
+
+    def __init__(self, workers: int, queue_limit: int):
+        super().__init__(max(workers, queue_limit))
+        self._workers = asyncio.Semaphore(workers)
+        self._chat_locks = {}  # chat id -> [lock, waiters]
+
+    @staticmethod
+    def _chat_key(update):
+        if isinstance(update, Update):
+            if update.effective_chat:
+                return update.effective_chat.id
+            if update.effective_user:
+                return update.effective_user.id
+        return None
+
+    @property
+    def active_chats(self):
+        return len(self._chat_locks)
+
+    async def do_process_update(self, update, coroutine):
+        key = self._chat_key(update)
+        if key is None:
+            async with self._workers:
+                await coroutine
+            return
+
+        entry = self._chat_locks.get(key)
+        if entry is None:
+            entry = self._chat_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, preserving arrival order
+            async with entry[0]:
+                async with self._workers:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chat_locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
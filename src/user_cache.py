@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict, namedtuple
+from src.config import Config
+
+# Per-process cache of the user fields every update needs, keyed by
+# telegram_id. The repository setters write through it, so most updates
+# need no user query at all.
+
+UserProfile = namedtuple('UserProfile', [
+    'id', 'telegram_id', 'language', 'daily_limit', 'weekly_limit', 'monthly_limit', 'is_active', 'digest_enabled'
+])
+
+def profile_from_user(user):
+    return UserProfile(
+        id=user.id,
+        telegram_id=user.telegram_id,
+        language=user.language or 'ar',
+        daily_limit=user.daily_limit or 0.0,
+        weekly_limit=user.weekly_limit or 0.0,
+        monthly_limit=user.monthly_limit or 0.0,
+        is_active=bool(user.is_active),
+        digest_enabled=bool(user.digest_enabled)
+    )
+
+class UserCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, telegram_id: int):
+        with self._lock:
+            profile = self._profiles.get(telegram_id)
+            if profile is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._profiles.move_to_end(telegram_id)
+            return profile
+
+    def put(self, profile):
+        with self._lock:
+            self._profiles[profile.telegram_id] = profile
+            self._profiles.move_to_end(profile.telegram_id)
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+
+    def invalidate(self, telegram_id: int):
+        with self._lock:
+            self._profiles.pop(telegram_id, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0,
+                'size': len(self._profiles)
+            }
+
+user_cache = UserCache(Config.USER_CACHE_SIZE)
+
+async def get_profile(telegram_id: int):
+    from src.database import run_db
+    from src import repository
+    return user_cache.get(telegram_id) or await run_db(repository.get_user, telegram_id)
+
+async def get_or_create_profile(telegram_id: int, username=None, full_name=None):
+    from src.database import run_db
+    from src import repository
+    return user_cache.get(telegram_id) or await run_db(repository.get_or_create_user, telegram_id, username, full_name)
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from src.config import Config
+from src.database import run_db
+from src.budget import budget_ledger
+
+logger = logging.getLogger(__name__)
+
+# Optional write-behind buffer for recorded transactions. Rows from many
+# messages are collected and committed together once WRITE_BUFFER_MAX_ROWS
+# are pending or WRITE_BUFFER_MAX_DELAY_MS has passed, so SQLite pays one
+# fsync (and one writer-lock round) per batch instead of per message.
+#
+# Pending rows are counted in the budget ledger as soon as they are accepted,
+# so limit alerts see them without a flush. Anything that reads transactions
+# from the database (reports, exports, warming the ledger) must first call
+# barrier(user_id), which waits until that user's pending rows are committed.
+# Rows still pending when the process is killed are lost, which is why the
+# buffer is off by default and the delay is kept short.
+
+class WriteBuffer:
+    def __init__(self, max_rows: int, max_delay: float, enabled: bool = True):
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.enabled = enabled
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.failed_rows = 0
+        self._pending = []  # (user_id, rows)
+        self._pending_rows = 0
+        self._users = {}  # user_id -> pending or in-flight batches
+        self._flush_lock = asyncio.Lock()
+        self._timer = None
+        self._tasks = set()
+
+    @property
+    def depth(self):
+        return self._pending_rows
+
+    async def add(self, user_id: int, rows):
+        if not self.enabled:
+            from src import repository
+            await run_db(repository.add_transactions, user_id, rows)
+            return
+        for row in rows:
+            budget_ledger.record(user_id, row['type'], row['amount'], row['date'])
+        self._pending.append((user_id, rows))
+        self._pending_rows += len(rows)
+        self._users[user_id] = self._users.get(user_id, 0) + 1
+        if self._pending_rows >= self.max_rows:
+            # The message that fills the buffer waits for the commit, which
+            # also throttles writers when the database falls behind
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def barrier(self, user_id: int):
+        if user_id in self._users:
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            batch = self._pending
+            self._pending, self._pending_rows = [], 0
+            try:
+                await self._commit(batch)
+            finally:
+                for user_id, _ in batch:
+                    self._users[user_id] -= 1
+                    if not self._users[user_id]:
+                        del self._users[user_id]
+
+    async def _commit(self, batch):
+        from src import repository
+        rows = sum(len(r) for _, r in batch)
+        try:
+            await run_db(repository.add_transaction_batches, batch, record_ledger=False)
+            self.flushes += 1
+            self.rows_flushed += rows
+            return
+        except Exception as e:
+            logger.error(f"Write buffer flush of {rows} rows failed, retrying per message: {e}")
+        # Retry message by message so one bad row doesn't lose the whole batch
+        for user_id, user_rows in batch:
+            try:
+                await run_db(repository.add_transaction_batches, [(user_id, user_rows)], record_ledger=False)
+                self.rows_flushed += len(user_rows)
+            except Exception as e:
+                self.failed_rows += len(user_rows)
+                budget_ledger.forget(user_id)
+                logger.error(f"Dropped {len(user_rows)} buffered rows for user {user_id}: {e}")
+        self.flushes += 1
+
+    async def close(self):
+        await self.flush()
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'pending_rows': self._pending_rows,
+            'flushes': self.flushes,
+            'rows_flushed': self.rows_flushed,
+            'failed_rows': self.failed_rows,
+            'rows_per_flush': (self.rows_flushed / self.flushes) if self.flushes else 0.0
+        }
+
+write_buffer = WriteBuffer(
+    Config.WRITE_BUFFER_MAX_ROWS,
+    Config.WRITE_BUFFER_MAX_DELAY_MS / 1000.0,
+    enabled=Config.WRITE_BUFFER_ENABLED
+)
@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# The tests run against a throwaway SQLite file; set up the environment
+# before anything imports src.config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_dir = tempfile.mkdtemp(prefix="bot_tests_")
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123:test')
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+@pytest.fixture(scope='session')
+def database():
+    from src.database import init_db
+    init_db()
+
+@pytest.fixture
+def db(database):
+    # An empty schema for each test
+    from src.database import Base, engine
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    yield
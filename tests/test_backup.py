@@ -0,0 +1,61 @@
+import sqlite3
+import threading
+import pytest
+from src import backup
+from src.config import Config
+from src.database import create_db_engine
+from src.migrations import run_migrations
+from src.rollups import rebuild as rebuild_rollups
+
+@pytest.fixture
+def live_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'BACKUP_DIR', str(tmp_path / 'backups'))
+    path = tmp_path / 'live.db'
+    bind = create_db_engine(f"sqlite:///{path}")
+    run_migrations(bind)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (id, telegram_id, language, is_active, daily_limit) VALUES (1, 1, 'en', 1, 0)")
+    # Enough pages for a page-at-a-time copy to take many steps
+    conn.executemany(
+        "INSERT INTO transactions (user_id, type, category, amount, description, date) VALUES (1, 'expense', 'food', ?, ?, '2024-01-01')",
+        [(i, 'x' * 200) for i in range(2000)]
+    )
+    conn.commit()
+    conn.close()
+    with bind.begin() as connection:
+        rebuild_rollups(connection)
+    yield bind, path
+    bind.dispose()
+
+def test_snapshot_of_a_quiet_database(live_db):
+    bind, _ = live_db
+    path = backup.run_backup('snapshot', bind)
+    assert path.endswith(backup.SNAPSHOT_SUFFIX)
+    report = backup.verify(path)
+    assert report['ok'] and report['counts']['transactions'] == 2000
+
+def test_snapshot_restarted_by_writes_falls_back_to_dump(live_db, monkeypatch):
+    bind, db_path = live_db
+    monkeypatch.setattr(Config, 'BACKUP_PAGES_PER_STEP', 1)
+    monkeypatch.setattr(Config, 'BACKUP_STEP_SLEEP_MS', 5)
+    monkeypatch.setattr(Config, 'BACKUP_SNAPSHOT_MAX_RESTARTS', 2)
+    done = threading.Event()
+
+    def writer():
+        conn = sqlite3.connect(db_path, timeout=5)
+        while not done.is_set():
+            conn.execute("UPDATE users SET daily_limit = daily_limit + 1 WHERE id = 1")
+            conn.commit()
+            done.wait(0.002)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        path = backup.run_backup('snapshot', bind)
+    finally:
+        done.set()
+        thread.join()
+    assert path.endswith(backup.DUMP_SUFFIX)
+    report = backup.verify(path)
+    assert report['ok'] and report['counts']['transactions'] == 2000
@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+import pytest
+from src import repository
+from src.budget import BudgetLedger, _Totals
+
+@pytest.fixture
+def ledger(db, monkeypatch):
+    ledger = BudgetLedger()
+    monkeypatch.setattr(repository, 'budget_ledger', ledger)
+    return ledger
+
+@pytest.fixture
+def user_id(db):
+    return repository.get_or_create_user(1001).id
+
+def test_totals_are_warmed_from_expenses_only(ledger, user_id):
+    today = date.today()
+    repository.add_transaction(user_id, 'expense', 'food', 40, 'Lunch', today)
+    repository.add_transaction(user_id, 'income', 'salary', 5000, 'Salary', today)
+    repository.add_transaction(user_id, 'expense', 'food', 99, 'Old', today - timedelta(days=400))
+    other = repository.get_or_create_user(1002).id
+    repository.add_transaction(other, 'expense', 'food', 7, 'Tea', today)
+
+    assert ledger.peek(user_id) is None
+    assert ledger.warm(user_id) == {'daily': 40, 'weekly': 40, 'monthly': 40}
+
+def test_writes_after_warming_update_the_totals(ledger, user_id):
+    ledger.warm(user_id)
+    repository.add_transaction(user_id, 'expense', 'fuel', 60, 'Fuel', date.today())
+    repository.add_transaction(user_id, 'income', 'salary', 100, 'Bonus', date.today())
+    assert ledger.peek(user_id) == {'daily': 60, 'weekly': 60, 'monthly': 60}
+    ledger.forget(user_id)
+    assert ledger.peek(user_id) is None
+
+def test_insert_during_warm_up_reloads_the_totals(ledger, user_id, monkeypatch):
+    load = ledger._load
+    loads = []
+    def racing_load(uid):
+        totals = load(uid)
+        if not loads:
+            # Lands after the snapshot was read
+            repository.add_transaction(uid, 'expense', 'food', 25, 'Coffee', date.today())
+        loads.append(totals)
+        return totals
+    monkeypatch.setattr(ledger, '_load', racing_load)
+    assert ledger.warm(user_id)['daily'] == 25
+    assert len(loads) == 2
+
+def test_least_recently_used_users_are_dropped(db, monkeypatch):
+    ledger = BudgetLedger(max_users=2)
+    monkeypatch.setattr(ledger, '_load', lambda uid: _Totals(date.today()))
+    for uid in (1, 2):
+        ledger.warm(uid)
+    ledger.peek(1)
+    ledger.warm(3)
+    assert ledger.peek(2) is None
+    assert ledger.peek(1) is not None and ledger.peek(3) is not None
+
+def test_rolling_over_resets_only_the_periods_that_ended():
+    # 2024-01-03 is a Wednesday
+    totals = _Totals(date(2024, 1, 3), day=10, week=30, month=50)
+    totals.roll_to(date(2024, 1, 4))
+    assert totals.as_dict() == {'daily': 0, 'weekly': 30, 'monthly': 50}
+    totals.roll_to(date(2024, 1, 8))  # next Monday
+    assert totals.as_dict() == {'daily': 0, 'weekly': 0, 'monthly': 50}
+    totals.roll_to(date(2024, 2, 1))
+    assert totals.as_dict() == {'daily': 0, 'weekly': 0, 'monthly': 0}
+
+def test_future_and_earlier_dates_count_only_where_they_fall():
+    totals = _Totals(date(2024, 1, 10))
+    totals.add(5, date(2024, 1, 11))   # future: ignored
+    totals.add(7, date(2024, 1, 9))    # same week and month
+    totals.add(11, date(2024, 1, 2))   # earlier week, same month
+    assert totals.as_dict() == {'daily': 0, 'weekly': 7, 'monthly': 18}
@@ -0,0 +1,34 @@
+import os
+import sys
+import subprocess
+import multiprocessing
+from datetime import date
+import pytest
+from src import charts, chart_render
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_entry_script_imports_nothing_when_rerun_by_workers():
+    # Pool workers re-run main.py as __mp_main__; that must not load the bot
+    code = (
+        "import runpy, sys; runpy.run_path('main.py', run_name='__mp_main__'); "
+        "print(sorted(m for m in ('src.bot', 'telegram', 'sqlalchemy') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+@pytest.mark.skipif('forkserver' not in multiprocessing.get_all_start_methods(), reason="no forkserver on this platform")
+def test_pool_uses_forkserver_with_chart_render_preloaded():
+    context = charts._pool_context()
+    assert context.get_start_method() == 'forkserver'
+    from multiprocessing import forkserver
+    assert forkserver._forkserver._preload_modules == ['src.chart_render']
+
+def test_chart_renders_in_the_pool():
+    pytest.importorskip('matplotlib')
+    payload = charts._payload({date.today(): 40.0}, {'food': 40.0}, 7, 'en', 50)
+    try:
+        image = charts._get_pool().submit(chart_render.render_report_chart, payload).result(timeout=60)
+    finally:
+        charts.shutdown()
+    assert image.startswith(b'\x89PNG')
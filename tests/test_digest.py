@@ -0,0 +1,77 @@
+import asyncio
+from datetime import date, timedelta
+import pytest
+from telegram.error import Forbidden
+from src import repository
+from src.config import Config
+from src.database import session_scope, User
+from src.digest import run_digest
+
+class FakeBot:
+    def __init__(self, fail_for=(), blocked=()):
+        self.sent = []
+        self.fail_for = set(fail_for)
+        self.blocked = set(blocked)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.blocked:
+            raise Forbidden("bot was blocked by the user")
+        if chat_id in self.fail_for:
+            raise RuntimeError("process killed")
+        self.sent.append(chat_id)
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    monkeypatch.setattr(Config, 'DIGEST_CHUNK_SIZE', 3)
+    monkeypatch.setattr(Config, 'DIGEST_BATCH_SIZE', 2)
+
+def _user(telegram_id, digest=True, spent=10, active=True, day=None):
+    uid = repository.get_or_create_user(telegram_id).id
+    repository.set_digest(telegram_id, digest)
+    repository.set_active(telegram_id, active)
+    if spent:
+        repository.add_transaction(uid, 'expense', 'food', spent, 'Lunch', day or date.today())
+    return uid
+
+def test_digest_goes_once_to_opted_in_users_with_activity(db, small_batches):
+    for telegram_id in (7001, 7002, 7003, 7004, 7005):
+        _user(telegram_id)
+    _user(7006, digest=False)
+    _user(7007, spent=0)
+    _user(7008, active=False)
+    _user(7009, day=date.today() - timedelta(days=1))
+    bot = FakeBot()
+    result = asyncio.run(run_digest(bot))
+    assert result == {'date': date.today(), 'sent': 5, 'failed': 0}
+    assert sorted(bot.sent) == [7001, 7002, 7003, 7004, 7005]
+    # The day's run is finished; running again sends nothing
+    assert asyncio.run(run_digest(bot)) is None
+    assert len(bot.sent) == 5
+
+def test_an_interrupted_run_resumes_after_the_last_claimed_batch(db, small_batches, monkeypatch):
+    # One chunk of four users in two batches: [7011, 7012], [7013, 7014]
+    monkeypatch.setattr(Config, 'DIGEST_CHUNK_SIZE', 4)
+    for telegram_id in (7011, 7012, 7013, 7014, 7015):
+        _user(telegram_id)
+    crashed = FakeBot(fail_for={7013})
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_digest(crashed))
+    assert 7013 not in crashed.sent
+
+    resumed = FakeBot()
+    result = asyncio.run(run_digest(resumed, resume_only=True))
+    # 7013/7014 were claimed before the crash, so only 7015 remains
+    assert resumed.sent == [7015]
+    # 7014 got its digest, but the crash hit before the count was saved
+    assert crashed.sent == [7011, 7012, 7014]
+    assert result['sent'] == 3
+    assert not set(crashed.sent) & set(resumed.sent)
+    assert asyncio.run(run_digest(resumed, resume_only=True)) is None
+
+def test_users_who_blocked_the_bot_are_opted_out(db, small_batches):
+    _user(7021)
+    blocked = _user(7022)
+    result = asyncio.run(run_digest(FakeBot(blocked={7022})))
+    assert (result['sent'], result['failed']) == (1, 1)
+    with session_scope() as s:
+        assert s.get(User, blocked).digest_enabled is False
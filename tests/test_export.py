@@ -0,0 +1,116 @@
+import io
+import asyncio
+import csv
+import gzip
+import zipfile
+from datetime import date, timedelta
+import pytest
+from src import repository
+from src.config import Config
+from src.export import build_export
+
+@pytest.fixture
+def user_id(db):
+    uid = repository.get_or_create_user(2001).id
+    today = date.today()
+    repository.add_transactions(uid, [
+        {'type': 'expense', 'category': 'food', 'amount': 12.5, 'description': 'Coffee', 'date': today},
+        {'type': 'income', 'category': 'salary', 'amount': 8000, 'description': 'Salary', 'date': today - timedelta(days=40)},
+        {'type': 'expense', 'category': 'rent', 'amount': 3000, 'description': 'Rent', 'date': today - timedelta(days=500)},
+    ])
+    return uid
+
+def _csv_rows(data):
+    return list(csv.reader(io.StringIO(data.decode('utf-8-sig'))))
+
+def test_xlsx_export_covers_the_requested_days(user_id):
+    from openpyxl import load_workbook
+    export_file, extension = build_export(user_id, 'en', days=365)
+    assert extension == 'xlsx'
+    with export_file:
+        workbook = load_workbook(export_file, read_only=True)
+        [sheet] = workbook.worksheets
+        rows = list(sheet.values)
+    assert rows[0] == ('Type', 'Category', 'Amount', 'Description', 'Date')
+    assert [r[3] for r in rows[1:]] == ['Salary', 'Coffee']
+
+def test_monthly_xlsx_has_one_sheet_per_month(user_id):
+    from openpyxl import load_workbook
+    export_file, _ = build_export(user_id, 'en', days=365, per_month=True)
+    with export_file:
+        workbook = load_workbook(export_file, read_only=True)
+    today = date.today()
+    assert workbook.sheetnames == [(today - timedelta(days=40)).strftime('%Y-%m'), today.strftime('%Y-%m')]
+
+def test_csv_export_is_gzipped_with_translated_labels(user_id):
+    export_file, extension = build_export(user_id, 'ar', days=30, fmt='csv')
+    assert extension == 'csv.gz'
+    with export_file:
+        rows = _csv_rows(gzip.decompress(export_file.read()))
+    assert rows[0] == ['النوع', 'الفئة', 'المبلغ', 'الوصف', 'التاريخ']
+    assert len(rows) == 2 and rows[1][3] == 'Coffee'
+
+def test_large_ranges_switch_to_csv(user_id, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPORT_XLSX_MAX_ROWS', 1)
+    export_file, extension = build_export(user_id, 'en', days=365)
+    export_file.close()
+    assert extension == 'csv.gz'
+
+def _zip_months(export_file):
+    with export_file, zipfile.ZipFile(export_file) as archive:
+        return {name: _csv_rows(archive.read(name)) for name in archive.namelist()}
+
+@pytest.mark.parametrize('switch_to_csv', [False, True])
+def test_monthly_csv_is_a_zip_with_one_file_per_month(user_id, monkeypatch, switch_to_csv):
+    if switch_to_csv:
+        # An XLSX request above the row limit keeps its monthly split
+        monkeypatch.setattr(Config, 'EXPORT_XLSX_MAX_ROWS', 1)
+        export_file, extension = build_export(user_id, 'en', days=365, per_month=True)
+    else:
+        export_file, extension = build_export(user_id, 'en', days=365, fmt='csv', per_month=True)
+    assert extension == 'zip'
+    months = _zip_months(export_file)
+    today = date.today()
+    earlier = (today - timedelta(days=40)).strftime('%Y-%m.csv')
+    assert list(months) == [earlier, today.strftime('%Y-%m.csv')]
+    assert months[earlier][0] == ['Type', 'Category', 'Amount', 'Description', 'Date']
+    assert [r[3] for r in months[earlier][1:]] == ['Salary']
+
+def test_nothing_to_export(db):
+    uid = repository.get_or_create_user(2002).id
+    repository.add_transaction(uid, 'expense', 'food', 1, 'Old', date.today() - timedelta(days=1))
+    assert build_export(uid, 'en', days=1, fmt='csv') == (None, 'csv.gz')
+    assert build_export(uid, 'en', days=1) == (None, 'xlsx')
+    assert build_export(uid, 'en', days=1, fmt='csv', per_month=True) == (None, 'zip')
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+        self.documents = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+    async def reply_document(self, document, filename, **kwargs):
+        self.documents.append((filename, document.read()))
+
+def _export_command(telegram_id, *args):
+    from types import SimpleNamespace
+    from src.main_logic import export_excel_cmd
+    message = FakeMessage()
+    update = SimpleNamespace(message=message, callback_query=None, effective_user=SimpleNamespace(id=telegram_id))
+    asyncio.run(export_excel_cmd(update, SimpleNamespace(args=list(args))))
+    return message
+
+@pytest.mark.parametrize('days', ['0', '3651', '1000000000'])
+def test_export_command_rejects_out_of_range_days(user_id, days):
+    message = _export_command(2001, days)
+    assert message.documents == []
+    [reply] = message.replies
+    assert reply.startswith("الاستخدام: /export")
+
+def test_export_command_sends_the_file(user_id):
+    message = _export_command(2001, 'csv', '3650')
+    [(filename, data)] = message.documents
+    assert filename == 'report_2001.csv.gz'
+    assert len(_csv_rows(gzip.decompress(data))) == 4
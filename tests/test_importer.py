@@ -0,0 +1,125 @@
+import asyncio
+from datetime import date, datetime
+import pytest
+from src import importer, repository
+from src.importer import StatementReader, find_columns, parse_amount, parse_overrides
+
+def _write_csv(path, lines, encoding='utf-8'):
+    path.write_text("\n".join(lines) + "\n", encoding=encoding)
+    return str(path)
+
+def _read_all(path, kind='csv', **kwargs):
+    reader = StatementReader(path, kind, **kwargs)
+    rows = []
+    while True:
+        chunk = reader.next_chunk(3)
+        if not chunk:
+            return reader, rows
+        rows.extend(chunk)
+
+@pytest.mark.parametrize('value, expected', [
+    ("1,234.50", 1234.5), ("1.234,50", 1234.5), ("(12.00)", -12.0), ("SAR -50", -50.0),
+    ("50-", -50.0), ("١٬٥٠٠", 1500.0), ("8 000", 8000.0), ("1,5", 1.5), (7, 7.0), ("abc", None), (None, None),
+])
+def test_parse_amount(value, expected):
+    assert parse_amount(value) == expected
+
+def test_find_columns_english_and_arabic():
+    assert find_columns(["Posting Date", "Details", "Amount (SAR)", "Balance"]) == {'date': 0, 'description': 1, 'amount': 2}
+    assert find_columns(["التاريخ", "البيان", "مدين", "دائن", "الفئة"]) == {
+        'date': 0, 'description': 1, 'debit': 2, 'credit': 3, 'category': 4}
+    assert find_columns(["Account", "123456"]) is None
+
+def test_caption_overrides():
+    overrides = parse_overrides("date=When, description=What; amount=How much")
+    assert find_columns(["When", "What", "How much"], overrides) == {'date': 0, 'description': 1, 'amount': 2}
+
+def test_header_after_preamble_and_day_first_dates(tmp_path):
+    path = _write_csv(tmp_path / "s.csv", [
+        "Account statement", "Account,123", "",
+        "Date,Description,Amount",
+        "03/04/2024,coffee,-12.50",
+        "2024-04-05,SALARY ACME,8000",
+        "Closing balance,,",
+    ])
+    reader, rows = _read_all(path)
+    assert [(r['date'], r['type'], r['amount'], r['category']) for r in rows] == [
+        (date(2024, 4, 3), 'expense', 12.5, None),
+        (date(2024, 4, 5), 'income', 8000.0, None),
+    ]
+    assert reader.skipped == 1
+
+def test_positive_amounts_without_any_negative_are_expenses(tmp_path):
+    path = _write_csv(tmp_path / "s.csv", ["Date,Description,Amount", "2024-01-01,taxi,30", "2024-01-02,coffee,12"])
+    _, rows = _read_all(path)
+    assert {r['type'] for r in rows} == {'expense'}
+
+def test_late_negative_amount_makes_earlier_positives_income(tmp_path):
+    # The only negative amount comes long after the first chunk
+    lines = ["Date,Description,Amount"] + [f"2024-01-01,deposit {i},100" for i in range(10)] + ["2024-01-02,coffee,-12"]
+    path = _write_csv(tmp_path / "s.csv", lines)
+    _, rows = _read_all(path)
+    assert [r['type'] for r in rows] == ['income'] * 10 + ['expense']
+
+def test_debit_credit_and_markers(tmp_path):
+    path = _write_csv(tmp_path / "s.csv", [
+        "Date;Description;Type;Amount",
+        "05.03.2024;بنزين محطة;DR;1.250,50",
+        "06.03.2024;Refund;CR;20",
+    ], encoding='cp1256')
+    _, rows = _read_all(path)
+    assert [(r['type'], r['amount'], r['description']) for r in rows] == [('expense', 1250.5, 'بنزين محطة'), ('income', 20.0, 'Refund')]
+
+def test_xlsx_dates_and_debit_credit(tmp_path):
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["التاريخ", "البيان", "مدين", "دائن", "الفئة"])
+    sheet.append([datetime(2024, 3, 1, 10, 5), "مطعم", 45.5, None, None])
+    sheet.append([45352, "Netflix", None, "39.99", "ترفيه"])
+    path = str(tmp_path / "s.xlsx")
+    workbook.save(path)
+    _, rows = _read_all(path, 'xlsx')
+    assert [(r['date'], r['type'], r['amount'], r['category']) for r in rows] == [
+        (date(2024, 3, 1), 'expense', 45.5, None),
+        (date(2024, 3, 1), 'income', 39.99, 'entertainment'),
+    ]
+
+def test_missing_columns_and_bad_files(tmp_path):
+    with pytest.raises(importer.ImportFileError) as error:
+        StatementReader(_write_csv(tmp_path / "s.csv", ["a,b", "1,2"]), 'csv')
+    assert error.value.reason == 'no_columns'
+    bad = tmp_path / "bad.xlsx"
+    bad.write_bytes(b"not a zip")
+    with pytest.raises(importer.ImportFileError) as error:
+        StatementReader(str(bad), 'xlsx')
+    assert error.value.reason == 'bad_file'
+
+def test_max_rows(tmp_path):
+    lines = ["Date,Description,Amount"] + [f"2024-01-01,taxi,{i + 1}" for i in range(10)]
+    reader, rows = _read_all(_write_csv(tmp_path / "s.csv", lines), max_rows=4)
+    assert len(rows) == 4 and reader.truncated
+
+def test_reimport_skips_duplicates_but_keeps_repeated_lines(db, tmp_path):
+    user_id = repository.get_or_create_user(7001).id
+    path = _write_csv(tmp_path / "s.csv", [
+        "Date,Description,Amount",
+        "2024-01-01,coffee,-12", "2024-01-01,coffee,-12", "2024-01-02,taxi,-30",
+    ])
+    first = asyncio.run(importer.run_import(path, 'csv', user_id))
+    second = asyncio.run(importer.run_import(path, 'csv', user_id))
+    assert (first.added, first.duplicates) == (3, 0)
+    assert (second.added, second.duplicates) == (0, 3)
+
+def test_categories_from_keywords_before_the_llm(db, tmp_path):
+    from src.database import session_scope, Transaction
+    user_id = repository.get_or_create_user(7002).id
+    path = _write_csv(tmp_path / "s.csv", [
+        "Date,Description,Category,Amount",
+        "2024-01-01,UBER TRIP,,-20", "2024-01-01,STARBUCKS,Food,-12", "2024-01-02,,,-5",
+    ])
+    asyncio.run(importer.run_import(path, 'csv', user_id))
+    with session_scope() as db_session:
+        categories = [c for (c,) in db_session.query(Transaction.category).filter(
+            Transaction.user_id == user_id).order_by(Transaction.id)]
+    assert categories == ['transport', 'food', 'other']
@@ -0,0 +1,65 @@
+from datetime import date
+import pytest
+from src.local_parser import LocalParser, categorize
+
+@pytest.fixture
+def parser():
+    return LocalParser()
+
+@pytest.mark.parametrize('message, category, amount', [
+    ("Spent 50 on coffee", 'food', 50),
+    ("دفعت 50 بنزين", 'fuel', 50),
+    ("taxi 1,250", 'transport', 1250),
+])
+def test_simple_expenses(parser, message, category, amount):
+    [item] = parser.parse(message)
+    assert item['type'] == 'expense'
+    assert item['category'] == category
+    assert item['amount'] == amount
+    assert item['date'] == date.today().isoformat()
+
+def test_salary_is_income(parser):
+    [item] = parser.parse("salary 8000")
+    assert item['type'] == 'income'
+    assert item['category'] == 'salary'
+
+@pytest.mark.parametrize('message', [
+    "paid salary 3000",
+    "paid 3000 salary to driver",
+    "spent 8000 salary",
+    "دفعت راتب 3000",
+])
+def test_paid_salary_is_left_to_the_llm(parser, message):
+    assert parser.parse(message) is None
+
+def test_income_word_with_expense_category_is_left_to_the_llm(parser):
+    assert parser.parse("received 50 coffee") is None
+
+@pytest.mark.parametrize('message', [
+    "phone 0501234567",
+    "phone 501234567",
+    "bill 007",
+])
+def test_implausible_amounts_are_left_to_the_llm(parser, message):
+    assert parser.parse(message) is None
+
+def test_several_entries(parser):
+    items = parser.parse("coffee 15, taxi 30")
+    assert [(i['category'], i['amount']) for i in items] == [('food', 15), ('transport', 30)]
+
+def test_categorize():
+    assert categorize("UBER TRIP 1234") == 'transport'
+    assert categorize("صيدلية النهدي") == 'health'
+    assert categorize("coffee and taxi") is None
+    assert categorize("POS PURCHASE MERCHANT") is None
+
+@pytest.mark.parametrize('text', ["بنت", "بنت خالتي"])
+def test_short_keywords_need_the_whole_token(text):
+    assert categorize(text) is None
+
+def test_short_keyword_as_a_whole_token(parser):
+    assert categorize("نت 100") == 'bills'
+    [item] = parser.parse("دفعت 100 نت")
+    assert item['category'] == 'bills'
+    assert item['description'] == 'Internet bill'
+
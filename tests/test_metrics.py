@@ -0,0 +1,83 @@
+import asyncio
+import urllib.request
+import urllib.error
+import pytest
+import sqlalchemy as sa
+from src import metrics
+from src.metrics import Registry
+
+def test_counters_render_with_escaped_labels():
+    registry = Registry()
+    counter = registry.counter('events_total', "Events", ('kind',))
+    counter.inc(kind='a')
+    counter.inc(2, kind='say "hi"\n')
+    assert registry.render().splitlines() == [
+        '# HELP events_total Events',
+        '# TYPE events_total counter',
+        'events_total{kind="a"} 1',
+        'events_total{kind="say \\"hi\\"\\n"} 2',
+    ]
+    with pytest.raises(ValueError):
+        counter.inc()
+    # Registering the same name again returns the existing metric
+    assert registry.counter('events_total', "Events", ('kind',)) is counter
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    lines = registry.render().splitlines()[2:]
+    assert lines == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        'latency_seconds_sum 3.65',
+        'latency_seconds_count 4',
+    ]
+
+def test_callbacks_are_read_at_scrape_time_and_failures_are_skipped():
+    registry = Registry()
+    depth = {'value': 1}
+    registry.callback('depth', "Depth", lambda: {('a',): depth['value'], ('b',): None}, labelnames=('queue',))
+    registry.callback('broken', "Broken", lambda: 1 / 0)
+    depth['value'] = 5
+    assert registry.render().splitlines() == ['# HELP depth Depth', '# TYPE depth gauge', 'depth{queue="a"} 5']
+
+def test_track_handler_records_latency_and_errors():
+    async def ok(update, context):
+        return 'done'
+    async def broken(update, context):
+        raise RuntimeError()
+    assert asyncio.run(metrics.track_handler(ok, 'test_ok')(None, None)) == 'done'
+    with pytest.raises(RuntimeError):
+        asyncio.run(metrics.track_handler(broken, 'test_broken')(None, None))
+    text = metrics.registry.render()
+    assert 'bot_handler_duration_seconds_count{handler="test_ok"} 1' in text
+    assert 'bot_handler_errors_total{handler="test_broken"} 1' in text
+    assert 'bot_handler_errors_total{handler="test_ok"}' not in text
+
+def test_engine_statements_are_timed_by_operation():
+    bind = sa.create_engine('sqlite://')
+    metrics.instrument_engine(bind)
+    before = metrics.db_queries._values.get(('insert',), [None, 0.0, 0])[2]
+    with bind.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(sa.text("INSERT INTO t VALUES (1)"))
+        with pytest.raises(sa.exc.OperationalError):
+            conn.execute(sa.text("INSERT INTO missing VALUES (1)"))
+    assert metrics.db_queries._values[('insert',)][2] == before + 1
+    assert metrics.db_queries._values[('other',)][2] >= 1
+
+def test_http_endpoint_serves_the_registry():
+    server = metrics.start_http_server('127.0.0.1', 0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            assert '# TYPE bot_handler_duration_seconds histogram' in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/other")
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,56 @@
+from datetime import date
+import sqlalchemy as sa
+from src.database import create_db_engine, maintenance_transaction, Transaction, DailyRollup
+from src.migrations import MIGRATIONS, run_migrations, current_version
+
+def test_fresh_database_reaches_latest_version(tmp_path):
+    bind = create_db_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    try:
+        latest = max(version for version, _, _ in MIGRATIONS)
+        assert run_migrations(bind) == latest
+        # Running again is a no-op
+        assert run_migrations(bind) == latest
+        with maintenance_transaction(bind) as conn:
+            assert current_version(conn) == latest
+            assert {'users', 'transactions', 'daily_rollups', 'stat_counters', 'digest_runs'} <= set(sa.inspect(conn).get_table_names())
+    finally:
+        bind.dispose()
+
+def test_rollup_backfill_covers_existing_transactions(tmp_path):
+    # A database from before versioning: rows exist before the rollup migration runs
+    bind = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    try:
+        with bind.begin() as conn:
+            for version, _, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+                if version <= 3:
+                    func(conn)
+            conn.execute(sa.text("INSERT INTO users (telegram_id, language, is_active) VALUES (1, 'en', 1)"))
+            conn.execute(Transaction.__table__.insert(), [
+                {'user_id': 1, 'type': 'expense', 'category': 'food', 'amount': a, 'description': 'x', 'date': date(2024, 1, 1)}
+                for a in (10.0, 15.5)
+            ])
+        run_migrations(bind)
+        with bind.connect() as conn:
+            total, count = conn.execute(sa.select(DailyRollup.total, DailyRollup.count)).one()
+        assert (total, count) == (25.5, 2)
+    finally:
+        bind.dispose()
+
+def test_maintenance_transaction_lifts_postgres_statement_timeout():
+    statements = []
+
+    class Conn:
+        dialect = sa.engine.default.DefaultDialect()
+        dialect.name = 'postgresql'
+
+        def execute(self, statement):
+            statements.append(str(statement))
+
+    class Bind:
+        def begin(self):
+            import contextlib
+            return contextlib.nullcontext(Conn())
+
+    with maintenance_transaction(Bind()):
+        pass
+    assert statements == ["SET LOCAL statement_timeout = 0"]
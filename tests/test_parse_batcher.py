@@ -0,0 +1,61 @@
+import json
+import asyncio
+from types import SimpleNamespace
+from src.ai_service import AIService, ParseBatcher
+
+def _completion(payload):
+    content = payload if isinstance(payload, str) else json.dumps(payload)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+def _txn(amount):
+    return {'type': 'expense', 'category': 'food', 'amount': amount, 'description': 'Lunch', 'date': '2024-01-01'}
+
+class FakeCompletions:
+    # Answers the batched prompt with batch_answer and single prompts with
+    # a single transaction of 99
+    def __init__(self, batch_answer):
+        self.batch_answer = batch_answer
+        self.single_prompts = []
+
+    async def create(self, messages=None, **kwargs):
+        prompt = messages[-1]['content']
+        if '"results"' in prompt:
+            return _completion(self.batch_answer)
+        self.single_prompts.append(prompt)
+        return _completion({'transactions': [_txn(99)]})
+
+def _run(batch_answer, messages):
+    service = AIService()
+    fake = FakeCompletions(batch_answer)
+    service.async_client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+    batcher = ParseBatcher(service, window=0.01, max_size=len(messages))
+
+    async def main():
+        return await asyncio.gather(*[batcher.submit(m, 'en') for m in messages])
+    return asyncio.run(main()), batcher, fake
+
+def test_batch_answer_is_used():
+    results, batcher, fake = _run({'results': [
+        {'id': 0, 'transactions': [_txn(10)]},
+        {'id': 1, 'transactions': [_txn(20)]},
+    ]}, ["lunch ten", "lunch twenty"])
+    assert [r[0]['amount'] for r in results] == [10, 20]
+    assert batcher.batches == 1 and batcher.fallbacks == 0
+    assert fake.single_prompts == []
+
+def test_malformed_item_is_retried_alone():
+    results, batcher, fake = _run({'results': [
+        {'id': 0, 'transactions': [_txn(10)]},
+        {'id': 1, 'transactions': [{'amount': 20}]},  # missing keys
+        {'id': 2, 'transactions': 'oops'},
+    ]}, ["lunch ten", "lunch twenty", "lunch thirty"])
+    assert results[0][0]['amount'] == 10
+    assert results[1][0]['amount'] == 99
+    assert results[2][0]['amount'] == 99
+    assert batcher.fallbacks == 2
+    assert len(fake.single_prompts) == 2
+
+def test_unparseable_batch_falls_back_for_everything():
+    results, batcher, fake = _run("not json", ["lunch ten", "lunch twenty"])
+    assert [r[0]['amount'] for r in results] == [99, 99]
+    assert batcher.fallbacks == 2
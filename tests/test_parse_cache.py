@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+import pytest
+from src import parse_cache
+from src.parse_cache import MemoryCacheBackend, SQLiteCacheBackend, ParseCache, normalize_message
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(parse_cache, 'time', clock)
+    return clock
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend_factory(request, tmp_path):
+    def make(max_size):
+        if request.param == 'memory':
+            return MemoryCacheBackend(max_size)
+        return SQLiteCacheBackend(str(tmp_path / 'cache.db'), max_size)
+    return make
+
+def test_entries_expire_after_the_ttl(clock, backend_factory):
+    backend = backend_factory(10)
+    backend.set('k', {'amount': 1}, ttl=60)
+    clock.now += 59
+    assert backend.get('k') == {'amount': 1}
+    clock.now += 2
+    assert backend.get('k') is None
+    assert len(backend) == 0
+
+def test_least_recently_used_entry_is_evicted(clock, backend_factory):
+    backend = backend_factory(2)
+    backend.set('a', 1, ttl=60)
+    clock.now += 1
+    backend.set('b', 2, ttl=60)
+    clock.now += 1
+    assert backend.get('a') == 1  # 'b' is now the oldest
+    clock.now += 1
+    backend.set('c', 3, ttl=60)
+    assert len(backend) == 2
+    assert backend.get('b') is None
+    assert backend.get('a') == 1 and backend.get('c') == 3
+
+def test_normalisation_folds_spacing_case_and_arabic_variants():
+    assert normalize_message("  Coffee   15 ") == normalize_message("coffee 15")
+    assert normalize_message("قهوة ١٥") == normalize_message("قهوه 15")
+
+def test_relative_dates_move_with_the_day(clock):
+    cache = ParseCache(MemoryCacheBackend(10), ttl=3600)
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    cache.put("coffee 15 yesterday", 'en', [{'amount': 15, 'date': yesterday}])
+    [item] = cache.get("Coffee 15  yesterday", 'en')
+    assert item == {'amount': 15, 'date': yesterday}
+    # Stored as an offset, not a date
+    [stored] = cache.backend.get('en:coffee 15 yesterday')
+    assert stored == {'amount': 15, 'date_offset': -1}
+
+def test_explicit_dates_are_kept(clock):
+    cache = ParseCache(MemoryCacheBackend(10), ttl=3600)
+    cache.put("coffee 15 2024-01-05", 'en', [{'amount': 15, 'date': '2024-01-05'}])
+    assert cache.get("coffee 15 2024-01-05", 'en') == [{'amount': 15, 'date': '2024-01-05'}]
+
+def test_language_is_part_of_the_key_and_stats_count_hits(clock):
+    cache = ParseCache(MemoryCacheBackend(10), ttl=3600)
+    cache.put("taxi 30", 'en', [{'amount': 30, 'date': date.today().isoformat()}])
+    assert cache.get("taxi 30", 'ar') is None
+    assert cache.get("taxi 30", 'en') is not None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'size': 1}
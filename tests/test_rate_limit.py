@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from src import rate_limit
+from src.rate_limit import TokenBucket, InboundLimiter, AdmissionQueue, AdmissionQueueFull
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate(clock):
+    bucket = TokenBucket(rate=0.5, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    clock.now += 1.9
+    assert not bucket.try_acquire()
+    clock.now += 0.1
+    assert bucket.try_acquire()
+    # Refill never exceeds the capacity
+    clock.now += 3600
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+def test_limiter_keeps_a_bucket_per_user(clock):
+    limiter = InboundLimiter(rate=1.0, burst=2)
+    assert limiter.allow(1) and limiter.allow(1)
+    assert not limiter.allow(1)
+    assert limiter.allow(2)
+    assert limiter.rejected == 1
+
+def test_limiter_forgets_the_least_recently_seen_users(clock):
+    limiter = InboundLimiter(rate=1.0, burst=1, max_users=2)
+    limiter.allow(1)
+    limiter.allow(2)
+    limiter.allow(3)
+    # User 1's empty bucket was dropped, so they start with a full one
+    assert limiter.allow(1)
+    assert not limiter.allow(3)
+
+def test_admission_queue_bounds_active_and_waiting_work():
+    async def main():
+        queue = AdmissionQueue(max_active=1, max_depth=1)
+        release = asyncio.Event()
+        async def hold():
+            async with queue.admit():
+                await release.wait()
+        first = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert (queue.active, queue.waiting) == (1, 1)
+        with pytest.raises(AdmissionQueueFull):
+            async with queue.admit():
+                pass
+        release.set()
+        await asyncio.gather(first, second)
+        assert (queue.active, queue.waiting, queue.rejected) == (0, 0, 1)
+    asyncio.run(main())
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append((text, kwargs.get('do_quote')))
+
+def test_every_rate_limited_message_gets_a_quoted_reply(db, monkeypatch):
+    from types import SimpleNamespace
+    from src import handlers
+    monkeypatch.setattr(handlers, 'inbound_limiter', InboundLimiter(rate=0.001, burst=1))
+    recorded = []
+    async def record_transactions(update, user, text, lang):
+        recorded.append(text)
+    monkeypatch.setattr(handlers, 'record_transactions', record_transactions)
+
+    async def main():
+        messages = []
+        for n in range(3):
+            message = FakeMessage(f"coffee {n + 1}")
+            user = SimpleNamespace(id=4001, username=None, full_name=None)
+            update = SimpleNamespace(message=message, effective_user=user)
+            await handlers.handle_message(update, SimpleNamespace(user_data={}))
+            messages.append(message)
+        return messages
+    first, *dropped = asyncio.run(main())
+    assert recorded == ["coffee 1"] and first.replies == []
+    for message in dropped:
+        assert message.replies == [(handlers.STRINGS['ar']['slow_down'], True)]
@@ -0,0 +1,46 @@
+from datetime import date
+import pytest
+from src import repository, stats
+from src.database import maintenance_transaction
+
+@pytest.fixture
+def fresh_stats(db):
+    # Ids are reused once the tables are emptied; forget earlier tests' users
+    with stats._active_lock:
+        stats._active_seen[0], stats._active_seen[1] = None, set()
+
+def _row(txn_type, category, amount):
+    return {'type': txn_type, 'category': category, 'amount': amount, 'description': 'x', 'date': date.today()}
+
+def _snapshot():
+    result = stats.get_stats(days=1)
+    [(_, today)] = result['daily']
+    return result['counters'], today, result['categories']
+
+def test_counters_follow_registrations_and_inserts(fresh_stats):
+    a = repository.get_or_create_user(6001).id
+    b = repository.get_or_create_user(6002).id
+    repository.add_transactions(a, [_row('expense', 'food', 20), _row('income', 'salary', 500)])
+    repository.add_transactions(a, [_row('expense', 'food', 5)])
+    repository.add_transactions(b, [_row('expense', 'fuel', 40)])
+    repository.set_active(6002, False)
+    stats.record_parse_failure()
+
+    counters, today, categories = _snapshot()
+    assert counters == {
+        'users': 2, 'users_active': 1, 'transactions': 4, 'expense_total': 65, 'income_total': 500,
+        'parse_ok': 3, 'parse_failed': 1,
+    }
+    # Each user counts once per day however many messages they send
+    assert today == {'new_users': 2, 'transactions': 4, 'active_users': 2, 'parse_ok': 3, 'parse_failed': 1}
+    assert [tuple(c) for c in categories] == [('fuel', 40), ('food', 25)]
+
+def test_rebuild_matches_the_incremental_counters_and_keeps_parse_outcomes(fresh_stats):
+    a = repository.get_or_create_user(6003).id
+    repository.add_transactions(a, [_row('expense', 'food', 20), _row('expense', 'rent', 1000)])
+    stats.record_parse_failure()
+    before = _snapshot()
+
+    with maintenance_transaction() as conn:
+        assert stats.rebuild(conn) == 2
+    assert _snapshot() == before
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime
+from telegram import Update, Message, Chat
+from src.update_processor import PerChatUpdateProcessor
+
+def _update(update_id, chat_id):
+    message = Message(message_id=update_id, date=datetime.now(), chat=Chat(id=chat_id, type='private'))
+    return Update(update_id=update_id, message=message)
+
+def test_updates_from_one_chat_run_in_arrival_order():
+    async def main():
+        processor = PerChatUpdateProcessor(workers=4, queue_limit=16)
+        order = []
+        async def handle(n):
+            # Earlier updates take longer; order must still hold
+            await asyncio.sleep(0.01 * (5 - n))
+            order.append(n)
+        await asyncio.gather(*(processor.do_process_update(_update(n, 7), handle(n)) for n in range(5)))
+        assert order == list(range(5))
+        assert processor.active_chats == 0
+    asyncio.run(main())
+
+def test_chats_run_in_parallel_up_to_the_worker_limit():
+    async def main():
+        processor = PerChatUpdateProcessor(workers=3, queue_limit=16)
+        running = peak = 0
+        async def handle():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+        await asyncio.gather(*(processor.do_process_update(_update(n, n), handle()) for n in range(8)))
+        assert peak == 3
+    asyncio.run(main())
+
+def test_a_busy_chat_does_not_hold_workers_while_it_waits():
+    async def main():
+        processor = PerChatUpdateProcessor(workers=2, queue_limit=16)
+        done = []
+        async def slow(n):
+            await asyncio.sleep(0.05)
+            done.append(n)
+        async def fast():
+            done.append('other')
+        # Five queued updates from chat 1 take one worker; chat 2 gets the other at once
+        tasks = [asyncio.create_task(processor.do_process_update(_update(n, 1), slow(n))) for n in range(5)]
+        await asyncio.sleep(0)
+        await processor.do_process_update(_update(99, 2), fast())
+        assert done == ['other']
+        await asyncio.gather(*tasks)
+        assert done[1:] == list(range(5))
+    asyncio.run(main())
@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from src import repository
+from src.user_cache import UserCache, UserProfile, user_cache, get_profile
+
+def _profile(telegram_id):
+    return UserProfile(telegram_id, telegram_id, 'en', 0.0, 0.0, 0.0, True, False)
+
+def test_least_recently_used_profile_is_evicted():
+    cache = UserCache(max_size=2)
+    cache.put(_profile(1))
+    cache.put(_profile(2))
+    assert cache.get(1).telegram_id == 1
+    cache.put(_profile(3))
+    assert cache.get(2) is None
+    assert cache.get(1) and cache.get(3)
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'hit_rate': 0.75, 'size': 2}
+
+def test_setters_write_through_the_cache(db):
+    user_cache.invalidate(3001)
+    repository.get_or_create_user(3001)
+    repository.set_language(3001, 'en')
+    repository.set_limit(3001, 'daily', 150)
+    profile = user_cache.get(3001)
+    assert (profile.language, profile.daily_limit) == ('en', 150)
+
+def test_cached_profiles_skip_the_database(db, monkeypatch):
+    user_cache.invalidate(3002)
+    repository.get_or_create_user(3002)
+    def no_query(telegram_id):
+        raise AssertionError("profile should come from the cache")
+    monkeypatch.setattr(repository, 'get_user', no_query)
+    assert asyncio.run(get_profile(3002)).telegram_id == 3002
+
+def test_a_miss_loads_and_caches_the_profile(db):
+    repository.get_or_create_user(3003)
+    user_cache.invalidate(3003)
+    assert asyncio.run(get_profile(3003)).telegram_id == 3003
+    assert user_cache.get(3003) is not None
+    user_cache.invalidate(3004)
+    assert asyncio.run(get_profile(3004)) is None
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import date
+import pytest
+from src import repository, write_buffer as write_buffer_module
+from src.budget import BudgetLedger
+from src.database import session_scope, Transaction
+from src.write_buffer import WriteBuffer
+
+@pytest.fixture
+def users(db, monkeypatch):
+    ledger = BudgetLedger()
+    monkeypatch.setattr(write_buffer_module, 'budget_ledger', ledger)
+    monkeypatch.setattr(repository, 'budget_ledger', ledger)
+    ids = [repository.get_or_create_user(5000 + n).id for n in range(2)]
+    for uid in ids:
+        ledger.warm(uid)
+    return ledger, ids
+
+def _row(amount, txn_type='expense'):
+    return {'type': txn_type, 'category': 'food', 'amount': amount, 'description': 'x', 'date': date.today()}
+
+def _stored(user_id):
+    with session_scope() as db:
+        return sorted(a for (a,) in db.query(Transaction.amount).filter(Transaction.user_id == user_id))
+
+def test_rows_are_committed_together_when_the_buffer_fills(users):
+    ledger, (a, b) = users
+    async def main():
+        buffer = WriteBuffer(max_rows=3, max_delay=60)
+        await buffer.add(a, [_row(1)])
+        await buffer.add(b, [_row(2)])
+        # Pending rows already count towards the limits
+        assert ledger.peek(a)['daily'] == 1
+        assert _stored(a) == [] and buffer.depth == 2
+        await buffer.add(a, [_row(3)])
+        return buffer
+    buffer = asyncio.run(main())
+    assert _stored(a) == [1, 3] and _stored(b) == [2]
+    assert (buffer.flushes, buffer.rows_flushed, buffer.depth) == (1, 3, 0)
+    # Not counted twice by the commit
+    assert ledger.peek(a)['daily'] == 4
+
+def test_barrier_flushes_only_for_users_with_pending_rows(users):
+    _, (a, b) = users
+    async def main():
+        buffer = WriteBuffer(max_rows=100, max_delay=60)
+        await buffer.add(a, [_row(5)])
+        await buffer.barrier(b)
+        assert _stored(a) == []
+        await buffer.barrier(a)
+        assert _stored(a) == [5]
+        assert buffer.flushes == 1
+    asyncio.run(main())
+
+def test_pending_rows_are_flushed_after_the_delay(users):
+    _, (a, _) = users
+    async def main():
+        buffer = WriteBuffer(max_rows=100, max_delay=0.01)
+        await buffer.add(a, [_row(7)])
+        await asyncio.sleep(0.1)
+        assert _stored(a) == [7]
+    asyncio.run(main())
+
+def test_a_bad_message_does_not_lose_the_rest_of_the_batch(users):
+    ledger, (a, b) = users
+    async def main():
+        buffer = WriteBuffer(max_rows=100, max_delay=60)
+        await buffer.add(a, [_row(1)])
+        await buffer.add(b, [dict(_row(2), category=None, type=None)])
+        await buffer.close()
+        return buffer
+    buffer = asyncio.run(main())
+    assert _stored(a) == [1] and _stored(b) == []
+    assert (buffer.rows_flushed, buffer.failed_rows) == (1, 1)
+    # The dropped user's totals are re-read from the database next time
+    assert ledger.peek(b) is None
+
+def test_disabled_buffer_writes_through(users):
+    _, (a, _) = users
+    asyncio.run(WriteBuffer(max_rows=100, max_delay=60, enabled=False).add(a, [_row(9)]))
+    assert _stored(a) == [9]